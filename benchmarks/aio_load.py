@@ -0,0 +1,97 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'examples'))
+
+from vector_tile_base import aio
+import aio_server
+
+# Load test of the example asyncio tile server. The server and the clients run
+# in the same event loop, the tile work runs on the executor. Event loop lag is
+# measured with a task that sleeps for a fixed interval and records how late it
+# wakes up, which shows whether tile work is blocking the loop.
+
+async def fetch(host, port, paths, latencies):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for path in paths:
+            start = time.perf_counter()
+            writer.write(('GET %s HTTP/1.1\r\nHost: %s\r\n\r\n' % (path, host)).encode('ascii'))
+            await writer.drain()
+            status = await reader.readline()
+            length = 0
+            while True:
+                header = await reader.readline()
+                if header in (b'\r\n', b''):
+                    break
+                if header.lower().startswith(b'content-length:'):
+                    length = int(header.split(b':')[1])
+            await reader.readexactly(length)
+            if not status.startswith(b'HTTP/1.1 200'):
+                raise Exception('Request for %s failed: %s' % (path, status.decode('latin-1').strip()))
+            latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+async def monitor_lag(interval, lags, stop):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+async def run(args, worker):
+    server = await aio_server.start_server(None, '127.0.0.1', 0, worker)
+    port = server.sockets[0].getsockname()[1]
+    query = '?' + args.query if args.query else ''
+    paths = ['/14/%d/%d.mvt%s' % (8000 + i % args.distinct, 5000, query) for i in range(args.requests)]
+    latencies = []
+    lags = []
+    stop = asyncio.Event()
+    monitor = asyncio.ensure_future(monitor_lag(0.005, lags, stop))
+    start = time.perf_counter()
+    await asyncio.gather(*[fetch('127.0.0.1', port, paths[i::args.concurrency], latencies) for i in range(args.concurrency)])
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await monitor
+    # Wait for the server connection handlers to see the closed connections
+    while len(asyncio.all_tasks()) > 1:
+        await asyncio.sleep(0.01)
+    server.close()
+    await server.wait_closed()
+    return elapsed, latencies, lags
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load test the asyncio example tile server')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=16, help='Number of client connections')
+    parser.add_argument('--distinct', type=int, default=50, help='Number of distinct tiles requested')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--processes', action='store_true', help='Use a process pool instead of a thread pool')
+    parser.add_argument('--query', default='version=2', help='Query string added to every request')
+    args = parser.parse_args(argv)
+    executor = aio_server.make_executor(args.workers, args.processes)
+    worker = aio.TileWorker(executor=executor, max_concurrency=args.workers)
+    try:
+        elapsed, latencies, lags = asyncio.run(run(args, worker))
+    finally:
+        worker.shutdown()
+    print('%s pool, %d workers, %d connections, %d requests' % ('process' if args.processes else 'thread',
+        args.workers, args.concurrency, len(latencies)))
+    print('throughput      %10.1f requests/s' % (len(latencies) / elapsed))
+    print('latency p50     %10.1f ms' % (percentile(latencies, 0.5) * 1000.0))
+    print('latency p99     %10.1f ms' % (percentile(latencies, 0.99) * 1000.0))
+    print('loop lag p99    %10.1f ms' % (percentile(lags, 0.99) * 1000.0 if lags else 0.0))
+    print('loop lag max    %10.1f ms' % (max(lags) * 1000.0 if lags else 0.0))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+STATEMENTS = [
+    'import vector_tile_base',
+    'from vector_tile_base import validate',
+    'from vector_tile_base import size_report',
+    'from vector_tile_base import VectorTile',
+    'import google.protobuf.message',
+    'import numpy'
+]
+
+# Each statement is timed in a fresh interpreter so nothing it imports is
+# loaded already, only the statement itself is inside of the timing so the
+# start of the interpreter is not included.
+TEMPLATE = 'import time; start = time.perf_counter(); %s; print(time.perf_counter() - start)'
+
+def measure(statement, repeat):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = ROOT + os.pathsep + env.get('PYTHONPATH', '')
+    times = []
+    for i in range(repeat):
+        output = subprocess.check_output([sys.executable, '-c', TEMPLATE % statement], env=env, cwd=ROOT)
+        times.append(float(output.decode('ascii').strip()))
+    times.sort()
+    return times[len(times) // 2]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure the import time of vector_tile_base in fresh interpreters')
+    parser.add_argument('--repeat', type=int, default=9, help='Number of interpreters started per statement, the median is reported')
+    args = parser.parse_args(argv)
+    from vector_tile_base import protobuf_implementation
+    print('protobuf implementation: %s' % protobuf_implementation())
+    print('%-45s %10s' % ('statement', 'time (ms)'))
+    for statement in STATEMENTS:
+        try:
+            elapsed = measure(statement, args.repeat)
+        except subprocess.CalledProcessError:
+            print('%-45s %10s' % (statement, 'failed'))
+            continue
+        print('%-45s %10.1f' % (statement, elapsed * 1000.0))
+
+if __name__ == '__main__':
+    main()
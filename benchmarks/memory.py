@@ -0,0 +1,84 @@
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from vector_tile_base import VectorTile
+import scenarios
+
+# Measures memory held by decoded tiles with tracemalloc. Each step keeps
+# its results alive so the reported bytes are what a worker retains, not
+# the transient peak.
+
+def traced(func):
+    gc.collect()
+    before = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    result = func()
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    return result, current - before, peak - before
+
+def count_vertices(geometry):
+    if not geometry:
+        return 0
+    if isinstance(geometry[0], (int, float)):
+        return 1
+    return sum(count_vertices(part) for part in geometry)
+
+def access_attributes(vt):
+    for layer in vt.layers:
+        for feature in layer.features:
+            for key in feature.attributes:
+                feature.attributes[key]
+
+def access_geometry(vt):
+    return [feature.get_geometry() for layer in vt.layers for feature in layer.features]
+
+def measure(name, scale):
+    raw = scenarios.build(name, scale).serialize()
+    tracemalloc.start()
+    try:
+        vt, decode_bytes, decode_peak = traced(lambda: VectorTile(raw))
+        unused, attribute_bytes, attribute_peak = traced(lambda: access_attributes(vt))
+        geometry, geometry_bytes, geometry_peak = traced(lambda: access_geometry(vt))
+    finally:
+        tracemalloc.stop()
+    num_features = sum(len(layer.features) for layer in vt.layers)
+    features = [feature for layer in vt.layers for feature in layer.features]
+    num_vertices = 0
+    for feature, feature_geometry in zip(features, geometry):
+        if feature.type == 'spline':
+            # Only control points, not knots
+            feature_geometry = [spline[0] for spline in feature_geometry]
+        num_vertices = num_vertices + count_vertices(feature_geometry)
+    return {
+        'tile_bytes': len(raw),
+        'features': num_features,
+        'vertices': num_vertices,
+        'decode': (decode_bytes, decode_peak),
+        'attributes': (attribute_bytes, attribute_peak),
+        'geometry': (geometry_bytes, geometry_peak),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure memory held by decoded tiles')
+    parser.add_argument('scenarios', nargs='*', help='Scenarios to run, all by default: %s' % ', '.join(sorted(scenarios.SCENARIOS)))
+    parser.add_argument('--scale', type=float, default=0.25, help='Multiplier for the number of features in each scenario')
+    args = parser.parse_args(argv)
+    names = args.scenarios or sorted(scenarios.SCENARIOS)
+    print('%-16s %-10s %9s %9s %12s %12s %12s %12s' % ('scenario', 'step', 'features', 'vertices', 'retained KB', 'peak KB', 'B/feature', 'B/vertex'))
+    for name in names:
+        result = measure(name, args.scale)
+        for step in ['decode', 'attributes', 'geometry']:
+            retained, peak = result[step]
+            print('%-16s %-10s %9d %9d %12.1f %12.1f %12.1f %12.2f' % (name, step, result['features'], result['vertices'],
+                retained / 1024.0, peak / 1024.0, retained / float(max(result['features'], 1)),
+                retained / float(max(result['vertices'], 1))))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from vector_tile_base import VectorTile, Layer, vector_tile_pb2
+import scenarios
+from run import capture_tile, encode_tile
+
+# Stores benchmark timings as JSON baselines and compares later runs against
+# them. Baselines are keyed by Python version and protobuf runtime, a run is
+# only compared with a baseline recorded in the same environment.
+
+DEFAULT_BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+
+def environment_key():
+    try:
+        from google.protobuf import __version__ as protobuf_version
+    except ImportError:
+        protobuf_version = 'unknown'
+    try:
+        from google.protobuf.internal import api_implementation
+        implementation = api_implementation.Type()
+    except ImportError:
+        implementation = 'unknown'
+    return 'py%s-protobuf%s-%s' % ('.'.join(platform.python_version_tuple()[:2]), protobuf_version, implementation)
+
+def sample(func, repeat):
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return times
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return 0.5 * (values[middle - 1] + values[middle])
+
+def summarize(times):
+    m = median(times)
+    return {'median': m, 'mad': median([abs(t - m) for t in times]), 'min': min(times), 'samples': len(times)}
+
+def _build_layers(tile):
+    for layer in tile.layers:
+        Layer(layer)
+
+def _feature_geometry(vt):
+    for layer in vt.layers:
+        for feature in layer.features:
+            feature.get_geometry()
+
+def _feature_attributes(vt):
+    for layer in vt.layers:
+        for feature in layer.features:
+            for key in feature.attributes:
+                feature.attributes[key]
+
+def _layer_get_attributes(vt):
+    for layer in vt.layers:
+        for feature in layer.features:
+            pb = feature._feature
+            if layer._inline_attributes:
+                layer.get_attributes(pb.attributes)
+            else:
+                layer.get_attributes(pb.tags)
+
+def operations(name, scale):
+    raw = scenarios.build(name, scale).serialize()
+    tile = vector_tile_pb2.Tile()
+    tile.ParseFromString(raw)
+    # Each operation gets a fresh decode so cached attributes are not reused
+    return [
+        ('VectorTile.decode', lambda: VectorTile(raw)),
+        ('VectorTile.serialize', lambda vt=VectorTile(raw): vt.serialize()),
+        ('VectorTile.encode', lambda content=capture_tile(VectorTile(raw)): encode_tile(content)),
+        ('Layer.build', lambda: _build_layers(tile)),
+        ('Layer.get_attributes', lambda: _layer_get_attributes(VectorTile(raw))),
+        ('Feature.get_geometry', lambda: _feature_geometry(VectorTile(raw))),
+        ('Feature.attributes', lambda: _feature_attributes(VectorTile(raw))),
+    ]
+
+def run(names, scale, repeat):
+    results = {}
+    for name in names:
+        for operation, func in operations(name, scale):
+            func()
+            results['%s:%s' % (name, operation)] = summarize(sample(func, repeat))
+    return results
+
+def compare(baseline, current, threshold, noise_factor):
+    report = []
+    for key in sorted(current):
+        if key not in baseline:
+            report.append((key, None, current[key]['median'], None, 'new'))
+            continue
+        base = baseline[key]['median']
+        new = current[key]['median']
+        noise = noise_factor * (baseline[key]['mad'] + current[key]['mad'])
+        change = (new - base) / base if base > 0 else 0.0
+        if change > threshold and new - base > noise:
+            status = 'REGRESSION'
+        elif change < -threshold and base - new > noise:
+            status = 'improved'
+        else:
+            status = 'ok'
+        report.append((key, base, new, change, status))
+    return report
+
+def baseline_path(directory):
+    return os.path.join(directory, environment_key() + '.json')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Record and compare benchmark baselines')
+    parser.add_argument('command', choices=['save', 'compare'], help='Store a new baseline or compare with the stored one')
+    parser.add_argument('scenarios', nargs='*', help='Scenarios to run, all by default: %s' % ', '.join(sorted(scenarios.SCENARIOS)))
+    parser.add_argument('--scale', type=float, default=0.25, help='Multiplier for the number of features in each scenario')
+    parser.add_argument('--repeat', type=int, default=7, help='Number of timed runs of each operation')
+    parser.add_argument('--threshold', type=float, default=0.10, help='Relative change of the median reported as a regression')
+    parser.add_argument('--noise', type=float, default=3.0, help='Changes must also exceed this many median absolute deviations')
+    parser.add_argument('--baseline-dir', default=DEFAULT_BASELINE_DIR, help='Directory holding the JSON baselines')
+    args = parser.parse_args(argv)
+    names = args.scenarios or sorted(scenarios.SCENARIOS)
+    path = baseline_path(args.baseline_dir)
+    results = run(names, args.scale, args.repeat)
+    settings = {'scale': args.scale, 'repeat': args.repeat}
+
+    if args.command == 'save':
+        if not os.path.isdir(args.baseline_dir):
+            os.makedirs(args.baseline_dir)
+        data = {'environment': environment_key(), 'settings': settings, 'results': results}
+        if os.path.exists(path):
+            f = open(path)
+            existing = json.load(f)
+            f.close()
+            if existing.get('settings') == settings:
+                existing['results'].update(results)
+                data = existing
+        f = open(path, 'w')
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.close()
+        print('Saved %d results to %s' % (len(results), path))
+        return 0
+
+    if not os.path.exists(path):
+        print('No baseline for %s, run "save" first' % environment_key())
+        return 2
+    f = open(path)
+    baseline = json.load(f)
+    f.close()
+    if baseline.get('settings') != settings:
+        print('Baseline was recorded with %s, current run uses %s' % (baseline.get('settings'), settings))
+        return 2
+    report = compare(baseline['results'], results, args.threshold, args.noise)
+    print('%-40s %12s %12s %9s  %s' % ('operation', 'base (ms)', 'new (ms)', 'change', 'status'))
+    regressions = 0
+    for key, base, new, change, status in report:
+        if status == 'REGRESSION':
+            regressions = regressions + 1
+        base_text = '-' if base is None else '%.3f' % (base * 1000.0)
+        change_text = '-' if change is None else '%+.1f%%' % (change * 100.0)
+        print('%-40s %12s %12.3f %9s  %s' % (key, base_text, new * 1000.0, change_text, status))
+    if regressions:
+        print('%d operation(s) regressed' % regressions)
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,113 @@
+import argparse
+import sys
+import time
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from vector_tile_base import VectorTile, FloatList
+import scenarios
+
+def best_time(func, repeat):
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+def iterate_tile(vt):
+    for layer in vt.layers:
+        for feature in layer.features:
+            feature.get_geometry()
+            for key in feature.attributes:
+                feature.attributes[key]
+
+def capture_tile(vt):
+    # The content of the tile as plain values, so encoding can be timed
+    # without the cost of generating random data
+    layers = []
+    for layer in vt.layers:
+        elevation = None
+        if layer.elevation_scaling is not None:
+            scaling = layer.elevation_scaling
+            elevation = (scaling.offset, scaling.multiplier, scaling.base)
+        scalings = [(s.offset, s.multiplier, s.base) for s in layer.attribute_scalings]
+        features = []
+        for feature in layer.features:
+            if feature.type == 'polygon':
+                geometry = feature.get_rings()
+            else:
+                geometry = feature.get_geometry()
+            attributes = dict((key, feature.attributes[key]) for key in feature.attributes)
+            geometric_attributes = None
+            if layer.version > 2:
+                geometric_attributes = dict((key, feature.geometric_attributes[key]) for key in feature.geometric_attributes)
+            degree = feature.degree if feature.type == 'spline' else None
+            features.append((feature.type, feature.id, feature._has_elevation, degree, geometry, attributes, geometric_attributes))
+        layers.append((layer.name, layer.version, not layer._inline_attributes, elevation, scalings, features))
+    return layers
+
+def encode_tile(layers):
+    vt = VectorTile()
+    for name, version, legacy_attributes, elevation, scalings, features in layers:
+        layer = vt.add_layer(name, version=version, legacy_attributes=legacy_attributes)
+        if elevation is not None:
+            layer.add_elevation_scaling(*elevation)
+        scalings = [layer.add_attribute_scaling(*scaling) for scaling in scalings]
+        for geometry_type, feature_id, has_elevation, degree, geometry, attributes, geometric_attributes in features:
+            if geometry_type == 'point':
+                feature = layer.add_point_feature(has_elevation=has_elevation)
+                feature.add_points(geometry)
+            elif geometry_type == 'line_string':
+                feature = layer.add_line_string_feature(has_elevation=has_elevation)
+                for line_string in geometry:
+                    feature.add_line_string(line_string)
+            elif geometry_type == 'polygon':
+                feature = layer.add_polygon_feature(has_elevation=has_elevation)
+                for ring in geometry:
+                    feature.add_ring(ring)
+            else:
+                # Synthetic tiles use the first attribute scaling for all float lists
+                feature = layer.add_spline_feature(has_elevation=has_elevation, degree=degree)
+                for spline in geometry:
+                    feature.add_spline(spline[0], FloatList(scalings[0], spline[1]))
+            if feature_id is not None:
+                feature.id = feature_id
+            feature.attributes = attributes
+            if geometric_attributes:
+                feature.geometric_attributes = dict((key, FloatList(scalings[0], values)) for key, values in geometric_attributes.items())
+    return vt
+
+def run_scenario(name, scale, repeat):
+    raw = scenarios.build(name, scale).serialize()
+    decoded = VectorTile(raw)
+    num_features = sum(len(layer.features) for layer in decoded.layers)
+    results = {}
+    results['decode'] = best_time(lambda: VectorTile(raw), repeat)
+    results['iterate'] = best_time(lambda: iterate_tile(VectorTile(raw)), repeat) - results['decode']
+    content = capture_tile(decoded)
+    results['encode'] = best_time(lambda: encode_tile(content), repeat)
+    results['serialize'] = best_time(decoded.serialize, repeat)
+    return len(raw), num_features, results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time encode and decode hot paths on synthetic tiles')
+    parser.add_argument('scenarios', nargs='*', help='Scenarios to run, all by default: %s' % ', '.join(sorted(scenarios.SCENARIOS)))
+    parser.add_argument('--scale', type=float, default=1.0, help='Multiplier for the number of features in each scenario')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of runs, the best time is reported')
+    args = parser.parse_args(argv)
+    names = args.scenarios or sorted(scenarios.SCENARIOS)
+    print('%-16s %-10s %10s %10s %14s %10s' % ('scenario', 'operation', 'size (KB)', 'time (ms)', 'features/s', 'MB/s'))
+    for name in names:
+        size, num_features, results = run_scenario(name, args.scale, args.repeat)
+        for operation in ['decode', 'iterate', 'encode', 'serialize']:
+            elapsed = max(results[operation], 1e-9)
+            print('%-16s %-10s %10.1f %10.2f %14.0f %10.2f' % (name, operation, size / 1024.0, elapsed * 1000.0,
+                num_features / elapsed, size / elapsed / 1024.0 / 1024.0))
+
+if __name__ == '__main__':
+    main()
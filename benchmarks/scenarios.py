@@ -0,0 +1,26 @@
+from vector_tile_base.synthetic import generate_tile
+
+# Each scenario is a set of arguments for generate_tile, the feature counts
+# are multiplied by the scale passed to build.
+
+SCENARIOS = {
+    'points': dict(points=10000, line_strings=0, polygons=0, attributes=2, cardinality=10),
+    'dense_polygons': dict(points=0, line_strings=0, polygons=200, vertices=(150, 250), rings=(1, 2), attributes=1, cardinality=5),
+    'distinct_values': dict(points=5000, line_strings=0, polygons=0, attributes=7, cardinality=1000000, version=3),
+    'nested': dict(points=0, line_strings=2000, polygons=0, vertices=(5, 15), attributes=2, nesting=3, version=3),
+    'splines': dict(points=0, line_strings=0, polygons=0, splines=2000, vertices=(4, 12), attributes=1, version=3),
+    '3d': dict(points=0, line_strings=1000, polygons=0, vertices=(40, 60), attributes=1, version=3, elevation=True),
+    'mixed': dict(layers=4, points=2000, line_strings=2000, polygons=1000, vertices=(2, 200), vertex_distribution='lognormal', attributes=8, cardinality=500, version=3),
+}
+
+COUNTS = ['points', 'line_strings', 'polygons', 'splines']
+
+def scenario_arguments(name, scale=1.0):
+    kwargs = dict(SCENARIOS[name])
+    for count in COUNTS:
+        if kwargs.get(count):
+            kwargs[count] = max(1, int(kwargs[count] * scale))
+    return kwargs
+
+def build(name, scale=1.0, seed=0):
+    return generate_tile(seed=seed, **scenario_arguments(name, scale))
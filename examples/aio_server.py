@@ -0,0 +1,135 @@
+import argparse
+import asyncio
+import concurrent.futures
+import functools
+import multiprocessing
+import os
+import sys
+from urllib.parse import urlsplit, parse_qs
+
+import vector_tile_base
+from vector_tile_base import aio
+from vector_tile_base.synthetic import generate_tile
+
+# A minimal stand-in HTTP tile server built on vector_tile_base.aio. Tiles are
+# read from a directory laid out as {z}/{x}/{y}.mvt, or generated when no
+# directory is given. Query parameters:
+#   layers=a,b   only return the listed layers
+#   version=2    downgrade version 3 layers to version 2
+
+@functools.lru_cache(maxsize=256)
+def synthetic_tile(z, x, y):
+    # Seeded by the tile address so every request for a tile returns the same data
+    return generate_tile(seed=(z << 40) + (x << 20) + y, points=200, line_strings=200, polygons=100, version=3).serialize()
+
+def read_tile(root, z, x, y):
+    if root is None:
+        return synthetic_tile(z, x, y)
+    path = os.path.join(root, str(z), str(x), '%d.mvt' % y)
+    if not os.path.isfile(path):
+        return None
+    with open(path, 'rb') as f:
+        return f.read()
+
+def downgrade(vt, version):
+    # Module level so it can be sent to a process pool
+    if version == 2:
+        return vector_tile_base.downgrade_to_v2(vt)
+    return vt
+
+def parse_path(path):
+    parts = path.strip('/').split('/')
+    if len(parts) != 3 or not parts[2].endswith('.mvt'):
+        return None
+    try:
+        return int(parts[0]), int(parts[1]), int(parts[2][:-4])
+    except ValueError:
+        return None
+
+async def respond(writer, status, body=b'', content_type='text/plain'):
+    reason = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 500: 'Internal Server Error'}[status]
+    writer.write(('HTTP/1.1 %d %s\r\nContent-Type: %s\r\nContent-Length: %d\r\nConnection: keep-alive\r\n\r\n' %
+        (status, reason, content_type, len(body))).encode('ascii') + body)
+    await writer.drain()
+
+async def handle_request(root, worker, method, target):
+    url = urlsplit(target)
+    address = parse_path(url.path)
+    if method != 'GET' or address is None:
+        return 400, b'expected GET /{z}/{x}/{y}.mvt\n'
+    query = parse_qs(url.query)
+    # Reading files and generating synthetic tiles also blocks, keep it off the loop
+    raw = await worker.run(read_tile, root, *address)
+    if raw is None:
+        return 404, b'tile not found\n'
+    layers = None
+    if 'layers' in query:
+        layers = query['layers'][0].split(',')
+    version = int(query.get('version', ['3'])[0])
+    if layers is None and version != 2:
+        return 200, raw
+    return 200, await worker.transform(downgrade, raw, version, layers=layers)
+
+async def handle_connection(root, worker, reader, writer):
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            while True:
+                header = await reader.readline()
+                if header in (b'\r\n', b'\n', b''):
+                    break
+            try:
+                method, target, version = request_line.decode('latin-1').split()
+                status, body = await handle_request(root, worker, method, target)
+            except Exception as e:
+                status, body = 500, (str(e) + '\n').encode('utf-8')
+            content_type = 'application/vnd.mapbox-vector-tile' if status == 200 else 'text/plain'
+            await respond(writer, status, body, content_type)
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+def make_executor(workers, processes=False):
+    if not processes:
+        return concurrent.futures.ThreadPoolExecutor(workers)
+    # Worker processes are started on first use, when forked they would inherit
+    # the open client sockets and keep connections from closing
+    context = None
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+    return concurrent.futures.ProcessPoolExecutor(workers, mp_context=context)
+
+async def start_server(root=None, host='127.0.0.1', port=8080, worker=None):
+    if worker is None:
+        worker = aio.default_worker()
+    return await asyncio.start_server(lambda r, w: handle_connection(root, worker, r, w), host, port)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve vector tiles over HTTP with asyncio')
+    parser.add_argument('root', nargs='?', help='Directory of {z}/{x}/{y}.mvt tiles, synthetic tiles are served if omitted')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Number of executor workers')
+    parser.add_argument('--processes', action='store_true', help='Use a process pool instead of a thread pool')
+    parser.add_argument('--max-concurrency', type=int, default=None, help='Tiles processed at the same time, defaults to the number of workers')
+    args = parser.parse_args(argv)
+    executor = make_executor(args.workers, args.processes)
+    worker = aio.configure(executor=executor, max_concurrency=args.max_concurrency or args.workers)
+
+    async def serve():
+        server = await start_server(args.root, args.host, args.port, worker)
+        print('serving on http://%s:%d/{z}/{x}/{y}.mvt' % (args.host, args.port))
+        async with server:
+            await server.serve_forever()
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        worker.shutdown()
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -28,10 +28,13 @@ setup(name='vector_tile_base',
         'protobuf'
       ],
       extras_require={
-        'test': ['pytest'],
+        'test': ['pytest', 'numpy'],
+        'numpy': ['numpy'],
       },
       entry_points="""
       # -*- Entry points: -*-
+      [console_scripts]
+      vtb=vector_tile_base.cli:main
       """,
       )
 
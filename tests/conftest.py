@@ -18,6 +18,17 @@ def load_vector_tile(name):
     f.close()
     return VectorTile(test_data)
 
+def make_tile(names=('roads', 'water'), features=1):
+    # Point features named after their layer, shared by the cache, async and archive tests
+    vt = VectorTile()
+    for name in names:
+        layer = vt.add_layer(name)
+        for i in range(features):
+            feature = layer.add_point_feature()
+            feature.add_points([10 + i, 10 + i])
+            feature.attributes = {'name': name}
+    return vt
+
 @pytest.fixture()
 def vt(request):
     if request.node.originalname is None:
@@ -0,0 +1,84 @@
+import asyncio
+import concurrent.futures
+import threading
+import time
+import pytest
+from conftest import make_tile
+from vector_tile_base import VectorTile, aio
+
+def rename(vt, name):
+    vt.layers[0].name = name
+
+def feature_count(vt):
+    return sum(len(layer.features) for layer in vt.layers)
+
+def test_decode_and_encode():
+    raw = make_tile().serialize()
+    async def run():
+        vt = await aio.decode(raw)
+        only_water = await aio.decode(raw, layers=['water'])
+        encoded = await aio.encode(make_tile)
+        return vt, only_water, encoded
+    vt, only_water, encoded = asyncio.run(run())
+    assert [layer.name for layer in vt.layers] == ['roads', 'water']
+    assert [layer.name for layer in only_water.layers] == ['water']
+    assert only_water.layers[0].features[0].attributes['name'] == 'water'
+    assert encoded == raw
+
+def test_transform():
+    raw = make_tile().serialize()
+    worker = aio.TileWorker(concurrent.futures.ThreadPoolExecutor(2), max_concurrency=2)
+    async def run():
+        renamed = await worker.transform(rename, raw, 'streets', layers=['roads'])
+        count = await worker.transform(feature_count, raw)
+        return renamed, count
+    try:
+        renamed, count = asyncio.run(run())
+    finally:
+        worker.shutdown()
+    assert [layer.name for layer in VectorTile(renamed).layers] == ['streets']
+    assert count == 2
+
+def test_process_pool():
+    raw = make_tile().serialize()
+    worker = aio.TileWorker(concurrent.futures.ProcessPoolExecutor(1))
+    async def run():
+        count = await worker.transform(feature_count, raw, layers=['water'])
+        with pytest.raises(Exception):
+            await worker.decode(raw)
+        return count
+    try:
+        assert asyncio.run(run()) == 1
+    finally:
+        worker.shutdown()
+
+def test_max_concurrency():
+    lock = threading.Lock()
+    state = {'running': 0, 'peak': 0}
+    def work():
+        with lock:
+            state['running'] = state['running'] + 1
+            state['peak'] = max(state['peak'], state['running'])
+        time.sleep(0.01)
+        with lock:
+            state['running'] = state['running'] - 1
+    worker = aio.TileWorker(concurrent.futures.ThreadPoolExecutor(8), max_concurrency=2)
+    async def run():
+        await asyncio.gather(*[worker.run(work) for i in range(10)])
+    try:
+        asyncio.run(run())
+        # Semaphores are per event loop, a second loop works as well
+        asyncio.run(run())
+    finally:
+        worker.shutdown()
+    assert state['peak'] == 2
+
+def test_configure():
+    default = aio.default_worker()
+    try:
+        worker = aio.configure(max_concurrency=1)
+        assert aio.default_worker() is worker
+        assert worker.max_concurrency == 1
+        assert asyncio.run(aio.encode(make_tile)) == make_tile().serialize()
+    finally:
+        aio._default_worker = default
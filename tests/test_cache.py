@@ -0,0 +1,116 @@
+import sys
+import threading
+from conftest import make_tile
+from vector_tile_base import VectorTile, TileCache, instrumentation
+from vector_tile_base.cache import content_key
+from vector_tile_base.synthetic import generate_tile
+
+def test_lazy_tile():
+    raw = make_tile(['roads', 'water', 'parks']).serialize()
+    with instrumentation.instrumented() as stats:
+        vt = VectorTile(raw, lazy=True)
+        water = vt.get_layer('water')
+        assert water.features[0].attributes['name'] == 'water'
+        assert vt.get_layer('missing') is None
+        assert stats.count('layer_build') == 1
+        assert [layer.name for layer in vt.layers] == ['roads', 'water', 'parks']
+        assert stats.count('layer_build') == 3
+    assert vt.layers[1] is water
+    assert vt.serialize() == raw
+    vt.add_layer('new')
+    assert vt.get_layer('new').name == 'new'
+
+def test_lazy_tile_serialize_keeps_order():
+    raw = make_tile(['a', 'b', 'c']).serialize()
+    vt = VectorTile(raw, lazy=True)
+    vt.get_layer('c')
+    assert vt.serialize() == raw
+
+def test_hits_and_misses():
+    raw = make_tile().serialize()
+    cache = TileCache()
+    vt = cache.decode(raw)
+    assert cache.decode(raw) is vt
+    assert cache.decode(bytearray(raw)) is vt
+    assert content_key(raw) in cache
+    assert cache.get('missing') is None
+    stats = cache.stats()
+    assert stats['hits'] == 2
+    assert stats['misses'] == 2
+    assert stats['tiles'] == 1
+    assert stats['bytes'] == len(raw)
+    assert [layer.name for layer in vt.layers] == ['roads', 'water']
+
+def test_tile_keys():
+    cache = TileCache(lazy=False)
+    vt = cache.decode(make_tile(['roads']).serialize(), key=(14, 1, 2))
+    assert cache.decode(make_tile(['water']).serialize(), key=(14, 1, 2)) is vt
+    assert cache.get((14, 1, 2)) is vt
+    cache.discard((14, 1, 2))
+    assert len(cache) == 0
+    assert cache.stats()['bytes'] == 0
+
+def test_eviction():
+    tiles = [make_tile([str(i)]).serialize() for i in range(4)]
+    size = len(tiles[0])
+    cache = TileCache(max_bytes=size * 2)
+    for raw in tiles[:2]:
+        cache.decode(raw)
+    # Use the first tile so the second one is the least recently used
+    cache.decode(tiles[0])
+    cache.decode(tiles[2])
+    assert content_key(tiles[0]) in cache
+    assert content_key(tiles[1]) not in cache
+    assert content_key(tiles[2]) in cache
+    assert cache.stats()['evictions'] == 1
+    assert cache.stats()['bytes'] == size * 2
+    # Tiles larger than the cache are decoded but not kept
+    small = TileCache(max_bytes=size - 1)
+    assert small.decode(tiles[3]).layers[0].name == '3'
+    assert len(small) == 0
+    cache.clear()
+    assert len(cache) == 0
+
+def test_threads():
+    tiles = [make_tile([str(i)], features=10).serialize() for i in range(8)]
+    cache = TileCache(max_bytes=len(tiles[0]) * 4)
+    errors = []
+    def work(offset):
+        try:
+            for i in range(50):
+                raw = tiles[(i + offset) % len(tiles)]
+                vt = cache.decode(raw)
+                assert len(vt.layers[0].features) == 10
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    stats = cache.stats()
+    assert stats['hits'] + stats['misses'] == 200
+    assert stats['bytes'] <= cache.max_bytes
+
+def test_threads_read_geometry_of_cached_tile():
+    raw = generate_tile(seed=3, points=50, line_strings=50, polygons=50, version=3, elevation=True).serialize()
+    expected = [feature.get_geometry() for feature in VectorTile(raw).layers[0].features]
+    cache = TileCache()
+    errors = []
+    def read():
+        vt = cache.decode(raw)
+        for i in range(5):
+            if [feature.get_geometry() for feature in vt.layers[0].features] != expected:
+                errors.append(i)
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=read) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert errors == []
@@ -0,0 +1,114 @@
+import gzip
+import json
+import os
+import pytest
+import zipfile
+from vector_tile_base import VectorTile, cli, pmtiles
+
+VALID = os.path.join('tests', 'data', 'valid')
+
+def run(argv, capsys):
+    code = cli.main(argv)
+    return code, capsys.readouterr().out
+
+def test_iter_sources(tmpdir):
+    archive = str(tmpdir.join('tiles.zip'))
+    with zipfile.ZipFile(archive, 'w') as z:
+        z.write(os.path.join(VALID, 'single_layer_v2_points.mvt'), '0/0/0.mvt')
+        z.writestr('readme.txt', 'not a tile')
+    sources = list(cli.iter_sources([VALID, archive]))
+    assert len(sources) == 9
+    assert sources[-1] == (archive, '0/0/0.mvt')
+    assert cli.source_name(sources[-1]) == archive + '!0/0/0.mvt'
+    assert VectorTile(cli.read_source(sources[-1])).layers[0].name == 'points'
+
+def test_info(capsys):
+    code, out = run(['info', '-j', '1', os.path.join(VALID, 'single_layer_v2_points.mvt')], capsys)
+    assert code == 0
+    assert '1 layers' in out
+    assert 'points (v2): 4 features' in out
+
+def test_dump(capsys):
+    code, out = run(['dump', os.path.join(VALID, 'single_layer_v2_polygon.mvt')], capsys)
+    assert code == 0
+    data = json.loads(out)
+    assert data['layers'][0]['name'] == 'polygons'
+    feature = data['layers'][0]['features'][0]
+    assert feature['id'] == 7
+    assert feature['attributes'] == {'natural': 'wood'}
+    assert feature['geometry'] == [[[[0,0],[10,0],[10,10],[0,10],[0,0]],[[3,3],[3,5],[5,5],[3,3]]]]
+
+def test_convert(tmpdir, capsys):
+    output = str(tmpdir.join('out'))
+    code, out = run(['convert', '-j', '2', '--downgrade', '--gzip', '-o', output, VALID], capsys)
+    assert code == 0
+    assert 'converted 8 tiles' in out
+    with gzip.open(os.path.join(output, 'single_layer_v3_points_3d.mvt.gz'), 'rb') as f:
+        vt = VectorTile(f.read())
+    assert vt.layers[0].version == 2
+    assert vt.layers[0].features[0].get_points() == [[20, 20]]
+
+def test_convert_keeps_tree(tmpdir, capsys):
+    data = open(os.path.join(VALID, 'single_layer_v2_points.mvt'), 'rb').read()
+    for z in ('0', '1'):
+        tmpdir.join('in', z, '0').ensure(dir=True)
+        tmpdir.join('in', z, '0', '0.mvt').write_binary(data)
+    output = str(tmpdir.join('out'))
+    code, out = run(['convert', '-o', output, str(tmpdir.join('in'))], capsys)
+    assert code == 0
+    assert 'converted 2 tiles' in out
+    assert os.path.isfile(os.path.join(output, '0', '0', '0.mvt'))
+    assert os.path.isfile(os.path.join(output, '1', '0', '0.mvt'))
+    with pytest.raises(Exception):
+        run(['convert', '-o', output, str(tmpdir.join('in', '0', '0')), str(tmpdir.join('in', '1', '0'))], capsys)
+
+def test_convert_archive(tmpdir, capsys, monkeypatch):
+    path = str(tmpdir.join('tiles.pmtiles'))
+    data = open(os.path.join(VALID, 'single_layer_v2_points.mvt'), 'rb').read()
+    with pmtiles.PMTilesWriter(path) as writer:
+        writer.write(1, 1, 0, data)
+        writer.write(1, 0, 1, data)
+    output = str(tmpdir.join('out'))
+    code, out = run(['convert', '-o', output, path], capsys)
+    assert code == 0
+    assert os.path.isfile(os.path.join(output, '1', '1', '0.mvt'))
+    assert list(cli.iter_sources([output])) == [(os.path.join(output, '1', '0', '1.mvt'), None), (os.path.join(output, '1', '1', '0.mvt'), None)]
+    # Archives are closed when the sources are not all read
+    closed = []
+    open_archive = cli._open_archive
+    def track(path):
+        reader = open_archive(path)
+        close = reader.close
+        def tracked_close():
+            closed.append(path)
+            close()
+        reader.close = tracked_close
+        return reader
+    monkeypatch.setattr(cli, '_open_archive', track)
+    sources = cli.iter_sources([path])
+    next(sources)
+    sources.close()
+    assert closed == [path]
+
+def test_stats(capsys):
+    code, out = run(['stats', '-j', '2', '--json', VALID], capsys)
+    assert code == 0
+    data = json.loads(out)
+    assert data['tiles'] == 8
+    assert data['layers']['points']['features'] == 4
+    assert data['layers']['lines']['keys']['highway'] > 0
+
+def test_validate(tmpdir, capsys):
+    broken = tmpdir.join('broken.mvt')
+    broken.write_binary(b'\x1a\x05\x0a\x03ab')
+    code, out = run(['validate', '-j', '1', VALID], capsys)
+    assert code == 0
+    assert '8 tiles, 0 invalid' in out
+    code, out = run(['validate', '-j', '1', VALID, str(broken)], capsys)
+    assert code == 1
+    assert '9 tiles, 1 invalid' in out
+
+def test_bench(capsys):
+    code, out = run(['bench', '--repeat', '1', VALID], capsys)
+    assert code == 0
+    assert 'decode' in out
@@ -0,0 +1,94 @@
+import os
+import pytest
+from vector_tile_base import VectorTile
+from vector_tile_base.synthetic import generate_tile
+
+VALID = os.path.join('tests', 'data', 'valid')
+
+def read_tile(name):
+    return VectorTile(open(os.path.join(VALID, name), 'rb').read())
+
+def attribute_values(column):
+    # Python values of an attribute column, None where there is no value
+    if column['type'] == 'dictionary':
+        values = [column['dictionary'][i] for i in column['indices']]
+    else:
+        values = list(column['values'])
+    return [v if valid else None for v, valid in zip(values, column['validity'])]
+
+def test_attributes_match_features():
+    tiles = [read_tile(name) for name in sorted(os.listdir(VALID))]
+    tiles.append(VectorTile(generate_tile(seed=5, points=20, line_strings=20, polygons=20, version=2).serialize()))
+    tiles.append(VectorTile(generate_tile(seed=5, points=20, line_strings=20, polygons=20, version=3).serialize()))
+    checked = 0
+    for vt in tiles:
+        for layer in vt.layers:
+            table = layer.to_columns(arrow=False)
+            assert table['num_rows'] == len(layer.features)
+            for name in table['names']:
+                column = table['columns'][name]
+                if name in ('id', 'geometry', 'string_id'):
+                    continue
+                values = attribute_values(column)
+                for feature, value in zip(layer.features, values):
+                    attributes = feature.attributes
+                    if name not in attributes or attributes[name] is None:
+                        assert value is None
+                    else:
+                        assert value == attributes[name]
+                        checked = checked + 1
+    assert checked > 100
+
+def test_dictionary_uses_string_table():
+    vt = VectorTile()
+    layer = vt.add_layer('roads', version=3)
+    for highway in ['primary', 'secondary', 'primary', None]:
+        feature = layer.add_point_feature()
+        feature.add_points([1, 1])
+        if highway is not None:
+            feature.attributes = {'highway': highway, 'lanes': 2}
+    layer = VectorTile(vt.serialize()).layers[0]
+    table = layer.to_columns(arrow=False)
+    column = table['columns']['highway']
+    assert column['type'] == 'dictionary'
+    assert column['dictionary'] is layer._string_values
+    assert list(column['validity']) == [True, True, True, False]
+    assert column['indices'][0] == column['indices'][2]
+    assert table['columns']['lanes']['type'] == 'int64'
+    assert list(table['columns']['id']['validity']) == [False] * 4
+
+def test_geometry_offsets():
+    vt = VectorTile()
+    layer = vt.add_layer('polygons', version=3)
+    feature = layer.add_polygon_feature()
+    feature.add_ring([[0, 0], [10, 0], [10, 10], [0, 0]])
+    feature.add_ring([[2, 2], [2, 4], [4, 4], [2, 2]])
+    feature.add_ring([[20, 20], [30, 20], [30, 30], [20, 20]])
+    layer.add_polygon_feature()
+    geometry = layer.to_columns(arrow=False)['columns']['geometry']
+    assert geometry['type'] == 'geoarrow.multipolygon'
+    assert geometry['dimensions'] == 'xy'
+    assert [list(level) for level in geometry['offsets']] == [[0, 2, 2], [0, 2, 3], [0, 4, 8, 12]]
+    assert list(geometry['validity']) == [True, False]
+    assert geometry['coords'][4].tolist() == [2, 2]
+
+def test_mixed_geometry_is_wkb():
+    vt = VectorTile()
+    layer = vt.add_layer('mixed', version=3)
+    layer.add_point_feature().add_points([10, 20])
+    layer.add_line_string_feature().add_line_string([[0, 0], [5, 5]])
+    geometry = layer.to_columns(arrow=False)['columns']['geometry']
+    data, offsets = layer.to_wkb(packed=True)
+    assert geometry['type'] == 'geoarrow.wkb'
+    assert geometry['data'] == data
+    assert list(geometry['offsets']) == list(offsets)
+
+def test_arrow():
+    pa = pytest.importorskip('pyarrow')
+    layer = read_tile('single_layer_v2_polygon.mvt').layers[0]
+    table = layer.to_columns()
+    assert isinstance(table, pa.Table)
+    assert table.num_rows == len(layer.features)
+    field = table.schema.field('geometry')
+    assert field.metadata[b'ARROW:extension:name'] == b'geoarrow.multipolygon'
+    assert table.column('natural').to_pylist() == [f.attributes['natural'] for f in layer.features]
@@ -94,6 +94,8 @@ def test_valid_single_layer_v2_polygon(vt):
     assert geometry == multi_polygons[0]
     assert len(geometry) == 2
     assert geometry == [[[0,0],[10,0],[10,10],[0,10],[0,0]],[[3,3],[3,5],[5,5],[3,3]]]
+    assert feature.get_rings(with_areas=True) == (geometry, [100.0, -2.0])
+    assert feature.get_polygons(with_areas=True) == ([geometry], [[100.0, -2.0]])
     props = feature.attributes
     assert isinstance(props, FeatureAttributes)
     assert len(props) == 1
@@ -298,3 +300,24 @@ def test_valid_all_attribute_types_v3(vt):
     }
     assert feature.attributes == expected_attributes
 
+
+def test_wrappers_are_lazy():
+    with open('tests/data/valid/single_layer_v3_spline_3d.mvt', 'rb') as f:
+        vt = VectorTile(f.read())
+    layer = vt.layers[0]
+    feature = layer.features[0]
+    # Engine objects use slots, so none of them has an instance dict
+    for obj in [layer, feature, layer.elevation_scaling] + list(layer.attribute_scalings):
+        assert not hasattr(obj, '__dict__')
+    assert feature._attributes is None
+    assert feature._geometric_attributes is None
+    assert feature.cursor is None
+    assert isinstance(feature.attributes, FeatureAttributes)
+    assert not hasattr(feature.attributes, '__dict__')
+    assert feature._geometric_attributes is None
+    feature.geometric_attributes
+    assert feature._geometric_attributes is not None
+    assert feature.cursor is None
+    # Reading geometry does not create the cursor, it is only used for encoding
+    feature.get_geometry()
+    assert feature.cursor is None
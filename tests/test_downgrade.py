@@ -0,0 +1,98 @@
+import os
+from vector_tile_base import VectorTile, LineStringFeature, PolygonFeature, FloatList, Float, UInt, downgrade_to_v2
+
+def load_raw(folder, name):
+    f = open(os.path.join('tests', 'data', folder, name + '.mvt'), 'rb')
+    data = f.read()
+    f.close()
+    return data
+
+def test_downgrade_v2_tile_is_copied():
+    raw = load_raw('valid', 'single_layer_v2_polygon')
+    vt = downgrade_to_v2(raw)
+    assert vt.serialize() == raw
+
+def test_downgrade_inline_attributes():
+    vt = VectorTile()
+    layer = vt.add_layer('test', version=3, x=1, y=1, zoom=2)
+    scaling = layer.add_attribute_scaling(precision=10.0**-8, min_value=0.0, max_value=25.0)
+    feature = layer.add_polygon_feature(has_elevation=True)
+    feature.id = 'feature_a'
+    feature.add_ring([[0,0,10],[10,0,20],[10,10,30],[0,10,20],[0,0,10]])
+    feature.attributes = {
+        'string': 'a_string',
+        'float': Float(1.5),
+        'double': 2.5,
+        'uint': UInt(2**60),
+        'int': -2**60,
+        'bool': True,
+        'null': None,
+        'map': {'key': 1, 'nested': {'deep': 'value'}},
+        'list': [1, 2],
+        'dlist': FloatList(scaling, [1.0, 2.0])
+    }
+    feature = layer.add_point_feature()
+    feature.id = 3
+    feature.add_points([[1,1],[2,2]])
+    feature.attributes = {'string': 'a_string', 'other': 'a_string'}
+
+    new_vt = downgrade_to_v2(vt)
+    layer = new_vt.layers[0]
+    assert layer.version == 2
+    assert layer.x is None
+    assert layer.y is None
+    assert layer.zoom is None
+    assert layer.elevation_scaling is None
+    assert len(layer.attribute_scalings) == 0
+    assert len(layer.features) == 2
+    feature = layer.features[0]
+    assert isinstance(feature, PolygonFeature)
+    assert not feature.has_elevation
+    assert feature.id is None
+    assert feature.get_polygons() == [[[[0,0],[10,0],[10,10],[0,10],[0,0]]]]
+    assert feature.attributes == {
+        'string': 'a_string',
+        'float': 1.5,
+        'double': 2.5,
+        'uint': 2**60,
+        'int': -2**60,
+        'bool': True
+    }
+    feature = layer.features[1]
+    assert feature.id == 3
+    assert feature.get_points() == [[1,1],[2,2]]
+    assert feature.attributes == {'string': 'a_string', 'other': 'a_string'}
+    # Shared values are stored once in the values table
+    assert len(layer._layer.values) == 6
+
+    data = new_vt.serialize()
+    new_vt = VectorTile(data)
+    assert new_vt.layers[0].features[1].attributes == {'string': 'a_string', 'other': 'a_string'}
+
+def test_downgrade_flatten_nested():
+    vt = VectorTile()
+    layer = vt.add_layer('test', version=3)
+    feature = layer.add_point_feature()
+    feature.add_points([1,1])
+    feature.attributes = {'map': {'key': 1, 'nested': {'deep': 'value'}}, 'list': [1, None, 'a']}
+    new_vt = downgrade_to_v2(vt, flatten_nested=True)
+    feature = new_vt.layers[0].features[0]
+    assert feature.attributes == {'map.key': 1, 'map.nested.deep': 'value', 'list.0': 1, 'list.2': 'a'}
+
+def test_downgrade_spline():
+    raw = load_raw('valid', 'single_layer_v3_spline_3d')
+    new_vt = downgrade_to_v2(raw, spline_samples=4)
+    layer = new_vt.layers[0]
+    assert layer.version == 2
+    feature = layer.features[0]
+    assert isinstance(feature, LineStringFeature)
+    assert feature.id == 16
+    assert feature.attributes == {'natural': 'spline'}
+    line_strings = feature.get_line_strings()
+    assert len(line_strings) == 1
+    line_string = line_strings[0]
+    assert len(line_string) > 2
+    for pt in line_string:
+        assert len(pt) == 2
+        assert 8 <= pt[0] <= 12
+        assert 9 <= pt[1] <= 11
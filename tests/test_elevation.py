@@ -0,0 +1,58 @@
+import pytest
+from vector_tile_base import engine, VectorTile
+
+def create_contour_tile():
+    vt = VectorTile()
+    layer = vt.add_layer('contours', version=3)
+    layer.add_elevation_scaling(precision=10.0**-3, min_value=-500.0, max_value=9000.0)
+    feature = layer.add_line_string_feature(has_elevation=True)
+    feature.add_line_string([[i, i * 2, 100.0 + i * 0.3456] for i in range(100)])
+    feature.add_line_string([[i, 5, 8848.86 - i * 12.5] for i in range(50)])
+    feature = layer.add_point_feature(has_elevation=True)
+    feature.add_points([[1, 1, -499.0], [2, 2, 0.0004]])
+    return vt
+
+def test_elevation_matches_python_path(monkeypatch):
+    data = create_contour_tile().serialize()
+    decoded = [f.get_geometry() for f in VectorTile(data).layers[0].features]
+    monkeypatch.setattr(engine, 'np', None)
+    assert create_contour_tile().serialize() == data
+    assert [f.get_geometry() for f in VectorTile(data).layers[0].features] == decoded
+
+def test_elevation_quantization_error():
+    vt = create_contour_tile()
+    layer = vt.layers[0]
+    error = layer.elevation_scaling.max_quantization_error
+    assert error == layer.elevation_scaling.multiplier / 2.0
+    assert error < 10.0**-3
+    line_strings = VectorTile(vt.serialize()).layers[0].features[0].get_line_strings()
+    for i in range(100):
+        assert abs(line_strings[0][i][2] - (100.0 + i * 0.3456)) <= error
+    for i in range(50):
+        assert abs(line_strings[1][i][2] - (8848.86 - i * 12.5)) <= error
+
+def test_elevation_out_of_range():
+    vt = VectorTile()
+    layer = vt.add_layer('test', version=3)
+    layer.add_elevation_scaling(multiplier=10.0**-3)
+    feature = layer.add_line_string_feature(has_elevation=True)
+    feature.add_line_string([[0, 0, 1.0], [1, 1, 2.0]])
+    with pytest.raises(Exception):
+        feature.add_line_string([[0, 0, -10.0**7], [1, 1, 10.0**7]])
+    # Failed additions leave the feature untouched
+    assert len(feature.get_line_strings()) == 1
+    assert len(feature._feature.elevation) == 2
+    feature.add_line_string([[2, 2, 3.0], [3, 3, 4.0]])
+    line_strings = feature.get_line_strings()
+    assert line_strings[1][1][2] == pytest.approx(4.0)
+
+def test_elevation_cursor_without_elevation_decode():
+    vt = VectorTile()
+    layer = vt.add_layer('test', version=3)
+    feature = layer.add_point_feature(has_elevation=True)
+    feature.add_points([[1, 1, 10], [2, 2, 20]])
+    vt = VectorTile(vt.serialize())
+    feature = vt.layers[0].features[0]
+    assert feature.get_points(no_elevation=True) == [[1, 1], [2, 2]]
+    feature.add_points([3, 3, 30])
+    assert feature.get_points() == [[1, 1, 10], [2, 2, 20], [3, 3, 30]]
@@ -579,6 +579,9 @@ def test_create_polygon_feature():
     assert feature.get_rings() == [polygon[1], polygon[0]]
     # First ring in wrong winding order so dropped from polygon output
     assert feature.get_polygons() == [[polygon[0]]]
+    rings, areas = feature.get_rings(with_areas=True)
+    assert [area < 0 for area in areas] == [True, False]
+    assert feature.get_polygons(with_areas=True)[1] == [[areas[1]]]
 
     # clear current geometry
     feature.clear_geometry()
@@ -0,0 +1,59 @@
+import random
+import pytest
+from vector_tile_base import engine, VectorTile, FloatList
+
+def create_float_list_tile():
+    random.seed(3)
+    vt = VectorTile()
+    layer = vt.add_layer('test', version=3)
+    scaling1 = layer.add_attribute_scaling(precision=10.0**-6, min_value=-1000.0, max_value=1000.0)
+    scaling2 = layer.add_attribute_scaling(offset=10, base=8.0, multiplier=7.450580596923828e-09)
+    values = [random.uniform(-1000.0, 1000.0) for i in range(2000)]
+    values[5] = None
+    values[6] = None
+    values[1999] = None
+    feature = layer.add_line_string_feature()
+    feature.add_line_string([[0,0],[1,1]])
+    feature.attributes = {
+        'values': FloatList(scaling1, values),
+        'small': FloatList(scaling2, [None, 1.0, 2.5, -3, 8.0]),
+        'empty': FloatList(scaling1, [])
+    }
+    feature.geometric_attributes = {'dlist': FloatList(scaling2, [1.0, None])}
+    return vt, values
+
+def test_float_list_matches_python_path(monkeypatch):
+    vt, values = create_float_list_tile()
+    data = vt.serialize()
+    feature = VectorTile(data).layers[0].features[0]
+    attributes = dict((k, feature.attributes[k]) for k in feature.attributes)
+    geometric_attributes = dict((k, feature.geometric_attributes[k]) for k in feature.geometric_attributes)
+    monkeypatch.setattr(engine, 'np', None)
+    python_vt, python_values = create_float_list_tile()
+    assert python_vt.serialize() == data
+    feature = VectorTile(data).layers[0].features[0]
+    assert feature.attributes == attributes
+    assert feature.geometric_attributes == geometric_attributes
+    decoded = attributes['values']
+    for i in range(len(values)):
+        if values[i] is None:
+            assert decoded[i] is None
+        else:
+            assert abs(decoded[i] - values[i]) < 10.0**-6
+
+def test_float_list_arrays():
+    np = pytest.importorskip('numpy')
+    vt = VectorTile()
+    layer = vt.add_layer('test', version=3)
+    scaling = layer.add_attribute_scaling(precision=10.0**-6, min_value=0.0, max_value=100.0)
+    values = np.linspace(0.0, 100.0, 1001)
+    mask = np.zeros(len(values), dtype=bool)
+    mask[::10] = True
+    flist = FloatList.from_array(scaling, values, mask)
+    assert flist == FloatList(scaling, [None if m else v for v, m in zip(values.tolist(), mask.tolist())])
+    out, out_mask = flist.to_array()
+    assert (out_mask == mask).all()
+    assert np.isnan(out[mask]).all()
+    assert np.abs(out[~mask] - values[~mask]).max() < 10.0**-6
+    assert flist.get_all_values()[0] is None
+    assert FloatList.from_array(scaling, values) == FloatList(scaling, values.tolist())
@@ -0,0 +1,85 @@
+import io
+import json
+import os
+import pytest
+from vector_tile_base import VectorTile
+from vector_tile_base.synthetic import generate_tile
+from vector_tile_base import geojson
+
+VALID = os.path.join('tests', 'data', 'valid')
+
+def expected_geometry(feature):
+    # Single parts are written as Point, LineString and Polygon
+    geometry = feature.get_geometry()
+    return geometry[0] if len(geometry) == 1 else geometry
+
+def test_matches_decoded_geometry():
+    tiles = [VectorTile(open(os.path.join(VALID, name), 'rb').read()) for name in sorted(os.listdir(VALID))]
+    tiles.append(VectorTile(generate_tile(seed=3, points=20, line_strings=20, polygons=20, version=3, elevation=True).serialize()))
+    checked = 0
+    for vt in tiles:
+        for layer in vt.layers:
+            features = list(geojson.iter_features(layer, lonlat=False))
+            assert len(features) == len(layer.features)
+            for feature, out in zip(layer.features, features):
+                if feature.type == 'spline':
+                    continue
+                assert out['geometry']['coordinates'] == expected_geometry(feature)
+                assert out['properties'] == dict((k, feature.attributes[k]) for k in feature.attributes)
+                checked = checked + 1
+    assert checked > 60
+
+def test_polygon_types():
+    vt = VectorTile()
+    layer = vt.add_layer('polygons')
+    feature = layer.add_polygon_feature()
+    feature.add_ring([[0, 0], [10, 0], [10, 10], [0, 10], [0, 0]])
+    feature.add_ring([[3, 3], [3, 5], [5, 5], [3, 3]])
+    feature.add_ring([[20, 20], [30, 20], [30, 30], [20, 20]])
+    feature = layer.add_polygon_feature()
+    # Only an interior ring, no polygon
+    feature.add_ring([[3, 3], [3, 5], [5, 5], [3, 3]])
+    features = list(geojson.iter_features(layer, lonlat=False))
+    assert features[0]['geometry'] == {'type': 'MultiPolygon', 'coordinates': [
+        [[[0, 0], [10, 0], [10, 10], [0, 10], [0, 0]], [[3, 3], [3, 5], [5, 5], [3, 3]]],
+        [[[20, 20], [30, 20], [30, 30], [20, 20]]]]}
+    assert features[1]['geometry'] is None
+
+def test_lonlat():
+    vt = VectorTile()
+    layer = vt.add_layer('points', version=3, x=1, y=1, zoom=1)
+    feature = layer.add_point_feature()
+    feature.add_points([[0, 0], [4096, 4096]])
+    feature.id = 3
+    feature = layer.add_line_string_feature()
+    feature.add_line_string([[0, 0], [2048, 2048]])
+    features = list(geojson.iter_features(layer))
+    assert features[0]['id'] == 3
+    assert features[0]['geometry']['type'] == 'MultiPoint'
+    assert features[0]['geometry']['coordinates'] == [[0.0, 0.0], [180.0, -85.0511288]]
+    assert features[1]['geometry']['type'] == 'LineString'
+    lon, lat = features[1]['geometry']['coordinates'][1]
+    assert lon == 90.0
+    assert lat == pytest.approx(-66.5132604, abs=1e-7)
+    # Layers without a tile location need one passed in
+    layer = vt.add_layer('no_location')
+    layer.add_point_feature().add_points([10, 10])
+    with pytest.raises(Exception):
+        list(geojson.iter_features(layer))
+    features = list(geojson.iter_features(layer, tile=(0, 0, 0), precision=2))
+    assert features[0]['geometry'] == {'type': 'Point', 'coordinates': [-179.12, 84.97]}
+
+def test_stream():
+    raw = generate_tile(seed=1, layers=2, points=10, line_strings=10, polygons=10, splines=2, version=3)
+    vt = VectorTile(raw.serialize())
+    out = io.StringIO()
+    vt.to_geojson(out, tile=(14, 8192, 5461))
+    data = json.loads(out.getvalue())
+    assert data['type'] == 'FeatureCollection'
+    assert len(data['features']) == 64
+    assert set(f['layer'] for f in data['features']) == set(layer.name for layer in vt.layers)
+    out = io.StringIO()
+    vt.layers[0].to_geojson(out, lonlat=False)
+    data = json.loads(out.getvalue())
+    assert len(data['features']) == 32
+    assert set(f['geometry']['type'] for f in data['features']) >= set(['Point', 'LineString', 'Polygon'])
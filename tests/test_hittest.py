@@ -0,0 +1,83 @@
+import math
+import random
+from vector_tile_base import VectorTile, FloatList
+from vector_tile_base.synthetic import generate_tile
+
+def make_layer():
+    vt = VectorTile()
+    layer = vt.add_layer('hits', version=3)
+    layer.add_point_feature().add_points([100, 100])
+    layer.add_line_string_feature().add_line_string([[0, 200], [400, 200]])
+    feature = layer.add_polygon_feature()
+    feature.add_ring([[0, 0], [300, 0], [300, 300], [0, 300], [0, 0]])
+    feature.add_ring([[50, 50], [50, 150], [150, 150], [150, 50], [50, 50]])
+    scaling = layer.add_attribute_scaling(precision=10.0**-8, min_value=0.0, max_value=1.0)
+    knots = FloatList(scaling, [0.0, 0.0, 0.0, 1.0, 1.0, 1.0])
+    layer.add_spline_feature(degree=2).add_spline([[1000, 1000], [1100, 1000], [1200, 1000]], knots)
+    return layer
+
+def test_hits_ordered_by_distance():
+    layer = make_layer()
+    point, line, polygon, spline = layer.features
+    assert layer.hit_test(250, 250) == [(polygon, 0.0)]
+    assert layer.hit_test(250, 203, tolerance=5) == [(polygon, 0.0), (line, 3.0)]
+    assert layer.hit_test(500, 500, tolerance=5) == []
+    assert layer.hit_test(1150, 1002, tolerance=2) == [(spline, 2.0)]
+
+def test_polygon_holes():
+    layer = make_layer()
+    point, line, polygon, spline = layer.features
+    # Inside of the hole, the distance is to the edge of the hole
+    assert layer.hit_test(100, 60) == []
+    assert layer.hit_test(100, 60, tolerance=10) == [(polygon, 10.0)]
+    assert layer.hit_test(101, 100, tolerance=1) == [(point, 1.0)]
+
+def test_index_is_rebuilt_after_changes():
+    layer = make_layer()
+    assert layer.hit_test(2000, 2000) == []
+    feature = layer.add_point_feature()
+    feature.add_points([2000, 2000])
+    assert layer.hit_test(2000, 2000) == [(feature, 0.0)]
+    feature.add_points([3000, 3000])
+    assert layer.hit_test(3000, 3000) == [(feature, 0.0)]
+    feature.clear_geometry()
+    assert layer.hit_test(3000, 3000) == []
+
+def brute_force(layer, x, y, tolerance):
+    def segment(a, b):
+        dx = b[0] - a[0]
+        dy = b[1] - a[1]
+        length2 = dx * dx + dy * dy
+        u = 0.0 if length2 == 0 else max(0.0, min(1.0, ((x - a[0]) * dx + (y - a[1]) * dy) / length2))
+        return math.hypot(a[0] + u * dx - x, a[1] + u * dy - y)
+    out = []
+    for i, feature in enumerate(layer.features):
+        if feature.type == 'point':
+            distance = min(math.hypot(p[0] - x, p[1] - y) for p in feature.get_points())
+        else:
+            parts = feature.get_rings() if feature.type == 'polygon' else feature.get_line_strings()
+            distance = min(segment(a, b) for part in parts for a, b in zip(part[:-1], part[1:]))
+            if feature.type == 'polygon':
+                crossings = 0
+                for part in parts:
+                    for a, b in zip(part[:-1], part[1:]):
+                        if (a[1] > y) != (b[1] > y) and x < a[0] + (y - a[1]) * (b[0] - a[0]) / (b[1] - a[1]):
+                            crossings = crossings + 1
+                if crossings % 2 == 1:
+                    distance = 0.0
+        if distance <= tolerance:
+            out.append((i, round(distance, 6)))
+    return sorted(out)
+
+def test_matches_brute_force():
+    vt = VectorTile(generate_tile(seed=7, points=100, line_strings=100, polygons=100, rings=(1, 3), version=2).serialize())
+    layer = vt.layers[0]
+    index = dict((id(feature), i) for i, feature in enumerate(layer.features))
+    rng = random.Random(1)
+    for i in range(50):
+        x = rng.uniform(0, layer.extent)
+        y = rng.uniform(0, layer.extent)
+        hits = layer.hit_test(x, y, tolerance=20)
+        distances = [d for feature, d in hits]
+        assert distances == sorted(distances)
+        assert sorted((index[id(feature)], round(d, 6)) for feature, d in hits) == brute_force(layer, x, y, 20)
@@ -0,0 +1,41 @@
+from vector_tile_base import engine, VectorTile, instrumentation
+from vector_tile_base.synthetic import generate_tile
+
+def test_instrumentation_records_events():
+    raw = generate_tile(layers=2, points=3, line_strings=2, polygons=1, version=3).serialize()
+    events = []
+    with instrumentation.instrumented(callback=lambda layer, event, elapsed: events.append((layer, event))) as stats:
+        vt = VectorTile(raw)
+        for layer in vt.layers:
+            for feature in layer.features:
+                feature.get_geometry()
+                dict((k, feature.attributes[k]) for k in feature.attributes)
+        feature = vt.layers[0].features[0]
+        feature.attributes = {'new': 'value'}
+        feature.add_points([1, 1])
+        vt.serialize()
+    assert stats.count('parse') == 1
+    assert stats.count('serialize') == 1
+    assert stats.count('layer_build') == 2
+    assert stats.count('decode_values') == 2
+    assert stats.count('geometry_decode', 'layer_0') >= 6
+    assert stats.count('geometry_decode', 'layer_1') == 6
+    assert stats.count('attribute_decode') == 12
+    assert stats.count('attribute_encode', 'layer_0') == 1
+    assert stats.count('geometry_encode', 'layer_0') == 1
+    assert stats.total_time('parse') > 0
+    assert (None, 'parse') in events
+    out = stats.as_dict()
+    assert out['layer_1']['geometry_decode']['count'] == 6
+    assert out[None]['serialize']['count'] == 1
+
+def test_instrumentation_disabled():
+    original = engine.Layer.__dict__['get_attributes']
+    stats = instrumentation.enable()
+    assert engine.Layer.__dict__['get_attributes'] is not original
+    assert instrumentation.active_stats() is stats
+    instrumentation.disable()
+    assert engine.Layer.__dict__['get_attributes'] is original
+    assert instrumentation.active_stats() is None
+    VectorTile(generate_tile(points=1).serialize())
+    assert stats.count('parse') == 0
@@ -0,0 +1,73 @@
+import sqlite3
+from conftest import make_tile
+from vector_tile_base import cli, mercator
+from vector_tile_base.mbtiles import MBTilesReader, MBTilesWriter
+
+def layer_names(z, x, y, vt):
+    return [layer.name for layer in vt.layers]
+
+def write_archive(path, **kwargs):
+    with MBTilesWriter(path, metadata={'name': 'test', 'minzoom': 0}, batch_size=3, **kwargs) as writer:
+        writer.write(0, 0, 0, make_tile(['world']))
+        for x in range(2):
+            for y in range(2):
+                # Every tile but one is ocean
+                writer.write(1, x, y, make_tile(['land' if (x, y) == (0, 0) else 'ocean']))
+        assert writer.tiles_written == 3
+    return path
+
+def test_mercator():
+    assert mercator.lonlat_to_tile(0.0, 0.0, 0) == (0, 0)
+    assert mercator.lonlat_to_tile(-179.0, 80.0, 1) == (0, 0)
+    assert mercator.lonlat_to_tile(179.0, -89.0, 1) == (1, 1)
+    assert mercator.tile_range((-10.0, -10.0, 10.0, 10.0), 2) == (1, 1, 2, 2)
+    assert mercator.flip_y(0, 2) == 3
+
+def test_write_and_read(tmpdir):
+    path = write_archive(str(tmpdir.join('tiles.mbtiles')))
+    db = sqlite3.connect(path)
+    assert db.execute('SELECT COUNT(*) FROM map').fetchone()[0] == 5
+    assert db.execute('SELECT COUNT(*) FROM images').fetchone()[0] == 3
+    # Rows are stored in the TMS scheme and tiles are compressed
+    row = db.execute('SELECT tile_data FROM tiles WHERE zoom_level = 1 AND tile_column = 0 AND tile_row = 1').fetchone()
+    assert row[0][:2] == b'\x1f\x8b'
+    db.close()
+    with MBTilesReader(path) as reader:
+        assert reader.metadata() == {'name': 'test', 'minzoom': '0'}
+        assert reader.zoom_levels() == [0, 1]
+        assert reader.read(1, 0, 0).layers[0].name == 'land'
+        assert reader.read(1, 0, 1, decode=False) == make_tile(['ocean']).serialize()
+        assert reader.read(5, 0, 0) is None
+        tiles = [(z, x, y, vt.layers[0].name) for z, x, y, vt in reader.iter_tiles(prefetch=2)]
+        assert tiles == [(0, 0, 0, 'world'), (1, 0, 0, 'land'), (1, 0, 1, 'ocean'), (1, 1, 0, 'ocean'), (1, 1, 1, 'ocean')]
+        # The north west quarter of the world
+        tiles = [(z, x, y) for z, x, y, data in reader.iter_tiles(zooms=[1], bbox=(-170.0, 10.0, -10.0, 80.0), decode=False)]
+        assert tiles == [(1, 0, 0)]
+
+def test_plain_schema(tmpdir):
+    path = write_archive(str(tmpdir.join('tiles.mbtiles')), dedupe=False, compress=False)
+    db = sqlite3.connect(path)
+    assert db.execute('SELECT COUNT(*) FROM tiles').fetchone()[0] == 5
+    assert db.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'images'").fetchone()[0] == 0
+    db.close()
+    # Reopened archives keep their layout
+    with MBTilesWriter(path) as writer:
+        writer.write(1, 0, 0, make_tile(['island']))
+    with MBTilesReader(path) as reader:
+        assert reader.read(1, 0, 0).layers[0].name == 'island'
+
+def test_map_tiles(tmpdir):
+    path = write_archive(str(tmpdir.join('tiles.mbtiles')))
+    reader = MBTilesReader(path)
+    results = list(reader.map_tiles(layer_names, zooms=[1], jobs=2, chunksize=1))
+    assert results == [(1, 0, 0, ['land']), (1, 0, 1, ['ocean']), (1, 1, 0, ['ocean']), (1, 1, 1, ['ocean'])]
+    assert list(reader.map_tiles(layer_names, zooms=[0], jobs=1)) == [(0, 0, 0, ['world'])]
+    reader.close()
+
+def test_cli(tmpdir, capsys):
+    path = write_archive(str(tmpdir.join('tiles.mbtiles')))
+    sources = list(cli.iter_sources([path]))
+    assert sources[1] == (path, '1/0/0')
+    assert cli.source_name(sources[1]) == path + '!1/0/0'
+    assert cli.main(['validate', '-j', '1', path]) == 0
+    assert '5 tiles, 0 invalid' in capsys.readouterr().out
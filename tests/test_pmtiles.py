@@ -0,0 +1,111 @@
+import pytest
+from conftest import make_tile
+from vector_tile_base import VectorTile, cli, pmtiles
+from vector_tile_base.pmtiles import PMTilesReader, PMTilesWriter, zxy_to_tile_id, tile_id_to_zxy
+
+def test_tile_ids():
+    # Values from the PMTiles specification test suite
+    assert zxy_to_tile_id(0, 0, 0) == 0
+    assert zxy_to_tile_id(1, 0, 0) == 1
+    assert zxy_to_tile_id(1, 0, 1) == 2
+    assert zxy_to_tile_id(1, 1, 1) == 3
+    assert zxy_to_tile_id(1, 1, 0) == 4
+    assert zxy_to_tile_id(2, 0, 0) == 5
+    for z in range(5):
+        for x in range(1 << z):
+            for y in range(1 << z):
+                assert tile_id_to_zxy(zxy_to_tile_id(z, x, y)) == (z, x, y)
+    assert tile_id_to_zxy(zxy_to_tile_id(20, 12345, 54321)) == (20, 12345, 54321)
+    with pytest.raises(Exception):
+        zxy_to_tile_id(1, 2, 0)
+
+def test_directory():
+    entries = [(0, 0, 10, 1), (1, 10, 5, 3), (5, 0, 10, 1), (7, 15, 20, 0)]
+    assert pmtiles.deserialize_directory(pmtiles.serialize_directory(entries)) == (
+        [0, 1, 5, 7], [0, 10, 0, 15], [10, 5, 10, 20], [1, 3, 1, 0])
+
+def test_write_and_read(tmpdir):
+    path = str(tmpdir.join('tiles.pmtiles'))
+    ocean = make_tile(['ocean'])
+    with PMTilesWriter(path, metadata={'name': 'test'}) as writer:
+        writer.write(0, 0, 0, make_tile(['world']))
+        for x in range(4):
+            for y in range(4):
+                writer.write(2, x, y, make_tile(['land']) if (x, y) == (1, 2) else ocean)
+    with PMTilesReader(path) as reader:
+        header = reader.header
+        assert header['addressed_tiles_count'] == 17
+        assert header['tile_contents_count'] == 3
+        # Ocean tiles on both sides of the land tile along the Hilbert curve form two runs
+        assert header['tile_entries_count'] == 4
+        assert header['clustered'] == 1
+        assert (header['min_zoom'], header['max_zoom']) == (0, 2)
+        assert header['min_lon_e7'] == -1800000000
+        assert reader.metadata() == {'name': 'test'}
+        data = reader.get(2, 1, 2)
+        assert isinstance(data, memoryview)
+        assert VectorTile(data).layers[0].name == 'land'
+        assert bytes(reader.get(2, 3, 3)) == ocean.serialize()
+        assert reader.get(3, 0, 0) is None
+        assert reader.get(1, 0, 0) is None
+        addresses = list(reader.iter_addresses())
+        assert len(addresses) == 17
+        assert addresses[0] == (0, 0, 0)
+        del data
+
+def test_last_write_wins(tmpdir):
+    path = str(tmpdir.join('tiles.pmtiles'))
+    with PMTilesWriter(path) as writer:
+        writer.write(0, 0, 0, b'x')
+        writer.write(1, 0, 0, b'y')
+        writer.write(1, 0, 0, b'x')
+    with PMTilesReader(path) as reader:
+        assert bytes(reader.get(1, 0, 0)) == b'x'
+        assert list(reader.iter_addresses()) == [(0, 0, 0), (1, 0, 0)]
+        assert reader.header['addressed_tiles_count'] == 2
+        assert reader.header['tile_entries_count'] == 1
+        assert reader.header['tile_contents_count'] == 1
+
+def test_views_outlive_reader(tmpdir):
+    path = str(tmpdir.join('tiles.pmtiles'))
+    with PMTilesWriter(path) as writer:
+        writer.write(1, 1, 0, make_tile(['land']))
+    with PMTilesReader(path) as reader:
+        data = reader.get(1, 1, 0)
+    assert VectorTile(data).layers[0].name == 'land'
+    reader.close()
+
+def test_gzip_tiles(tmpdir):
+    path = str(tmpdir.join('tiles.pmtiles'))
+    with PMTilesWriter(path, tile_compression='gzip', bounds=(-10.0, -10.0, 10.0, 10.0)) as writer:
+        writer.write(3, 1, 2, make_tile(['land']).serialize())
+    with PMTilesReader(path) as reader:
+        assert reader.header['tile_compression'] == pmtiles.COMPRESSION_GZIP
+        assert reader.header['max_lat_e7'] == 100000000
+        assert VectorTile(reader.get(3, 1, 2)).layers[0].name == 'land'
+        assert [t[:3] for t in reader.iter_tiles()] == [(3, 1, 2)]
+
+def test_leaf_directories(tmpdir, monkeypatch):
+    # Force leaf directories with a tiny root directory
+    monkeypatch.setattr(pmtiles, 'ROOT_DIRECTORY_LIMIT', 40)
+    path = str(tmpdir.join('tiles.pmtiles'))
+    tiles = {}
+    with PMTilesWriter(path, internal_compression='none') as writer:
+        for x in range(64):
+            for y in range(0, 64, 2):
+                tiles[(6, x, y)] = b'tile %d %d' % (x, y)
+                writer.write(6, x, y, tiles[(6, x, y)])
+    with PMTilesReader(path) as reader:
+        assert reader.header['leaf_directory_length'] > 0
+        for (z, x, y), data in tiles.items():
+            assert bytes(reader.get(z, x, y)) == data
+        assert reader.get(6, 0, 1) is None
+        assert sorted(reader.iter_addresses()) == sorted(tiles)
+
+def test_cli(tmpdir, capsys):
+    path = str(tmpdir.join('tiles.pmtiles'))
+    with PMTilesWriter(path) as writer:
+        writer.write(1, 1, 0, make_tile(['land']))
+    assert list(cli.iter_sources([path])) == [(path, '1/1/0')]
+    assert cli.main(['validate', '-j', '1', path]) == 0
+    assert '1 tiles, 0 invalid' in capsys.readouterr().out
@@ -0,0 +1,36 @@
+import subprocess
+import sys
+import warnings
+import pytest
+import vector_tile_base
+from vector_tile_base import runtime
+
+def test_lazy_import():
+    code = 'import sys, vector_tile_base; vector_tile_base.validate; print("vector_tile_base.engine" in sys.modules, "google.protobuf" in sys.modules)'
+    output = subprocess.check_output([sys.executable, '-c', code])
+    assert output.decode('ascii').split() == ['False', 'False']
+    code = 'import sys, vector_tile_base.cli; print("vector_tile_base.engine" in sys.modules, "google.protobuf" in sys.modules, "numpy" in sys.modules)'
+    output = subprocess.check_output([sys.executable, '-c', code])
+    assert output.decode('ascii').split() == ['False', 'False', 'False']
+
+def test_exports():
+    assert vector_tile_base.VectorTile is vector_tile_base.engine.VectorTile
+    assert vector_tile_base.validate is vector_tile_base.validator.validate
+    assert 'FloatList' in dir(vector_tile_base)
+    with pytest.raises(AttributeError):
+        vector_tile_base.missing
+
+def test_slow_protobuf_warning(monkeypatch):
+    assert vector_tile_base.protobuf_implementation() in ['upb', 'cpp', 'python']
+    monkeypatch.setattr(runtime, 'protobuf_implementation', lambda: 'python')
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        vector_tile_base.warn_on_slow_protobuf()
+        vector_tile_base.warn_on_slow_protobuf(False)
+    assert [w.category for w in caught] == [vector_tile_base.SlowProtobufWarning]
+    monkeypatch.setattr(runtime, 'protobuf_implementation', lambda: 'upb')
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        vector_tile_base.warn_on_slow_protobuf()
+        vector_tile_base.warn_on_slow_protobuf(False)
+    assert caught == []
@@ -62,3 +62,139 @@ def test_bad_scaling_values():
         scaling_calculation(-1.0, 0.0, 10.0)
     with pytest.raises(Exception):
         scaling_calculation(100.0, 0.0, 10.0)
+
+def test_inferred_scaling():
+    pytest.importorskip('numpy')
+    from vector_tile_base import VectorTile, FloatList
+    vt = VectorTile()
+    layer = vt.add_layer('test', version=3)
+    attribute_scaling = layer.add_inferred_attribute_scaling(precision=10.0**-4)
+    elevation_scaling = layer.add_inferred_elevation_scaling(precision=10.0**-2)
+    assert attribute_scaling.pending
+    assert elevation_scaling.pending
+
+    dvalues = [uniform(-50.0, 250.0) for x in range(500)]
+    dvalues[3] = None
+    feature = layer.add_line_string_feature(has_elevation=True)
+    line_string = [[i, i, uniform(-400.0, 8800.0)] for i in range(100)]
+    feature.add_line_string(line_string)
+    # Raw values are returned until the scaling is inferred
+    assert feature.get_line_strings() == [line_string]
+    flist = FloatList(attribute_scaling, dvalues)
+    assert flist.get_all_values() == dvalues
+    feature.attributes = {'dlist': flist, 'name': 'a'}
+    feature.geometric_attributes = {'dlist': FloatList(attribute_scaling, [1.0, 2.0])}
+    spline = layer.add_spline_feature(has_elevation=True)
+    knot_values = [0.0, 0.0, 0.0, 1.0, 2.0, 2.0, 2.0]
+    spline.add_spline([[8,10,1.0],[9,11,2.0],[11,9,3.0],[12,10,4.0]], FloatList(attribute_scaling, knot_values))
+
+    report = layer.finalize_scalings()
+    assert not attribute_scaling.pending
+    assert not elevation_scaling.pending
+    assert report[0]['count'] == 499 + 2 + 7
+    assert report[0]['min_value'] == min(v for v in dvalues if v is not None)
+    assert report[0]['base'] == report[0]['min_value']
+    assert attribute_scaling.max_quantization_error < 10.0**-4
+    assert report[0]['bytes'] > 0
+    assert report['elevation']['count'] == 104
+    assert report['elevation']['bytes'] >= 104
+    assert elevation_scaling.max_quantization_error < 10.0**-2
+    assert layer.scaling_report == report
+
+    vt = VectorTile(vt.serialize())
+    layer = vt.layers[0]
+    assert layer.attribute_scalings[0].base == attribute_scaling.base
+    assert layer.attribute_scalings[0].multiplier == attribute_scaling.multiplier
+    assert layer.elevation_scaling.multiplier == elevation_scaling.multiplier
+    feature = layer.features[0]
+    decoded = feature.attributes['dlist']
+    for i in range(len(dvalues)):
+        if dvalues[i] is None:
+            assert decoded[i] is None
+        else:
+            assert abs(decoded[i] - dvalues[i]) < 10.0**-4
+    assert feature.attributes['name'] == 'a'
+    assert feature.geometric_attributes['dlist'] == pytest.approx([1.0, 2.0], abs=10.0**-4)
+    decoded = feature.get_line_strings()[0]
+    for i in range(len(line_string)):
+        assert decoded[i][:2] == line_string[i][:2]
+        assert abs(decoded[i][2] - line_string[i][2]) < 10.0**-2
+    control_points, knots = layer.features[1].get_splines()[0]
+    assert knots == pytest.approx(knot_values, abs=10.0**-4)
+    assert [pt[2] for pt in control_points] == pytest.approx([1.0, 2.0, 3.0, 4.0], abs=10.0**-2)
+
+def test_inferred_scaling_before_finalize():
+    pytest.importorskip('numpy')
+    from vector_tile_base import VectorTile, FloatList
+    vt = VectorTile()
+    layer = vt.add_layer('test', version=3)
+    feature = layer.add_line_string_feature(has_elevation=True)
+    feature.add_line_string([[0, 0, 10], [1, 1, 20]])
+    # Elevation added before the scaling is inferred keeps its values
+    elevation_scaling = layer.add_inferred_elevation_scaling(precision=10.0**-2)
+    feature.add_line_string([[5, 5, 30.5], [6, 6, 40.25]])
+    assert feature.get_line_strings() == [[[0, 0, 10], [1, 1, 20]], [[5, 5, 30.5], [6, 6, 40.25]]]
+    attribute_scaling = layer.add_inferred_attribute_scaling(precision=10.0**-4)
+    spline = layer.add_spline_feature()
+    knot_values = [0.0, 0.0, 0.0, 1.0, 2.5, 2.5, 2.5]
+    spline.add_spline([[8, 10], [9, 11], [11, 9], [12, 10]], FloatList(attribute_scaling, knot_values))
+    assert spline.get_splines() == [[[[8, 10], [9, 11], [11, 9], [12, 10]], knot_values]]
+    assert len(spline.evaluate()[0]) > 4
+
+    report = layer.finalize_scalings()
+    assert report['elevation']['count'] == 4
+    assert report['elevation']['min_value'] == 10
+    assert report['elevation']['bytes'] == 7
+    elevation = [pt[2] for line in VectorTile(vt.serialize()).layers[0].features[0].get_line_strings() for pt in line]
+    assert elevation == pytest.approx([10, 20, 30.5, 40.25], abs=10.0**-2)
+    control_points, knots = VectorTile(vt.serialize()).layers[0].features[1].get_splines()[0]
+    assert knots == pytest.approx(knot_values, abs=10.0**-4)
+
+def test_inferred_elevation_scaling_after_features():
+    pytest.importorskip('numpy')
+    from vector_tile_base import VectorTile
+    vt = VectorTile()
+    layer = vt.add_layer('test', version=3)
+    layer.add_line_string_feature(has_elevation=True).add_line_string([[1, 1, 10], [2, 2, 20]])
+    # Features that get no more points after the scaling is added keep their elevation
+    layer.add_inferred_elevation_scaling(precision=10.0**-1)
+    layer.add_point_feature(has_elevation=True).add_points([[3, 3, 1000.5]])
+    report = layer.finalize_scalings()
+    assert report['elevation']['count'] == 3
+    assert report['elevation']['min_value'] == 10
+    features = VectorTile(vt.serialize()).layers[0].features
+    assert [pt[2] for pt in features[0].get_line_strings()[0]] == pytest.approx([10, 20], abs=10.0**-1)
+    assert features[1].get_points()[0][2] == pytest.approx(1000.5, abs=10.0**-1)
+
+def test_inferred_scaling_counts_current_values():
+    pytest.importorskip('numpy')
+    from vector_tile_base import VectorTile, FloatList
+    vt = VectorTile()
+    layer = vt.add_layer('test', version=3)
+    scaling = layer.add_inferred_attribute_scaling(precision=10.0**-3)
+    feature = layer.add_point_feature()
+    feature.add_points([1, 1])
+    values = FloatList(scaling, [1.0, 2.0, 3.0])
+    for i in range(3):
+        feature.attributes = {'values': values, 'edit': i}
+    report = layer.finalize_scalings()
+    assert report[0]['count'] == 3
+    with pytest.raises(Exception):
+        layer.add_inferred_attribute_scaling(precision=0)
+    with pytest.raises(Exception):
+        layer.add_inferred_elevation_scaling(precision=-1.0)
+
+def test_inferred_scaling_clears_earlier_fields():
+    pytest.importorskip('numpy')
+    from vector_tile_base import VectorTile
+    vt = VectorTile()
+    layer = vt.add_layer('test', version=3)
+    layer.add_elevation_scaling(offset=5, multiplier=2.0, base=1.0)
+    layer.add_point_feature(has_elevation=True).add_points([[1, 1, 101.0]])
+    layer.add_inferred_elevation_scaling(precision=10.0**-2)
+    layer.add_point_feature(has_elevation=True).add_points([[2, 2, 250.5]])
+    layer.finalize_scalings()
+    assert not layer._layer.elevation_scaling.HasField('offset')
+    features = VectorTile(vt.serialize()).layers[0].features
+    assert features[0].get_points()[0][2] == pytest.approx(101.0, abs=10.0**-2)
+    assert features[1].get_points()[0][2] == pytest.approx(250.5, abs=10.0**-2)
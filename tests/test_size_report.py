@@ -0,0 +1,69 @@
+from vector_tile_base import VectorTile, FloatList, size_report
+from vector_tile_base.synthetic import generate_tile
+
+def check_totals(raw, report):
+    assert report['bytes'] == len(raw)
+    total = report['unknown']
+    for layer in report['layers']:
+        assert sum(layer['sections'].values()) == layer['bytes']
+        total = total + layer['bytes'] + layer['overhead']
+    assert total == len(raw)
+
+def test_size_report_v2():
+    vt = VectorTile()
+    layer = vt.add_layer('points', version=2)
+    for i in range(10):
+        feature = layer.add_point_feature()
+        feature.add_points([i, i])
+        feature.attributes = {'name': 'point %d' % i, 'kind': 'a'}
+    raw = vt.serialize()
+    report = size_report(raw)
+    check_totals(raw, report)
+    assert report == vt.size_report()
+    layer_report = report['layers'][0]
+    assert layer_report['name'] == 'points'
+    assert layer_report['version'] == 2
+    assert layer_report['features'] == 10
+    assert layer_report['sections']['geometry'] == 10 * 5
+    assert layer_report['sections']['tags'] > 0
+    assert layer_report['sections']['attributes'] == 0
+    assert layer_report['tables']['keys']['count'] == 2
+    assert layer_report['tables']['values']['count'] == 11
+    keys = dict((k['key'], k) for k in layer_report['keys'])
+    assert keys['name']['distinct_values'] == 10
+    assert keys['kind']['distinct_values'] == 1
+    assert keys['kind']['features'] == 10
+    assert size_report(raw, top=1)['layers'][0]['keys'] == [layer_report['keys'][0]]
+
+def test_size_report_v3():
+    vt = VectorTile()
+    layer = vt.add_layer('lines', version=3)
+    scaling = layer.add_attribute_scaling(precision=10.0**-3, min_value=0.0, max_value=100.0)
+    layer.add_elevation_scaling(multiplier=0.5)
+    feature = layer.add_line_string_feature(has_elevation=True)
+    feature.add_line_string([[0, 0, 10], [10, 10, 20], [20, 0, 30]])
+    feature.attributes = {'name': 'a line', 'nested': {'list': [1, 2, 3], 'value': 2.5}, 'count': 2**60}
+    feature.geometric_attributes = {'speed': FloatList(scaling, [1.0, 2.0, 3.0])}
+    raw = vt.serialize()
+    report = size_report(raw)
+    check_totals(raw, report)
+    layer_report = report['layers'][0]
+    sections = layer_report['sections']
+    assert sections['elevation'] > 0
+    assert sections['attributes'] > 0
+    assert sections['geometric_attributes'] > 0
+    assert sections['elevation_scaling'] > 0
+    assert sections['attribute_scalings'] > 0
+    assert layer_report['tables']['string_values']['count'] == 1
+    assert layer_report['tables']['double_values']['count'] == 1
+    assert layer_report['tables']['int_values']['count'] == 1
+    keys = dict((k['key'], k) for k in layer_report['keys'])
+    assert set(keys) == set(['name', 'nested', 'count', 'speed'])
+    assert keys['nested']['bytes'] > keys['name']['bytes']
+
+def test_size_report_synthetic():
+    raw = generate_tile(layers=3, splines=5, version=3, elevation=True, nesting=2).serialize()
+    report = size_report(raw, top=None)
+    check_totals(raw, report)
+    assert len(report['layers']) == 3
+    assert report['layers'][0]['sections']['spline_knots'] > 0
@@ -0,0 +1,72 @@
+import pytest
+from vector_tile_base import VectorTile, FloatList
+from vector_tile_base.engine import _evaluate_spline
+
+def create_spline_layer():
+    vt = VectorTile()
+    layer = vt.add_layer('test', version=3)
+    scaling = layer.add_attribute_scaling(precision=10.0**-8, min_value=0.0, max_value=25.0)
+    feature = layer.add_spline_feature(degree=3)
+    feature.add_spline([[8,10],[9,11],[11,9],[12,10]], FloatList(scaling, [0.0, 2.0, 3.0, 4.0, 5.875, 6.0, 7.0, 8.0]))
+    layer.add_point_feature().add_points([1,1])
+    feature = layer.add_spline_feature(has_elevation=True)
+    feature.add_spline([[0,0,0],[100,0,10],[100,100,20],[0,100,30]], FloatList(scaling, [0.0, 0.0, 0.0, 1.0, 2.0, 2.0, 2.0]))
+    feature.add_spline([[0,0,5],[50,50,5],[100,0,5]], FloatList(scaling, [0.0, 0.0, 0.0, 1.0, 1.0, 1.0]))
+    return layer
+
+def test_evaluate_matches_de_boor():
+    layer = create_spline_layer()
+    for feature in [layer.features[0], layer.features[2]]:
+        evaluated = feature.evaluate(samples_per_span=5)
+        splines = feature.get_splines()
+        assert len(evaluated) == len(splines)
+        for line_string, (control_points, knots) in zip(evaluated, splines):
+            expected = _evaluate_spline(control_points, knots, feature.degree, 5)
+            assert len(line_string) == len(expected)
+            for pt, expected_pt in zip(line_string, expected):
+                assert pt == pytest.approx(expected_pt)
+
+def test_evaluate_clamped_end_points():
+    layer = create_spline_layer()
+    line_strings = layer.features[2].evaluate()
+    assert line_strings[0][0] == pytest.approx([0,0,0])
+    assert line_strings[0][-1] == pytest.approx([0,100,30])
+    assert line_strings[1][0] == pytest.approx([0,0,5])
+    assert line_strings[1][-1] == pytest.approx([100,0,5])
+    for pt in line_strings[1]:
+        assert pt[2] == pytest.approx(5)
+    for line_string in layer.features[2].evaluate(no_elevation=True):
+        for pt in line_string:
+            assert len(pt) == 2
+
+def test_evaluate_tolerance():
+    layer = create_spline_layer()
+    feature = layer.features[2]
+    coarse = feature.evaluate(samples_per_span=1)
+    fine = feature.evaluate(samples_per_span=1, tolerance=0.1)
+    assert len(fine[0]) > len(coarse[0])
+    # Every densely evaluated point must be within tolerance of the adaptive line string
+    dense = feature.evaluate(samples_per_span=200, no_elevation=True)[0]
+    line_string = feature.evaluate(samples_per_span=1, tolerance=0.1, no_elevation=True)[0]
+    for pt in dense:
+        distance = min(segment_distance(pt, line_string[i], line_string[i+1]) for i in range(len(line_string) - 1))
+        assert distance < 0.2
+
+def segment_distance(p, a, b):
+    dx = b[0] - a[0]
+    dy = b[1] - a[1]
+    length2 = dx * dx + dy * dy
+    u = 0.0
+    if length2 > 0:
+        u = max(0.0, min(1.0, ((p[0] - a[0]) * dx + (p[1] - a[1]) * dy) / length2))
+    x = a[0] + u * dx - p[0]
+    y = a[1] + u * dy - p[1]
+    return (x * x + y * y) ** 0.5
+
+def test_layer_evaluate_splines():
+    layer = create_spline_layer()
+    out = layer.evaluate_splines(samples_per_span=4, tolerance=0.5)
+    assert len(out) == 3
+    assert out[1] is None
+    assert out[0] == layer.features[0].evaluate(samples_per_span=4, tolerance=0.5)
+    assert out[2] == layer.features[2].evaluate(samples_per_span=4, tolerance=0.5)
@@ -0,0 +1,92 @@
+import os
+from vector_tile_base import VectorTile, subset_tile
+from vector_tile_base.synthetic import generate_tile
+
+VALID = os.path.join('tests', 'data', 'valid')
+
+def attributes(feature):
+    return dict((key, feature.attributes[key]) for key in feature.attributes)
+
+def all_points(geometry):
+    if isinstance(geometry[0], (int, float)):
+        yield geometry
+    else:
+        for part in geometry:
+            for point in all_points(part):
+                yield point
+
+def make_tile():
+    vt = VectorTile()
+    layer = vt.add_layer('shapes', version=3)
+    feature = layer.add_point_feature(has_elevation=True)
+    feature.add_points([[10, 10, 1], [60, 60, 2], [500, 500, 3]])
+    feature.attributes = {'kind': 'points'}
+    feature = layer.add_line_string_feature()
+    feature.add_line_string([[0, 75], [200, 75], [200, 125], [0, 125]])
+    feature.attributes = {'kind': 'line'}
+    feature = layer.add_polygon_feature()
+    feature.add_ring([[0, 0], [100, 0], [100, 100], [0, 100], [0, 0]])
+    feature.attributes = {'kind': 'polygon'}
+    feature = layer.add_polygon_feature()
+    feature.add_ring([[60, 60], [70, 60], [70, 70], [60, 70], [60, 60]])
+    feature.attributes = {'kind': 'inside', 'area': 100}
+    feature = layer.add_line_string_feature()
+    feature.add_line_string([[1000, 1000], [2000, 2000]])
+    feature.attributes = {'kind': 'outside', 'unused': 'value'}
+    vt.add_layer('other', version=3).add_point_feature().add_points([55, 55])
+    return vt.serialize()
+
+def test_clip():
+    raw = make_tile()
+    vt = VectorTile(subset_tile(raw, (50, 50, 150, 150)))
+    assert [layer.name for layer in vt.layers] == ['shapes', 'other']
+    points, line, polygon, inside = vt.layers[0].features
+    assert points.get_geometry() == [[60, 60, 2]]
+    assert line.get_geometry() == [[[50, 75], [150, 75]], [[150, 125], [50, 125]]]
+    assert polygon.get_geometry() == [[[[50, 50], [100, 50], [100, 100], [50, 100], [50, 50]]]]
+    assert attributes(inside) == {'kind': 'inside', 'area': 100}
+
+def test_inside_features_are_copied():
+    raw = make_tile()
+    original = VectorTile(raw).layers[0].features[3]
+    feature = VectorTile(subset_tile(raw, (50, 50, 150, 150), layers=['shapes'])).layers[0].features[3]
+    assert feature._feature.SerializeToString() == original._feature.SerializeToString()
+    for name in sorted(os.listdir(VALID)):
+        raw = open(os.path.join(VALID, name), 'rb').read()
+        assert subset_tile(raw, (0, 0, 4096, 4096)) == raw
+
+def test_layers():
+    vt = VectorTile(subset_tile(make_tile(), (50, 50, 150, 150), layers=['other']))
+    assert [layer.name for layer in vt.layers] == ['other']
+
+def test_compact():
+    raw = make_tile()
+    layer = VectorTile(subset_tile(raw, (50, 50, 150, 150), compact=True)).layers[0]
+    assert layer._keys == ['kind', 'area']
+    assert sorted(layer._string_values) == ['inside', 'line', 'points', 'polygon']
+    assert [attributes(feature)['kind'] for feature in layer.features] == ['points', 'line', 'polygon', 'inside']
+
+def test_matches_decoded_tile():
+    bbox = (1000, 1000, 2500, 2000)
+    for version in (2, 3):
+        raw = generate_tile(seed=9, points=100, line_strings=100, polygons=100, version=version).serialize()
+        full = VectorTile(subset_tile(raw, bbox)).layers[0]
+        compact = VectorTile(subset_tile(raw, bbox, compact=True)).layers[0]
+        assert 0 < len(full.features) < 300
+        assert len(full.features) == len(compact.features)
+        for feature, other in zip(full.features, compact.features):
+            assert attributes(feature) == attributes(other)
+            assert feature.get_geometry() == other.get_geometry()
+            for point in all_points(feature.get_geometry()):
+                assert bbox[0] <= point[0] <= bbox[2] and bbox[1] <= point[1] <= bbox[3]
+        assert len(subset_tile(raw, bbox, compact=True)) <= len(subset_tile(raw, bbox))
+
+def test_geometric_attributes_are_kept_whole():
+    vt = VectorTile()
+    layer = vt.add_layer('roads', version=3)
+    feature = layer.add_line_string_feature()
+    feature.add_line_string([[0, 0], [100, 0], [200, 0], [300, 0]])
+    feature.geometric_attributes = {'speed': [1, 2, 3, 4]}
+    feature = VectorTile(subset_tile(vt.serialize(), (50, -10, 150, 10))).layers[0].features[0]
+    assert feature.get_geometry() == [[[0, 0], [100, 0], [200, 0], [300, 0]]]
+    assert feature.geometric_attributes['speed'] == [1, 2, 3, 4]
@@ -0,0 +1,52 @@
+import pytest
+from vector_tile_base import VectorTile, PointFeature, LineStringFeature, PolygonFeature, SplineFeature
+from vector_tile_base.synthetic import generate_tile, generate_tiles
+
+def test_generate_tile_deterministic():
+    a = generate_tile(seed=4, version=3, nesting=2, elevation=True, splines=5).serialize()
+    b = generate_tile(seed=4, version=3, nesting=2, elevation=True, splines=5).serialize()
+    c = generate_tile(seed=5, version=3, nesting=2, elevation=True, splines=5).serialize()
+    assert a == b
+    assert a != c
+
+def test_generate_tile_counts():
+    vt = VectorTile(generate_tile(layers=2, points=3, line_strings=4, polygons=5, splines=6, version=3,
+                                  elevation=True, geometric_attributes=True, vertex_distribution='lognormal').serialize())
+    assert len(vt.layers) == 2
+    for layer in vt.layers:
+        assert layer.version == 3
+        assert len(layer.features) == 18
+        assert len([f for f in layer.features if isinstance(f, PointFeature)]) == 3
+        assert len([f for f in layer.features if isinstance(f, LineStringFeature)]) == 4
+        assert len([f for f in layer.features if isinstance(f, PolygonFeature)]) == 5
+        assert len([f for f in layer.features if isinstance(f, SplineFeature)]) == 6
+        for feature in layer.features:
+            assert feature.has_elevation
+            assert len(feature.attributes) == 5
+            geometry = feature.get_geometry()
+            assert len(geometry) > 0
+            if isinstance(feature, PolygonFeature):
+                assert len(geometry) == len(feature.get_polygons())
+                assert sum(len(p) for p in geometry) == len(feature.get_rings())
+            elif isinstance(feature, SplineFeature):
+                assert len(geometry[0]) == 2
+            else:
+                assert len(feature.geometric_attributes['measure']) > 0
+
+def test_generate_tile_legacy():
+    vt = VectorTile(generate_tile(points=10, line_strings=0, polygons=0, attributes=3, cardinality=2).serialize())
+    layer = vt.layers[0]
+    assert layer.version == 2
+    assert len(layer._layer.values) <= 6
+    vt = VectorTile(generate_tile(points=10, version=3, legacy_attributes=True).serialize())
+    assert len(vt.layers[0]._layer.values) > 0
+    with pytest.raises(Exception):
+        generate_tile(version=2, elevation=True)
+    with pytest.raises(Exception):
+        generate_tile(version=3, legacy_attributes=True, splines=1)
+
+def test_generate_tiles():
+    tiles = list(generate_tiles(3, seed=10, points=5, line_strings=0, polygons=0))
+    assert len(tiles) == 3
+    assert tiles[0] == generate_tile(seed=10, points=5, line_strings=0, polygons=0).serialize()
+    assert tiles[0] != tiles[1]
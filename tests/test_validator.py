@@ -0,0 +1,123 @@
+import os
+from vector_tile_base import VectorTile, FloatList, vector_tile_pb2
+from vector_tile_base.validator import validate, is_valid, check_geometry, GEOM_POLYGON
+from vector_tile_base.synthetic import generate_tile
+
+def codes(data):
+    return [(e.code, e.layer, e.feature) for e in validate(data)]
+
+def raw_tile(version=2):
+    tile = vector_tile_pb2.Tile()
+    layer = tile.layers.add()
+    layer.name = 'test'
+    layer.version = version
+    return tile, layer
+
+def test_valid_fixtures():
+    folder = os.path.join('tests', 'data', 'valid')
+    for name in os.listdir(folder):
+        with open(os.path.join(folder, name), 'rb') as f:
+            assert validate(f.read()) == [], name
+
+def test_valid_synthetic():
+    for version in [2, 3]:
+        vt = generate_tile(layers=2, points=20, line_strings=20, polygons=20, splines=5 if version == 3 else 0,
+            nesting=2, geometric_attributes=version == 3, elevation=version == 3, version=version)
+        assert is_valid(vt.serialize())
+
+def test_malformed():
+    assert codes(b'\x1a\x05\x0a\x03ab') == [('malformed', None, None)]
+    assert codes(b'\x1a\x04\x0a\x03ab') == [('malformed', 0, None)]
+    assert codes(b'\xff') == [('malformed', None, None)]
+
+def test_layer_errors():
+    tile, layer = raw_tile(version=4)
+    assert codes(tile.SerializeToString()) == [('version', 0, None)]
+    tile, layer = raw_tile()
+    layer.CopyFrom(tile.layers[0])
+    tile.layers.add().CopyFrom(layer)
+    assert codes(tile.SerializeToString()) == [('name', 1, None)]
+    tile, layer = raw_tile()
+    layer.string_values.append('a')
+    assert codes(tile.SerializeToString()) == [('version', 0, None)]
+
+def test_geometry_errors():
+    tile, layer = raw_tile()
+    feature = layer.features.add()
+    feature.type = vector_tile_pb2.Tile.POLYGON
+    feature.geometry.extend([9, 0, 0, 18, 2, 0, 0, 2])
+    feature = layer.features.add()
+    feature.type = vector_tile_pb2.Tile.LINESTRING
+    feature.geometry.extend([17, 0, 0, 10, 2, 2])
+    feature = layer.features.add()
+    feature.type = vector_tile_pb2.Tile.POINT
+    feature.geometry.extend([9, 0, 0, 10, 2, 2])
+    feature = layer.features.add()
+    feature.type = vector_tile_pb2.Tile.LINESTRING
+    feature.geometry.extend([9, 0, 0, 18, 2])
+    feature = layer.features.add()
+    feature.type = vector_tile_pb2.Tile.POINT
+    feature.geometry.extend([9, 0, 0, 4])
+    assert codes(tile.SerializeToString()) == [
+        ('unclosed_ring', 0, 0),
+        ('command_count', 0, 1),
+        ('command_sequence', 0, 2),
+        ('missing_parameters', 0, 3),
+        ('command_sequence', 0, 4)
+    ]
+    assert check_geometry([9, 0, 0, 18, 2, 0, 0, 2, 15], GEOM_POLYGON) == (3, [3])
+
+def test_attribute_errors():
+    tile, layer = raw_tile()
+    layer.keys.append('a')
+    layer.values.add().string_value = 'b'
+    feature = layer.features.add()
+    feature.type = vector_tile_pb2.Tile.POINT
+    feature.geometry.extend([9, 0, 0])
+    feature.tags.extend([0, 1])
+    feature = layer.features.add()
+    feature.type = vector_tile_pb2.Tile.POINT
+    feature.geometry.extend([9, 0, 0])
+    feature.tags.extend([0])
+    assert codes(tile.SerializeToString()) == [('index', 0, 0), ('tags', 0, 1)]
+
+    vt = VectorTile()
+    layer = vt.add_layer('inline', version=3)
+    feature = layer.add_point_feature()
+    feature.add_points([1, 1])
+    feature.attributes = {'name': 'value', 'list': [1, 2.5]}
+    tile = vector_tile_pb2.Tile()
+    tile.ParseFromString(vt.serialize())
+    del tile.layers[0].string_values[:]
+    assert codes(tile.SerializeToString()) == [('index', 0, 0)]
+
+def test_elevation_and_knot_errors():
+    vt = VectorTile()
+    layer = vt.add_layer('splines', version=3)
+    scaling = layer.add_attribute_scaling(precision=10.0**-8, min_value=0.0, max_value=25.0)
+    feature = layer.add_spline_feature(has_elevation=True, degree=3)
+    feature.add_spline([[8,10,10],[9,11,11],[11,9,12],[12,10,13]], FloatList(scaling, [0.0, 2.0, 3.0, 4.0, 5.875, 6.0, 7.0, 8.0]))
+    raw = vt.serialize()
+    assert validate(raw) == []
+
+    tile = vector_tile_pb2.Tile()
+    tile.ParseFromString(raw)
+    tile.layers[0].features[0].elevation.append(1)
+    assert codes(tile.SerializeToString()) == [('elevation', 0, 0)]
+
+    tile.ParseFromString(raw)
+    tile.layers[0].features[0].spline_degree = 2
+    assert codes(tile.SerializeToString()) == [('spline_knots', 0, 0)]
+
+    tile.ParseFromString(raw)
+    del tile.layers[0].attribute_scalings[:]
+    assert codes(tile.SerializeToString()) == [('index', 0, 0)]
+
+    error = validate(tile.SerializeToString())[0]
+    assert str(error) == 'layer 0 feature 0: [index] Index 0 out of range of attribute_scalings (0 entries)'
+
+def test_constants_match_protobuf():
+    from vector_tile_base import wire
+    tile = vector_tile_pb2.Tile
+    assert [wire.GEOM_UNKNOWN, wire.GEOM_POINT, wire.GEOM_LINESTRING, wire.GEOM_POLYGON, wire.GEOM_SPLINE] == [
+        tile.UNKNOWN, tile.POINT, tile.LINESTRING, tile.POLYGON, tile.SPLINE]
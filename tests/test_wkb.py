@@ -0,0 +1,101 @@
+import os
+import struct
+from vector_tile_base import VectorTile
+from vector_tile_base.synthetic import generate_tile
+
+VALID = os.path.join('tests', 'data', 'valid')
+
+def read_wkb(data, pos=0):
+    # Minimal little endian WKB reader, returns (type, coordinates, end)
+    order, type_code = struct.unpack_from('<BI', data, pos)
+    assert order == 1
+    pos = pos + 5
+    dim = 3 if type_code > 1000 else 2
+    base = type_code % 1000
+    def coords(pos, count):
+        values = struct.unpack_from('<%dd' % (count * dim), data, pos)
+        return [list(values[i:i + dim]) for i in range(0, len(values), dim)], pos + 8 * count * dim
+    if base == 1:
+        point, pos = coords(pos, 1)
+        return base, point[0], pos
+    count, = struct.unpack_from('<I', data, pos)
+    pos = pos + 4
+    if base == 2:
+        line, pos = coords(pos, count)
+        return base, line, pos
+    if base == 3:
+        rings = []
+        for i in range(count):
+            n, = struct.unpack_from('<I', data, pos)
+            ring, pos = coords(pos + 4, n)
+            rings.append(ring)
+        return base, rings, pos
+    parts = []
+    for i in range(count):
+        part_type, part, pos = read_wkb(data, pos)
+        assert part_type == base - 3
+        parts.append(part)
+    return base, parts, pos
+
+def test_matches_decoded_geometry():
+    tiles = [VectorTile(open(os.path.join(VALID, name), 'rb').read()) for name in sorted(os.listdir(VALID))]
+    tiles.append(VectorTile(generate_tile(seed=3, points=20, line_strings=20, polygons=20, version=3, elevation=True).serialize()))
+    checked = 0
+    for vt in tiles:
+        for layer in vt.layers:
+            for feature, data in zip(layer.features, layer.to_wkb()):
+                if feature.type == 'spline':
+                    continue
+                geometry = feature.get_geometry()
+                base, coordinates, end = read_wkb(data)
+                assert end == len(data)
+                assert base == {'point': 1, 'line_string': 2, 'polygon': 3}[feature.type] + (3 if len(geometry) > 1 else 0)
+                assert coordinates == (geometry[0] if len(geometry) == 1 else geometry)
+                if feature.has_elevation:
+                    assert struct.unpack_from('<I', data, 1)[0] > 1000
+                checked = checked + 1
+    assert checked > 60
+
+def make_layer():
+    vt = VectorTile()
+    layer = vt.add_layer('mixed', version=3, x=0, y=0, zoom=0)
+    layer.add_point_feature().add_points([10, 20])
+    layer.add_point_feature().add_points([[1, 2], [3, 4]])
+    layer.add_line_string_feature().add_line_string([[0, 0], [5, 5]])
+    feature = layer.add_polygon_feature()
+    feature.add_ring([[0, 0], [10, 0], [10, 10], [0, 0]])
+    layer.add_polygon_feature()
+    return layer
+
+def test_point_bytes():
+    layer = make_layer()
+    assert layer.to_wkb()[0] == struct.pack('<BIdd', 1, 1, 10.0, 20.0)
+    assert layer.to_wkb()[4] is None
+
+def test_packed():
+    layer = make_layer()
+    items = layer.to_wkb()
+    data, offsets = layer.to_wkb(packed=True)
+    assert len(offsets) == 6
+    assert offsets[-1] == len(data)
+    for i, item in enumerate(items):
+        assert data[offsets[i]:offsets[i + 1]] == (item or b'')
+
+def test_lonlat():
+    layer = make_layer()
+    base, point, end = read_wkb(layer.to_wkb(lonlat=True)[0])
+    assert point[0] == 10.0 / 4096 * 360.0 - 180.0
+
+def test_wkt():
+    assert make_layer().to_wkt() == [
+        'POINT (10 20)',
+        'MULTIPOINT ((1 2), (3 4))',
+        'LINESTRING (0 0, 5 5)',
+        'POLYGON ((0 0, 10 0, 10 10, 0 0))',
+        None
+    ]
+    vt = VectorTile()
+    layer = vt.add_layer('3d', version=3)
+    layer.add_line_string_feature(has_elevation=True).add_line_string([[0, 0, 1], [5, 5, 2]])
+    assert layer.to_wkt() == ['LINESTRING Z (0.0 0.0 1.0, 5.0 5.0 2.0)']
+    assert layer.to_wkt(no_elevation=True) == ['LINESTRING (0 0, 5 5)']
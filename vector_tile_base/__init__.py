@@ -1,16 +1,52 @@
-from . import engine
-
-VectorTile = engine.VectorTile
-Layer = engine.Layer
-PointFeature = engine.PointFeature
-LineStringFeature = engine.LineStringFeature
-PolygonFeature = engine.PolygonFeature
-SplineFeature = engine.SplineFeature
-FeatureAttributes = engine.FeatureAttributes
-Float = engine.Float
-FloatList = engine.FloatList
-UInt = engine.UInt
-scaling_calculation = engine.scaling_calculation
+import importlib
+import sys
+from . import runtime
 
-__version__ = "1.0"
+# Names exported by the package and the module they come from. Modules are only
+# imported when one of their names is first used, so importing the package does
+# not load protobuf or numpy.
+_EXPORTS = {
+    'VectorTile': 'engine',
+    'Layer': 'engine',
+    'PointFeature': 'engine',
+    'LineStringFeature': 'engine',
+    'PolygonFeature': 'engine',
+    'SplineFeature': 'engine',
+    'FeatureAttributes': 'engine',
+    'Float': 'engine',
+    'FloatList': 'engine',
+    'UInt': 'engine',
+    'scaling_calculation': 'engine',
+    'downgrade_to_v2': 'engine',
+    'size_report': 'wire',
+    'subset_tile': 'subset',
+    'validate': 'validator',
+    'TileCache': 'cache'
+}
+
+_SUBMODULES = ['engine', 'wire', 'validator', 'synthetic', 'instrumentation', 'cli', 'aio', 'cache', 'mbtiles', 'pmtiles', 'mercator', 'geojson', 'wkb', 'columns', 'hittest', 'subset', 'vector_tile_pb2']
+
+protobuf_implementation = runtime.protobuf_implementation
+warn_on_slow_protobuf = runtime.warn_on_slow_protobuf
+SlowProtobufWarning = runtime.SlowProtobufWarning
+
+__all__ = sorted(_EXPORTS) + ['protobuf_implementation', 'warn_on_slow_protobuf', 'SlowProtobufWarning']
 
+def __getattr__(name):
+    if name in _EXPORTS:
+        value = getattr(importlib.import_module('.' + _EXPORTS[name], __name__), name)
+        globals()[name] = value
+        return value
+    if name in _SUBMODULES:
+        return importlib.import_module('.' + name, __name__)
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS) | set(_SUBMODULES))
+
+if sys.version_info < (3, 7):
+    # Module level __getattr__ is not supported, import everything up front
+    for _name in _EXPORTS:
+        __getattr__(_name)
+
+__version__ = "1.0"
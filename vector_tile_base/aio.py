@@ -0,0 +1,98 @@
+import asyncio
+import concurrent.futures
+import functools
+from . import engine
+from . import wire
+
+# Asyncio facade over the engine. Decoding, encoding and transforming tiles is
+# CPU bound, so the work is run on an executor and the number of tiles being
+# processed at the same time is limited so queued work does not pile up in
+# the executor.
+
+def _decode(raw, layers=None):
+    if layers is not None:
+        raw = wire.select_layers(raw, layers)
+    return engine.VectorTile(raw)
+
+def _encode(builder, args, kwargs):
+    vt = builder(*args, **kwargs)
+    if isinstance(vt, engine.VectorTile):
+        return vt.serialize()
+    return vt
+
+def _transform(func, raw, layers, args, kwargs):
+    vt = _decode(raw, layers)
+    result = func(vt, *args, **kwargs)
+    if result is None:
+        result = vt
+    if isinstance(result, engine.VectorTile):
+        return result.serialize()
+    return result
+
+class TileWorker(object):
+
+    def __init__(self, executor=None, max_concurrency=None):
+        # executor of None uses the default executor of the event loop
+        self._executor = executor
+        self._max_concurrency = max_concurrency
+        self._semaphores = {}
+
+    @property
+    def executor(self):
+        return self._executor
+
+    @property
+    def max_concurrency(self):
+        return self._max_concurrency
+
+    def _semaphore(self, loop):
+        # Semaphores are bound to the event loop they are first used in
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self._max_concurrency)
+            self._semaphores = dict((l, s) for l, s in self._semaphores.items() if not l.is_closed())
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+    async def run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        call = functools.partial(func, *args, **kwargs)
+        if self._max_concurrency is None:
+            return await loop.run_in_executor(self._executor, call)
+        async with self._semaphore(loop):
+            return await loop.run_in_executor(self._executor, call)
+
+    async def decode(self, raw, layers=None):
+        if isinstance(self._executor, concurrent.futures.ProcessPoolExecutor):
+            raise Exception("Decoded tiles can not be returned from a process pool, use transform instead")
+        return await self.run(_decode, raw, layers)
+
+    async def encode(self, builder, *args, **kwargs):
+        return await self.run(_encode, builder, args, kwargs)
+
+    async def transform(self, func, raw, *args, **kwargs):
+        layers = kwargs.pop('layers', None)
+        return await self.run(_transform, func, raw, layers, args, kwargs)
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+
+_default_worker = TileWorker()
+
+def configure(executor=None, max_concurrency=None):
+    global _default_worker
+    _default_worker = TileWorker(executor=executor, max_concurrency=max_concurrency)
+    return _default_worker
+
+def default_worker():
+    return _default_worker
+
+async def decode(raw, layers=None):
+    return await _default_worker.decode(raw, layers=layers)
+
+async def encode(builder, *args, **kwargs):
+    return await _default_worker.encode(builder, *args, **kwargs)
+
+async def transform(func, raw, *args, **kwargs):
+    return await _default_worker.transform(func, raw, *args, **kwargs)
@@ -0,0 +1,111 @@
+import collections
+import hashlib
+import threading
+from . import engine
+
+# Bounded cache of decoded tiles. Entries are accounted by the size of the
+# serialized tile and evicted least recently used first. Tiles are decoded
+# lazily by default, so only the layers that are used are parsed and built.
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+if hasattr(hashlib, 'blake2b'):
+    def content_key(data):
+        return hashlib.blake2b(data, digest_size=16).digest()
+else:
+    def content_key(data):
+        return hashlib.sha1(data).digest()
+
+class TileCache(object):
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, lazy=True):
+        self._max_bytes = max_bytes
+        self._lazy = lazy
+        self._lock = threading.Lock()
+        self._tiles = collections.OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def max_bytes(self):
+        return self._max_bytes
+
+    def __len__(self):
+        with self._lock:
+            return len(self._tiles)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._tiles
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._tiles.pop(key, None)
+            if entry is None:
+                self._misses = self._misses + 1
+                return default
+            self._tiles[key] = entry
+            self._hits = self._hits + 1
+            return entry[0]
+
+    def decode(self, data, key=None):
+        # Returns the decoded tile for data, keyed by a hash of the data unless
+        # a key such as (z, x, y) is given. Cached tiles are shared between
+        # callers and should not be modified.
+        if key is None:
+            key = content_key(data)
+        vt = self.get(key)
+        if vt is not None:
+            return vt
+        # Decode outside of the lock so other threads are not held up
+        vt = engine.VectorTile(data, lazy=self._lazy)
+        return self.put(key, vt, len(data))
+
+    def put(self, key, vt, size):
+        # Adds a decoded tile of size serialized bytes, if another thread added
+        # the key first its tile is kept and returned.
+        if size > self._max_bytes:
+            return vt
+        with self._lock:
+            entry = self._tiles.get(key)
+            if entry is not None:
+                return entry[0]
+            self._tiles[key] = (vt, size)
+            self._bytes = self._bytes + size
+            while self._bytes > self._max_bytes:
+                old_key, (old_vt, old_size) = self._tiles.popitem(last=False)
+                self._bytes = self._bytes - old_size
+                self._evictions = self._evictions + 1
+        return vt
+
+    def discard(self, key):
+        with self._lock:
+            entry = self._tiles.pop(key, None)
+            if entry is not None:
+                self._bytes = self._bytes - entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._tiles.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'tiles': len(self._tiles),
+                'bytes': self._bytes,
+                'max_bytes': self._max_bytes,
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'hit_rate': float(self._hits) / lookups if lookups else 0.0
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self._hits = 0
+            self._misses = 0
+            self._evictions = 0
@@ -0,0 +1,360 @@
+import argparse
+import gzip
+import io
+import json
+import multiprocessing
+import os
+import sys
+import time
+import zipfile
+from . import mbtiles
+from . import pmtiles
+from . import validator
+from . import wire
+
+# The engine, and with it protobuf, is only imported by the commands that decode
+# tiles, so wire level commands start quickly in short lived worker processes.
+
+TILE_EXTENSIONS = ('.mvt', '.pbf', '.vector.pbf', '.mvt.gz', '.pbf.gz')
+ARCHIVE_EXTENSIONS = ('.mbtiles', '.pmtiles')
+
+# Inputs
+
+def _is_tile_name(name):
+    return name.lower().endswith(TILE_EXTENSIONS)
+
+def iter_sources(paths):
+    # A source is a (path, member) tuple, member is only set for tiles stored in
+    # an archive, for MBTiles and PMTiles it is z/x/y. Sources are plain tuples so they can
+    # be sent to worker processes.
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if _is_tile_name(name):
+                        yield (os.path.join(root, name), None)
+        elif path.lower().endswith(ARCHIVE_EXTENSIONS):
+            reader = _open_archive(path)
+            try:
+                for z, x, y in reader.iter_addresses():
+                    yield (path, '%d/%d/%d' % (z, x, y))
+            finally:
+                reader.close()
+        elif zipfile.is_zipfile(path):
+            with zipfile.ZipFile(path) as archive:
+                for name in archive.namelist():
+                    if _is_tile_name(name):
+                        yield (path, name)
+        else:
+            yield (path, None)
+
+def source_name(source):
+    path, member = source
+    if member is None:
+        return path
+    return path + '!' + member
+
+def _decompress(data):
+    if data[:2] == b'\x1f\x8b':
+        return gzip.GzipFile(fileobj=io.BytesIO(data)).read()
+    return data
+
+def _as_dict(attributes):
+    return dict((key, attributes[key]) for key in attributes)
+
+# Archives stay open in each process while tiles are read from them
+_archives = {}
+
+def _open_archive(path):
+    if path.lower().endswith('.pmtiles'):
+        return pmtiles.PMTilesReader(path)
+    return mbtiles.MBTilesReader(path)
+
+def read_source(source):
+    path, member = source
+    if member is None:
+        with open(path, 'rb') as f:
+            data = f.read()
+    elif path.lower().endswith(ARCHIVE_EXTENSIONS):
+        reader = _archives.get(path)
+        if reader is None:
+            reader = _archives[path] = _open_archive(path)
+        z, x, y = [int(part) for part in member.split('/')]
+        if isinstance(reader, mbtiles.MBTilesReader):
+            data = reader.read(z, x, y, decode=False)
+        else:
+            data = reader.get(z, x, y)
+        if data is None:
+            raise Exception("Tile %s is missing" % member)
+        data = bytes(data)
+    else:
+        with zipfile.ZipFile(path) as archive:
+            data = archive.read(member)
+    return _decompress(data)
+
+def _map(func, items, jobs):
+    # Runs func over items, in worker processes when there is more than one item
+    # and more than one job. Results are returned in order.
+    if jobs is None:
+        jobs = multiprocessing.cpu_count()
+    if jobs <= 1 or len(items) <= 1:
+        for item in items:
+            yield func(item)
+        return
+    pool = multiprocessing.Pool(min(jobs, len(items)))
+    try:
+        for result in pool.imap(func, items, chunksize=max(1, len(items) // (jobs * 8))):
+            yield result
+    finally:
+        pool.close()
+        pool.join()
+
+# Tasks run by the workers, these are module level functions so they can be pickled
+
+def _info_task(source):
+    data = read_source(source)
+    return source_name(source), wire.size_report(data, top=0)
+
+def _stats_task(source):
+    data = read_source(source)
+    return wire.size_report(data, top=None)
+
+def _validate_task(source):
+    try:
+        data = read_source(source)
+    except Exception as e:
+        return source_name(source), [str(e)]
+    return source_name(source), [str(error) for error in validator.iter_errors(data)]
+
+def _bench_task(args):
+    from . import engine
+    source, repeat = args
+    data = read_source(source)
+    features = [0]
+    def decode():
+        return engine.VectorTile(data)
+    def iterate():
+        vt = engine.VectorTile(data)
+        features[0] = 0
+        for layer in vt.layers:
+            for feature in layer.features:
+                feature.get_geometry()
+                _as_dict(feature.attributes)
+                features[0] = features[0] + 1
+    vt = decode()
+    results = {'bytes': len(data)}
+    for name, func in [('decode', decode), ('iterate', iterate), ('serialize', vt.serialize)]:
+        best = None
+        for i in range(repeat):
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+            if best is None or elapsed < best:
+                best = elapsed
+        results[name] = best
+    results['features'] = features[0]
+    return results
+
+def _convert_task(args):
+    from . import engine
+    source, output, downgrade, compress = args
+    data = read_source(source)
+    if downgrade:
+        data = engine.downgrade_to_v2(data).serialize()
+    else:
+        data = engine.VectorTile(data).serialize()
+    directory = os.path.dirname(output)
+    if directory and not os.path.isdir(directory):
+        try:
+            os.makedirs(directory)
+        except OSError:
+            if not os.path.isdir(directory):
+                raise
+    if compress:
+        with gzip.open(output, 'wb') as f:
+            f.write(data)
+    else:
+        with open(output, 'wb') as f:
+            f.write(data)
+    return output
+
+# Commands
+
+def dump(data, out):
+    # Writes the tile as JSON one feature at a time, so the output is never built in memory
+    from . import engine
+    vt = engine.VectorTile(data)
+    out.write('{"layers":[')
+    for i, layer in enumerate(vt.layers):
+        if i:
+            out.write(',')
+        header = {'name': layer.name, 'version': layer.version, 'extent': layer.extent}
+        if layer.zoom is not None:
+            header['zoom'] = layer.zoom
+            header['x'] = layer.x
+            header['y'] = layer.y
+        out.write(json.dumps(header)[:-1] + ',"features":[')
+        for j, feature in enumerate(layer.features):
+            if j:
+                out.write(',')
+            item = {'id': feature.id, 'type': feature.type, 'attributes': _as_dict(feature.attributes)}
+            if layer.version > 2:
+                item['geometric_attributes'] = _as_dict(feature.geometric_attributes)
+            item['geometry'] = feature.get_geometry()
+            out.write('\n')
+            out.write(json.dumps(item, default=wire._json_default))
+        out.write(']}')
+    out.write(']}\n')
+
+def command_info(args, out):
+    sources = list(iter_sources(args.inputs))
+    for name, report in _map(_info_task, sources, args.jobs):
+        out.write('%s: %d bytes, %d layers\n' % (name, report['bytes'], len(report['layers'])))
+        for layer in report['layers']:
+            out.write('  %s (v%d): %d features, %d bytes\n' % (layer['name'], layer['version'], layer['features'], layer['bytes']))
+    return 0
+
+def command_dump(args, out):
+    sources = list(iter_sources(args.inputs))
+    if len(sources) == 1:
+        dump(read_source(sources[0]), out)
+        return 0
+    for source in sources:
+        out.write('{"source":%s,"tile":' % json.dumps(source_name(source)))
+        dump(read_source(source), out)
+        out.write('}\n')
+    return 0
+
+def command_convert(args, out):
+    tasks = []
+    outputs = {}
+    for root in args.inputs:
+        for source in iter_sources([root]):
+            path, member = source
+            # Tiles found in a directory keep their path below it, so a z/x/y tree
+            # is written out as the same tree
+            if member is not None and path.lower().endswith(ARCHIVE_EXTENSIONS):
+                # Tiles of MBTiles and PMTiles archives are written as z/x/y.mvt
+                name = member + '.mvt'
+            elif member is not None:
+                name = member
+            elif os.path.isdir(root):
+                name = os.path.relpath(path, root)
+            else:
+                name = os.path.basename(path)
+            if name.endswith('.gz'):
+                name = name[:-3]
+            if args.gzip:
+                name = name + '.gz'
+            output = os.path.normpath(os.path.join(args.output, name))
+            if output in outputs:
+                raise Exception("%s and %s would both be written to %s" % (outputs[output], source_name(source), output))
+            outputs[output] = source_name(source)
+            tasks.append((source, output, args.downgrade, args.gzip))
+    count = 0
+    for output in _map(_convert_task, tasks, args.jobs):
+        count = count + 1
+    out.write('converted %d tiles\n' % count)
+    return 0
+
+def command_stats(args, out):
+    sources = list(iter_sources(args.inputs))
+    layers = {}
+    total = 0
+    tiles = 0
+    for report in _map(_stats_task, sources, args.jobs):
+        tiles = tiles + 1
+        total = total + report['bytes']
+        for layer in report['layers']:
+            summary = layers.get(layer['name'])
+            if summary is None:
+                summary = layers[layer['name']] = {'tiles': 0, 'features': 0, 'bytes': 0, 'sections': {}, 'keys': {}}
+            summary['tiles'] = summary['tiles'] + 1
+            summary['features'] = summary['features'] + layer['features']
+            summary['bytes'] = summary['bytes'] + layer['bytes']
+            for section, size in layer['sections'].items():
+                summary['sections'][section] = summary['sections'].get(section, 0) + size
+            for key in layer['keys']:
+                summary['keys'][key['key']] = summary['keys'].get(key['key'], 0) + key['bytes']
+    if args.json:
+        out.write(json.dumps({'tiles': tiles, 'bytes': total, 'layers': layers}, sort_keys=True) + '\n')
+        return 0
+    out.write('%d tiles, %d bytes\n' % (tiles, total))
+    for name in sorted(layers, key=lambda x: -layers[x]['bytes']):
+        summary = layers[name]
+        out.write('%s: %d tiles, %d features, %d bytes\n' % (name, summary['tiles'], summary['features'], summary['bytes']))
+        for section, size in sorted(summary['sections'].items(), key=lambda x: -x[1]):
+            if size:
+                out.write('  %-22s %12d\n' % (section, size))
+        heavy = sorted(summary['keys'].items(), key=lambda x: -x[1])[:args.top]
+        for key, size in heavy:
+            out.write('  key %-18s %12d\n' % (key, size))
+    return 0
+
+def command_validate(args, out):
+    sources = list(iter_sources(args.inputs))
+    invalid = 0
+    for name, errors in _map(_validate_task, sources, args.jobs):
+        if errors:
+            invalid = invalid + 1
+            for error in errors:
+                out.write('%s: %s\n' % (name, error))
+        elif args.verbose:
+            out.write('%s: valid\n' % name)
+    out.write('%d tiles, %d invalid\n' % (len(sources), invalid))
+    return 1 if invalid else 0
+
+def command_bench(args, out):
+    sources = list(iter_sources(args.inputs))
+    # Benchmarks run one tile at a time unless asked otherwise, so workers do not compete
+    jobs = args.jobs if args.jobs is not None else 1
+    totals = {'bytes': 0, 'features': 0, 'decode': 0.0, 'iterate': 0.0, 'serialize': 0.0}
+    for results in _map(_bench_task, [(source, args.repeat) for source in sources], jobs):
+        for key in totals:
+            totals[key] = totals[key] + results[key]
+    out.write('%-10s %10s %14s %10s\n' % ('operation', 'time (ms)', 'features/s', 'MB/s'))
+    for operation in ['decode', 'iterate', 'serialize']:
+        elapsed = max(totals[operation], 1e-9)
+        out.write('%-10s %10.2f %14.0f %10.2f\n' % (operation, elapsed * 1000.0, totals['features'] / elapsed,
+            totals['bytes'] / elapsed / 1024.0 / 1024.0))
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='vtb', description='Inspect and process vector tiles')
+    subparsers = parser.add_subparsers(dest='command')
+
+    def add_command(name, func, help):
+        sub = subparsers.add_parser(name, help=help)
+        sub.add_argument('inputs', nargs='+', help='Tile files, directories, zip archives, MBTiles or PMTiles')
+        sub.add_argument('-j', '--jobs', type=int, default=None, help='Number of worker processes, defaults to the number of CPUs')
+        sub.set_defaults(func=func)
+        return sub
+
+    add_command('info', command_info, 'Layers, feature counts and sizes from a wire scan')
+    add_command('dump', command_dump, 'Stream tiles as JSON')
+    sub = add_command('convert', command_convert, 'Re-encode tiles')
+    sub.add_argument('-o', '--output', required=True, help='Output directory')
+    sub.add_argument('--downgrade', action='store_true', help='Convert to version 2 of the specification')
+    sub.add_argument('--gzip', action='store_true', help='Compress output tiles with gzip')
+    sub = add_command('stats', command_stats, 'Aggregate byte sizes per layer, section and key')
+    sub.add_argument('--top', type=int, default=10, help='Number of keys to show per layer')
+    sub.add_argument('--json', action='store_true', help='Write the statistics as JSON')
+    sub = add_command('validate', command_validate, 'Check tiles against the specification')
+    sub.add_argument('-v', '--verbose', action='store_true', help='Also list valid tiles')
+    sub = add_command('bench', command_bench, 'Time decode, iteration and serialization')
+    sub.add_argument('--repeat', type=int, default=3, help='Number of runs, the best time is reported')
+    return parser
+
+def main(argv=None, out=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if out is None:
+        out = sys.stdout
+    if getattr(args, 'func', None) is None:
+        parser.print_help(out)
+        return 2
+    return args.func(args, out)
+
+if __name__ == '__main__':
+    sys.exit(main())
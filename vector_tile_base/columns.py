@@ -0,0 +1,332 @@
+import json
+from . import engine
+from . import wire
+from .engine import np
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# Columnar export of a layer in the Arrow memory layout. Geometry uses the
+# GeoArrow native encodings, flat interleaved coordinates with one offset array
+# per level of nesting, or WKB when a layer mixes geometry types. Attributes
+# become one column per key. String values are dictionary encoded with the
+# string table of the layer as dictionary, using the indices stored in the
+# features. Columns are NumPy buffers that are handed to pyarrow without a copy.
+
+_GEOMETRY_ENCODINGS = {
+    'point': 'geoarrow.multipoint',
+    'line_string': 'geoarrow.multilinestring',
+    'spline': 'geoarrow.multilinestring',
+    'polygon': 'geoarrow.multipolygon'
+}
+
+class _AttributeColumn(object):
+
+    __slots__ = ('rows', 'values', 'value_kinds', 'kinds')
+
+    def __init__(self):
+        self.rows = []
+        self.values = []
+        self.value_kinds = []
+        self.kinds = set()
+
+    def add(self, row, kind, value):
+        self.rows.append(row)
+        self.values.append(value)
+        self.value_kinds.append(kind)
+        self.kinds.add(kind)
+
+def _kind(value):
+    if isinstance(value, bool):
+        return 'bool'
+    elif isinstance(value, (int, engine.long)):
+        return 'int'
+    elif isinstance(value, float):
+        return 'float'
+    return 'object'
+
+def _scan_tags(layer, columns, order):
+    # Version 2 layers, values are looked up in the values table of the layer
+    # and strings are remapped to a dictionary of only the string values
+    dictionary = []
+    string_index = {}
+    for i, value in enumerate(layer._values):
+        if isinstance(value, (str, engine.other_str)):
+            string_index[i] = len(dictionary)
+            dictionary.append(value)
+    for row, feature in enumerate(layer.features):
+        tags = feature._feature.tags[:]
+        for i in range(0, len(tags) - 1, 2):
+            key = layer._keys[tags[i]]
+            column = columns.get(key)
+            if column is None:
+                column = columns[key] = _AttributeColumn()
+                order.append(key)
+            index = string_index.get(tags[i + 1])
+            if index is not None:
+                column.add(row, 'string', index)
+            else:
+                value = layer._values[tags[i + 1]]
+                column.add(row, _kind(value), value)
+    return dictionary
+
+def _scan_inline(layer, columns, order):
+    # Version 3 layers, scalar values are read from the complex value integers
+    # and strings keep their index into the string table of the layer
+    for row, feature in enumerate(layer.features):
+        itr = iter(feature._feature.attributes[:])
+        for key_index in itr:
+            try:
+                complex_value = next(itr)
+            except StopIteration:
+                break
+            key = layer._keys[key_index]
+            column = columns.get(key)
+            if column is None:
+                column = columns[key] = _AttributeColumn()
+                order.append(key)
+            val_id = engine.get_inline_value_id(complex_value)
+            param = engine.get_inline_value_parameter(complex_value)
+            if val_id == engine.CV_TYPE_STRING:
+                column.add(row, 'string', param)
+            elif val_id == engine.CV_TYPE_INLINE_UINT:
+                column.add(row, 'int', param)
+            elif val_id == engine.CV_TYPE_INLINE_SINT:
+                column.add(row, 'int', engine.zig_zag_decode(param))
+            elif val_id == engine.CV_TYPE_BOOL_NULL:
+                if param == engine.CV_BOOL_TRUE or param == engine.CV_BOOL_FALSE:
+                    column.add(row, 'bool', param == engine.CV_BOOL_TRUE)
+            else:
+                # Table lookups and nested values are decoded by the layer
+                value = layer._get_inline_value(complex_value, itr)
+                column.add(row, _kind(value), value)
+    return layer._string_values
+
+def _validity(num_rows, rows):
+    validity = np.zeros(num_rows, dtype=bool)
+    validity[rows] = True
+    return validity
+
+def _attribute_column(num_rows, column, dictionary):
+    rows = np.asarray(column.rows, dtype=np.int64)
+    validity = _validity(num_rows, rows)
+    kinds = column.kinds
+    if kinds == set(['string']):
+        indices = np.zeros(num_rows, dtype=np.int32)
+        indices[rows] = column.values
+        return {'type': 'dictionary', 'indices': indices, 'dictionary': dictionary, 'validity': validity}
+    elif kinds == set(['bool']):
+        values = np.zeros(num_rows, dtype=bool)
+        values[rows] = column.values
+        return {'type': 'bool', 'values': values, 'validity': validity}
+    elif kinds <= set(['int', 'float']):
+        if kinds == set(['int']):
+            if max(column.values) < 2**63:
+                dtype = np.int64
+            elif min(column.values) >= 0:
+                dtype = np.uint64
+            else:
+                dtype = np.float64
+        else:
+            dtype = np.float64
+        values = np.zeros(num_rows, dtype=dtype)
+        values[rows] = column.values
+        return {'type': np.dtype(dtype).name, 'values': values, 'validity': validity}
+    # Mixed and nested values are kept as python values
+    values = [None] * num_rows
+    for row, kind, value in zip(column.rows, column.value_kinds, column.values):
+        values[row] = dictionary[value] if kind == 'string' else value
+    return {'type': 'object', 'values': values, 'validity': validity}
+
+def _string_column(num_rows, rows, strings):
+    validity = _validity(num_rows, rows)
+    encoded = [None] * num_rows
+    for row, value in zip(rows, strings):
+        encoded[row] = value.encode('utf-8')
+    lengths = np.asarray([0 if item is None else len(item) for item in encoded], dtype=np.int32)
+    offsets = np.zeros(num_rows + 1, dtype=np.int32)
+    offsets[1:] = np.cumsum(lengths)
+    data = b''.join(item for item in encoded if item is not None)
+    return {'type': 'string', 'offsets': offsets, 'data': data, 'validity': validity}
+
+def _geometry_column(layer, no_elevation, spline_samples):
+    features = layer.features
+    types = set(feature.type for feature in features)
+    encodings = set(_GEOMETRY_ENCODINGS[t] for t in types)
+    if len(encodings) > 1:
+        from . import wkb
+        data, offsets = wkb.layer_wkb(layer, packed=True, no_elevation=no_elevation, spline_samples=spline_samples)
+        return {'type': 'geoarrow.wkb', 'offsets': offsets, 'data': data, 'validity': np.diff(offsets) > 0}
+    encoding = encodings.pop() if encodings else 'geoarrow.multipoint'
+    dim = 2
+    if not no_elevation and any(feature.has_elevation for feature in features):
+        dim = 3
+    coords = []
+    # Offsets from the outermost level inwards, geometries, then polygons and rings
+    levels = 1 if encoding == 'geoarrow.multipoint' else (2 if encoding == 'geoarrow.multilinestring' else 3)
+    offsets = [[0] for i in range(levels)]
+    validity = np.zeros(len(features), dtype=bool)
+    vertices = [0]
+
+    def add_coords(array):
+        if array.shape[1] < dim:
+            # Features without elevation in a layer with elevation
+            array = np.column_stack([array, np.full(len(array), np.nan)])
+        coords.append(array)
+        vertices[0] = vertices[0] + len(array)
+        return vertices[0]
+
+    for i, feature in enumerate(features):
+        geom_type, parts = engine._simple_geometry(feature, no_elevation, spline_samples)
+        if geom_type is not None:
+            validity[i] = True
+            if levels == 1:
+                offsets[0].append(add_coords(parts))
+            elif levels == 2:
+                lines = [parts] if geom_type == 'LineString' else parts
+                for line in lines:
+                    offsets[1].append(add_coords(line))
+                offsets[0].append(len(offsets[1]) - 1)
+            else:
+                polygons = [parts] if geom_type == 'Polygon' else parts
+                for polygon in polygons:
+                    for ring in polygon:
+                        offsets[2].append(add_coords(ring))
+                    offsets[1].append(len(offsets[2]) - 1)
+                offsets[0].append(len(offsets[1]) - 1)
+        else:
+            offsets[0].append(offsets[0][-1])
+    if coords:
+        coords = np.ascontiguousarray(np.concatenate(coords).astype(np.float64))
+    else:
+        coords = np.zeros((0, dim), dtype=np.float64)
+    return {
+        'type': encoding,
+        'dimensions': 'xyz' if dim == 3 else 'xy',
+        'coords': coords,
+        'offsets': [np.asarray(level, dtype=np.int32) for level in offsets],
+        'validity': validity
+    }
+
+def layer_columns(layer, arrow=None, no_elevation=False, spline_samples=8, geometry=True):
+    # Returns the layer as columns, a pyarrow Table when arrow is True or when
+    # arrow is None and pyarrow is installed, else a dict of NumPy buffers.
+    engine._require_numpy()
+    if arrow is None:
+        arrow = pa is not None
+    if arrow and pa is None:
+        raise Exception("pyarrow is required for this operation, please install pyarrow")
+    features = layer.features
+    num_rows = len(features)
+    columns = {}
+    names = []
+
+    id_rows = []
+    ids = []
+    string_id_rows = []
+    string_ids = []
+    for row, feature in enumerate(features):
+        if feature._feature.HasField('id'):
+            id_rows.append(row)
+            ids.append(feature._feature.id)
+        elif feature._feature.HasField('string_id'):
+            string_id_rows.append(row)
+            string_ids.append(feature._feature.string_id)
+    values = np.zeros(num_rows, dtype=np.uint64)
+    values[id_rows] = ids
+    columns['id'] = {'type': 'uint64', 'values': values, 'validity': _validity(num_rows, id_rows)}
+    names.append('id')
+    if string_id_rows:
+        columns['string_id'] = _string_column(num_rows, string_id_rows, string_ids)
+        names.append('string_id')
+    if geometry:
+        columns['geometry'] = _geometry_column(layer, no_elevation, spline_samples)
+        names.append('geometry')
+
+    attributes = {}
+    order = []
+    if layer._inline_attributes:
+        dictionary = _scan_inline(layer, attributes, order)
+    else:
+        dictionary = _scan_tags(layer, attributes, order)
+    for key in order:
+        name = key
+        if name in columns:
+            name = 'attribute_' + key
+        columns[name] = _attribute_column(num_rows, attributes[key], dictionary)
+        names.append(name)
+
+    out = {'num_rows': num_rows, 'names': names, 'columns': columns}
+    if arrow:
+        return to_arrow(out)
+    return out
+
+# Arrow
+
+def _bitmap(validity):
+    if validity.all():
+        return None
+    return pa.py_buffer(np.packbits(validity, bitorder='little'))
+
+def _null_count(validity):
+    return int(len(validity) - np.count_nonzero(validity))
+
+def _arrow_geometry(column, num_rows):
+    validity = column['validity']
+    if column['type'] == 'geoarrow.wkb':
+        return pa.Array.from_buffers(pa.large_binary(), num_rows, [_bitmap(validity),
+            pa.py_buffer(column['offsets']), pa.py_buffer(column['data'])], _null_count(validity))
+    coords = column['coords']
+    dim = coords.shape[1]
+    values = pa.Array.from_buffers(pa.float64(), coords.size, [None, pa.py_buffer(coords)])
+    field = pa.field(column['dimensions'], pa.float64(), nullable=False)
+    array = pa.FixedSizeListArray.from_arrays(values, type=pa.list_(field, dim))
+    offsets = column['offsets']
+    # Inner levels first, only the outermost level has nulls
+    for i in range(len(offsets) - 1, -1, -1):
+        length = len(offsets[i]) - 1
+        bitmap = _bitmap(validity) if i == 0 else None
+        null_count = _null_count(validity) if i == 0 else 0
+        array = pa.Array.from_buffers(pa.list_(array.type), length, [bitmap, pa.py_buffer(offsets[i])], null_count, children=[array])
+    return array
+
+def _arrow_column(column, num_rows):
+    validity = column['validity']
+    bitmap = _bitmap(validity)
+    null_count = _null_count(validity)
+    kind = column['type']
+    if kind == 'dictionary':
+        indices = pa.Array.from_buffers(pa.int32(), num_rows, [bitmap, pa.py_buffer(column['indices'])], null_count)
+        return pa.DictionaryArray.from_arrays(indices, pa.array(column['dictionary'], type=pa.string()))
+    elif kind == 'string':
+        return pa.Array.from_buffers(pa.string(), num_rows, [bitmap, pa.py_buffer(column['offsets']),
+            pa.py_buffer(column['data'])], null_count)
+    elif kind == 'bool':
+        return pa.Array.from_buffers(pa.bool_(), num_rows, [bitmap, pa.py_buffer(np.packbits(column['values'], bitorder='little'))], null_count)
+    elif kind == 'object':
+        try:
+            return pa.array(column['values'])
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Values with no common Arrow type are stored as JSON text
+            return pa.array([None if v is None else json.dumps(v, default=wire._json_default) for v in column['values']],
+                type=pa.string())
+    return pa.Array.from_buffers(pa.from_numpy_dtype(column['values'].dtype), num_rows, [bitmap, pa.py_buffer(column['values'])], null_count)
+
+def to_arrow(table):
+    # Converts the NumPy buffers returned by layer_columns to a pyarrow Table
+    if pa is None:
+        raise Exception("pyarrow is required for this operation, please install pyarrow")
+    arrays = []
+    fields = []
+    for name in table['names']:
+        column = table['columns'][name]
+        if column['type'].startswith('geoarrow.'):
+            array = _arrow_geometry(column, table['num_rows'])
+            fields.append(pa.field(name, array.type, metadata={'ARROW:extension:name': column['type'], 'ARROW:extension:metadata': '{}'}))
+        else:
+            array = _arrow_column(column, table['num_rows'])
+            fields.append(pa.field(name, array.type))
+        arrays.append(array)
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
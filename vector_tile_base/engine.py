@@ -1,29 +1,29 @@
 import itertools
 import math
+import threading
 from . import vector_tile_pb2
+from . import runtime
+from . import wire
+# Constants shared with the wire level modules are defined in wire, which does
+# not import the engine
+from .wire import (CV_TYPE_STRING, CV_TYPE_FLOAT, CV_TYPE_DOUBLE, CV_TYPE_UINT, CV_TYPE_SINT, CV_TYPE_INLINE_UINT,
+    CV_TYPE_INLINE_SINT, CV_TYPE_BOOL_NULL, CV_TYPE_LIST, CV_TYPE_MAP, CV_TYPE_LIST_DOUBLE)
+from .wire import DEFAULT_SPLINE_DEGREE
 
-# Constants
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
-## Complex Value Type
-CV_TYPE_STRING = 0
-CV_TYPE_FLOAT = 1
-CV_TYPE_DOUBLE = 2
-CV_TYPE_UINT = 3
-CV_TYPE_SINT = 4
-CV_TYPE_INLINE_UINT = 5
-CV_TYPE_INLINE_SINT = 6
-CV_TYPE_BOOL_NULL = 7
-CV_TYPE_LIST = 8
-CV_TYPE_MAP = 9
-CV_TYPE_LIST_DOUBLE = 10
+runtime._on_engine_import()
+
+# Constants
 
 ## Complex Value Bool/Null Meaning
 CV_NULL = 0
 CV_BOOL_FALSE = 1
 CV_BOOL_TRUE = 2
 
-DEFAULT_SPLINE_DEGREE = 2
-
 # Python3 Compatability
 try:
     unicode
@@ -77,6 +77,257 @@ def get_inline_value_parameter(complex_value):
 def complex_value_integer(cmd_id, param):
     return (cmd_id & 0x0F) | (param << 4);
 
+def _require_numpy():
+    if np is None:
+        raise Exception("numpy is required for this operation, please install numpy")
+
+def _masked_list(values, mask):
+    # Converts an array to a list with None wherever mask is set.
+    out = values.tolist()
+    if mask.any():
+        for i in np.flatnonzero(mask).tolist():
+            out[i] = None
+    return out
+
+def _varint_sizes(values):
+    values = np.asarray(values, dtype=np.uint64)
+    sizes = np.ones(len(values), dtype=np.int64)
+    for shift in range(7, 64, 7):
+        sizes += (values >> np.uint64(shift)) > 0
+    return sizes
+
+def _zig_zag_encode_array(values):
+    values = np.asarray(values, dtype=np.int64)
+    return ((values << 1) ^ (values >> 63)).view(np.uint64)
+
+def _zig_zag_decode_array(values):
+    return (values >> 1) ^ -(values & 1)
+
+def _decode_geometry_array(geometry, elevation=None, min_vertices=1, closed=False):
+    # Decodes a packed geometry command stream into an (n, 2) array of vertices,
+    # (n, 3) with elevation, and the offsets of the parts in it. Only command
+    # integers are read one at a time, parameters are decoded all at once. Parts
+    # with fewer than min_vertices are dropped as the geometry getters do and
+    # closed parts end with a copy of their first vertex.
+    # Slicing a repeated protobuf field is much faster than iterating over it
+    geometry = np.asarray(geometry[:], dtype=np.int64)
+    length = len(geometry)
+    mask = np.zeros(length, dtype=bool)
+    starts = []
+    vertices = 0
+    i = 0
+    while i < length:
+        command = int(geometry[i])
+        i = i + 1
+        if next_command_close_path(command):
+            continue
+        count = min(get_command_count(command), (length - i) // 2)
+        if next_command_move_to(command) or not starts:
+            starts.append(vertices)
+        mask[i:i + 2 * count] = True
+        vertices = vertices + count
+        i = i + 2 * count
+    coords = np.cumsum(_zig_zag_decode_array(geometry[mask].reshape(-1, 2)), axis=0)
+    if elevation is not None:
+        count = min(vertices, len(elevation))
+        coords = np.column_stack([coords[:count], np.asarray(elevation[:count], dtype=np.float64)])
+        vertices = count
+    offsets = np.asarray([s for s in starts if s < vertices] + [vertices], dtype=np.int64)
+    counts = np.diff(offsets)
+    if (counts < min_vertices).any():
+        keep = np.flatnonzero(counts >= min_vertices)
+        if len(keep) == 0:
+            return coords[:0], np.zeros(1, dtype=np.int64)
+        coords = np.concatenate([coords[offsets[k]:offsets[k + 1]] for k in keep.tolist()])
+        offsets = np.concatenate([[0], np.cumsum(counts[keep])])
+    if closed and len(offsets) > 1:
+        coords = np.insert(coords, offsets[1:], coords[offsets[:-1]], axis=0)
+        offsets = offsets + np.arange(len(offsets))
+    return coords, offsets
+
+def _ring_areas_array(coords, offsets):
+    # Twice the signed area of each closed ring, negative for clockwise rings
+    x = coords[:, 0].astype(np.float64)
+    y = coords[:, 1].astype(np.float64)
+    cross = np.concatenate([[0.0], np.cumsum(x[:-1] * y[1:] - y[:-1] * x[1:])])
+    return cross[offsets[1:] - 1] - cross[offsets[:-1]]
+
+def _assemble_polygons(clockwise):
+    # Groups ring indices into polygons, each polygon starts with an exterior
+    # ring that is not clockwise and interior rings before the first exterior
+    # ring are dropped.
+    polygons = []
+    polygon = []
+    for i in range(len(clockwise)):
+        if not clockwise[i]:
+            if len(polygon) != 0:
+                polygons.append(polygon)
+            polygon = [i]
+        elif len(polygon) != 0:
+            polygon.append(i)
+    if len(polygon) != 0:
+        polygons.append(polygon)
+    return polygons
+
+def _tile_to_lonlat_array(coords, zoom, x, y, extent):
+    # Transforms an (n, 2) or (n, 3) array of tile coordinates to longitude and
+    # latitude, elevation is copied
+    n = float(1 << zoom)
+    out = np.array(coords, dtype=np.float64)
+    out[:, 0] = (x + out[:, 0] / extent) / n * 360.0 - 180.0
+    out[:, 1] = np.degrees(np.arctan(np.sinh(math.pi * (1.0 - 2.0 * (y + out[:, 1] / extent) / n))))
+    return out
+
+def _simple_geometry(feature, no_elevation=False, spline_samples=8):
+    # Returns the simple features type of the feature, 'Point', 'MultiPoint',
+    # 'LineString', 'MultiLineString', 'Polygon' or 'MultiPolygon', and its
+    # vertex arrays: one array for points, multi points and line strings, a list
+    # of arrays for multi line strings and polygons and a list of lists of arrays
+    # for multi polygons. Features without geometry return (None, None).
+    if feature.type == 'point':
+        coords, offsets = feature._geometry_arrays(no_elevation)
+        if len(coords) == 0:
+            return None, None
+        return ('Point' if len(coords) == 1 else 'MultiPoint'), coords
+    elif feature.type == 'polygon':
+        coords, offsets = feature._geometry_arrays(no_elevation, min_vertices=3, closed=True)
+        if len(coords) == 0:
+            return None, None
+        rings = [coords[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+        clockwise = (_ring_areas_array(coords, offsets) < 0.0).tolist()
+        polygons = [[rings[i] for i in polygon] for polygon in _assemble_polygons(clockwise)]
+        if len(polygons) == 0:
+            return None, None
+        if len(polygons) == 1:
+            return 'Polygon', polygons[0]
+        return 'MultiPolygon', polygons
+    elif feature.type == 'spline':
+        lines = [np.asarray(line, dtype=np.float64) for line in feature.evaluate(samples_per_span=spline_samples, no_elevation=no_elevation)]
+    else:
+        coords, offsets = feature._geometry_arrays(no_elevation, min_vertices=2)
+        lines = [coords[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+    if len(lines) == 0:
+        return None, None
+    if len(lines) == 1:
+        return 'LineString', lines[0]
+    return 'MultiLineString', lines
+
+def _map_geometry(geom_type, parts, func):
+    # Applies func to every vertex array of a geometry from _simple_geometry
+    if geom_type in ('Point', 'MultiPoint', 'LineString'):
+        return func(parts)
+    elif geom_type in ('MultiLineString', 'Polygon'):
+        return [func(part) for part in parts]
+    return [[func(ring) for ring in polygon] for polygon in parts]
+
+def _tile_location(layer, tile):
+    if tile is not None:
+        return tile
+    if layer.zoom is None:
+        raise Exception("Layer %s has no tile location, pass tile=(z, x, y) or lonlat=False" % layer.name)
+    return layer.zoom, layer.x, layer.y
+
+def _de_boor_array(control_points, knots, degree, cp_start, knot_start, spans, t):
+    # Evaluates many B-spline parameters at once. Control points and knots of
+    # several splines are concatenated, cp_start and knot_start locate the
+    # spline each parameter belongs to and spans is the local knot span.
+    idx = (cp_start + spans - degree)[:, None] + np.arange(degree + 1)[None, :]
+    d = control_points[idx]
+    span_knot = knot_start + spans
+    for r in range(1, degree + 1):
+        for j in range(degree, r - 1, -1):
+            left = knots[span_knot + j - degree]
+            denom = knots[span_knot + j + 1 - r] - left
+            zero = denom == 0
+            alpha = np.where(zero, 0.0, (t - left) / np.where(zero, 1.0, denom))[:, None]
+            d[:, j] = (1.0 - alpha) * d[:, j - 1] + alpha * d[:, j]
+    return d[:, degree]
+
+def _segment_distance_array(pts, a, b):
+    ab = b - a
+    length2 = np.einsum('ij,ij->i', ab, ab)
+    safe = np.where(length2 == 0, 1.0, length2)
+    u = np.clip(np.einsum('ij,ij->i', pts - a, ab) / safe, 0.0, 1.0)
+    u = np.where(length2 == 0, 0.0, u)
+    closest = a + u[:, None] * ab
+    return np.sqrt(np.einsum('ij,ij->i', pts - closest, pts - closest))
+
+def _evaluate_splines_array(splines, degree, samples_per_span, tolerance=None, max_depth=16):
+    # splines is a list of (control_points, knots) that share degree and dimension,
+    # returns a list of numpy arrays of evaluated points, one per spline.
+    if not splines:
+        return []
+    cps = []
+    knots = []
+    cp_start = []
+    knot_start = []
+    spline_id = []
+    spans = []
+    t = []
+    cp_offset = 0
+    knot_offset = 0
+    step = np.arange(samples_per_span) / float(samples_per_span)
+    for i, (control_points, spline_knots) in enumerate(splines):
+        num_cp = len(control_points)
+        k = np.asarray(spline_knots, dtype=np.float64)
+        valid = np.arange(degree, num_cp)
+        valid = valid[k[valid + 1] > k[valid]]
+        if len(valid) > 0:
+            s_spans = np.append(np.repeat(valid, samples_per_span), valid[-1])
+            s_t = np.append((k[valid][:, None] + (k[valid + 1] - k[valid])[:, None] * step[None, :]).ravel(), k[num_cp])
+            spans.append(s_spans)
+            t.append(s_t)
+            spline_id.append(np.full(len(s_t), i))
+            cp_start.append(np.full(len(s_t), cp_offset))
+            knot_start.append(np.full(len(s_t), knot_offset))
+        cps.append(np.asarray(control_points, dtype=np.float64))
+        knots.append(k)
+        cp_offset = cp_offset + num_cp
+        knot_offset = knot_offset + len(k)
+    cps = np.concatenate(cps)
+    knots = np.concatenate(knots)
+    if not t:
+        return [np.zeros((0, cps.shape[1])) for i in range(len(splines))]
+    spans = np.concatenate(spans)
+    t = np.concatenate(t)
+    spline_id = np.concatenate(spline_id)
+    cp_start = np.concatenate(cp_start)
+    knot_start = np.concatenate(knot_start)
+    pts = _de_boor_array(cps, knots, degree, cp_start, knot_start, spans, t)
+
+    if tolerance is not None:
+        is_new = np.ones(len(t), dtype=bool)
+        for depth in range(max_depth):
+            check = (spline_id[:-1] == spline_id[1:]) & (is_new[:-1] | is_new[1:])
+            seg = np.nonzero(check)[0]
+            if len(seg) == 0:
+                break
+            mid_t = 0.5 * (t[seg] + t[seg + 1])
+            mid = _de_boor_array(cps, knots, degree, cp_start[seg], knot_start[seg], spans[seg], mid_t)
+            error = _segment_distance_array(mid[:, :2], pts[seg, :2], pts[seg + 1, :2])
+            split = error > tolerance
+            if not np.any(split):
+                break
+            seg = seg[split]
+            t = np.concatenate([t, mid_t[split]])
+            pts = np.concatenate([pts, mid[split]])
+            spans = np.concatenate([spans, spans[seg]])
+            spline_id = np.concatenate([spline_id, spline_id[seg]])
+            cp_start = np.concatenate([cp_start, cp_start[seg]])
+            knot_start = np.concatenate([knot_start, knot_start[seg]])
+            is_new = np.concatenate([np.zeros(len(is_new), dtype=bool), np.ones(len(seg), dtype=bool)])
+            order = np.lexsort((t, spline_id))
+            t = t[order]
+            pts = pts[order]
+            spans = spans[order]
+            spline_id = spline_id[order]
+            cp_start = cp_start[order]
+            knot_start = knot_start[order]
+            is_new = is_new[order]
+
+    bounds = np.searchsorted(spline_id, np.arange(len(splines) + 1))
+    return [pts[bounds[i]:bounds[i + 1]] for i in range(len(splines))]
+
 class Float(float):
 
     def __new__(self, *args, **kwargs):
@@ -115,6 +366,7 @@ class FloatList(list):
     def __init__(self, *args, **kwargs):
         if len(args) < 0:
             raise Exception("FloatList initialization requires first argument to be Scaling object")
+        self._raw = False
         if isinstance(args[0], FloatList):
             self._scaling = args[0]._scaling
         elif isinstance(args[0], Scaling):
@@ -123,37 +375,93 @@ class FloatList(list):
         else:
             raise Exception("Unknown object passed to FloatList, first argument must be a Scaling object")
         if isinstance(args[0], list):
-            new_list = []
-            for v in args[0]:
-                if v is None:
-                    new_list.append(v)
-                elif isinstance(v, float):
-                    new_list.append(self._scaling.encode_value(v))
-                elif isinstance(v, int) or isinstance(v, long):
-                    new_list.append(self._scaling.encode_value(float(v)))
+            new_list = [v for v in args[0] if v is None or isinstance(v, float) or isinstance(v, int) or isinstance(v, long)]
+            if self._scaling.pending:
+                # Values are kept as is until the scaling is inferred for the layer
+                self._raw = True
+                new_list = [None if v is None else float(v) for v in new_list]
+            elif np is not None:
+                new_list = self._encode_list(new_list)
+            else:
+                new_list = [None if v is None else self._scaling.encode_value(float(v)) for v in new_list]
             new_args = [new_list]
             new_args.extend(args[1:])
             args = tuple(new_args)
         super(FloatList, self).__init__(*args, **kwargs)
 
+    def _encode_list(self, values):
+        mask = np.fromiter((v is None for v in values), dtype=bool, count=len(values))
+        if not mask.any():
+            return self._scaling.encode_values(values).tolist()
+        encoded = self._scaling.encode_values([0.0 if v is None else v for v in values])
+        return _masked_list(encoded, mask)
+
+    @classmethod
+    def from_array(cls, scaling, values, mask=None):
+        _require_numpy()
+        values = np.asarray(values, dtype=np.float64)
+        if mask is None:
+            return cls._from_encoded(scaling, scaling.encode_values(values).tolist())
+        mask = np.asarray(mask, dtype=bool)
+        index = np.flatnonzero(~mask)
+        encoded = np.zeros(len(values), dtype=np.int64)
+        encoded[index] = scaling.encode_values(values[index])
+        return cls._from_encoded(scaling, _masked_list(encoded, mask))
+
+    @classmethod
+    def _from_encoded(cls, scaling, encoded):
+        float_list = cls(scaling, [])
+        float_list.extend(encoded)
+        return float_list
+
+    def _encoded_array(self):
+        mask = np.fromiter((v is None for v in self), dtype=bool, count=len(self))
+        if self._raw:
+            encoded = self._scaling.encode_values([0.0 if v is None else v for v in self])
+            encoded[mask] = 0
+            return encoded, mask
+        if not mask.any():
+            return np.asarray(self, dtype=np.int64), mask
+        return np.asarray([0 if v is None else v for v in self], dtype=np.int64), mask
+
+    def to_array(self):
+        _require_numpy()
+        if self._raw:
+            mask = np.fromiter((v is None for v in self), dtype=bool, count=len(self))
+            values = np.asarray([np.nan if v is None else v for v in self], dtype=np.float64)
+            return values, mask
+        encoded, mask = self._encoded_array()
+        values = self._scaling.decode_values(encoded)
+        values[mask] = np.nan
+        return values, mask
+
     def append_value(self, value):
         if value is None:
             self.append(None)
+        elif self._raw:
+            self.append(float(value))
         else:
             self.append(self._scaling.encode_value(value))
 
     def get_value_at(self, index):
-        if self[index] is None:
+        if self[index] is None or self._raw:
             return self[index]
         return self._scaling.decode_value(self[index])
 
     def set_value_at(self, index, value):
         if value is None:
             self[index] = None
+        elif self._raw:
+            self[index] = float(value)
         else:
             self[index] = self._scaling.encode_value(value)
 
     def get_all_values(self):
+        if self._raw:
+            return list(self)
+        if np is not None:
+            values, mask = self.to_array()
+            return _masked_list(values, mask)
         vals = []
         for v in self:
             if v is None:
@@ -168,19 +476,27 @@ class FloatList(list):
 
 class FeatureAttributes(object):
 
+    __slots__ = ('_feature', '_layer', '_attr', '_attr_current', '_is_geometric', '_pending_scaling')
+
     def __init__(self, feature, layer, is_geometric=False):
         self._feature = feature
         self._layer = layer
-        self._attr = {}
+        self._attr = None
         self._attr_current = False
         self._is_geometric = is_geometric
+        self._pending_scaling = False
 
     def _encode_attr(self):
         if self._layer._inline_attributes:
+            self._layer._pending_scaling_used = False
             if self._is_geometric:
                 self._feature.geometric_attributes[:] = self._layer.add_attributes(self._attr, True)
             else:
                 self._feature.attributes[:] = self._layer.add_attributes(self._attr, False)
+            if self._layer._pending_scaling_used and not self._pending_scaling:
+                # Encoded again once the layer scalings are inferred
+                self._pending_scaling = True
+                self._layer._pending_attributes.append(self)
         else:
             self._feature.tags[:] = self._layer.add_attributes(self._attr)
         self._attr_current = True
@@ -254,6 +570,9 @@ class FeatureAttributes(object):
 
 class Feature(object):
 
+    __slots__ = ('_feature', '_layer', '_has_elevation', '_pending_elevation', 'cursor', '_cursor_at_end',
+                 '_attributes', '_geometric_attributes', 'has_geometry')
+
     def __init__(self, feature, layer, has_elevation=None):
         self._feature = feature
         self._layer = layer
@@ -267,46 +586,118 @@ class Feature(object):
                 raise Exception("Layers of version 1 or 2 can not have elevation data in features")
             self._has_elevation = has_elevation
 
-        self._reset_cursor()
-        self._attributes = FeatureAttributes(feature, layer, is_geometric=False)
-        if self._layer._inline_attributes:
-            self._geometric_attributes = FeatureAttributes(feature, layer, is_geometric=True)
-        else:
-            self._geometric_attributes = {}
+        self._pending_elevation = None
+        # The cursor and attribute wrappers are only created once they are used
+        self.cursor = None
+        self._cursor_at_end = False
+        self._attributes = None
+        self._geometric_attributes = None
 
-    def _reset_cursor(self):
-        self.cursor = []
+    def _new_cursor(self):
         if self._has_elevation:
-            self.cursor[:3] = itertools.repeat(0, 3)
-        else:
-            self.cursor[:2] = itertools.repeat(0, 2)
+            return [0, 0, 0]
+        return [0, 0]
+
+    def _reset_cursor(self):
+        self.cursor = self._new_cursor()
         self._cursor_at_end = False
 
-    def _encode_point(self, pt, cmd_list, elevation_list):
+    def _seek_end(self, read):
+        # Decodes the geometry into the feature cursor, so new geometry is
+        # encoded relative to its end. Reading geometry uses a cursor of its
+        # own and does not change the feature, so features of a shared tile
+        # can be read from several threads.
+        self.cursor = self._new_cursor()
+        out = read(self.cursor)
+        self._cursor_at_end = True
+        return out
+
+    def _encode_point(self, pt, cmd_list):
         cmd_list.append(zig_zag_encode(int(pt[0]) - self.cursor[0]))
         cmd_list.append(zig_zag_encode(int(pt[1]) - self.cursor[1]))
         self.cursor[0] = int(pt[0])
         self.cursor[1] = int(pt[1])
-        if self._has_elevation:
-            if self._layer._elevation_scaling is None:
-                elevation_list.append(int(pt[2]) - self.cursor[2])
-                self.cursor[2] = int(pt[2])
+
+    def _encode_elevation(self, points):
+        if not self._has_elevation:
+            return None
+        scaling = self._layer._elevation_scaling
+        if scaling is not None and scaling.pending:
+            # Raw elevation is kept until the scaling is inferred for the layer
+            values = [float(pt[2]) for pt in points]
+            if self._pending_elevation is None:
+                self._pending_elevation = []
+                self._layer._pending_features.append(self)
+            self._pending_elevation.extend(values)
+            return [0] * len(values)
+        if np is not None:
+            if scaling is None:
+                values = np.asarray([int(pt[2]) for pt in points], dtype=np.int64)
+            else:
+                values = scaling.encode_values([pt[2] for pt in points])
+            elevation_list = np.diff(values, prepend=self.cursor[2])
+            if len(elevation_list) != 0 and (elevation_list.min() < -2**31 or elevation_list.max() > 2**31 - 1):
+                raise Exception("Elevation scaling results in value outside of value range of sint32, reduce elevation scaling precision.")
+            if len(values) != 0:
+                self.cursor[2] = int(values[-1])
+            return elevation_list.tolist()
+        elevation_list = []
+        for pt in points:
+            if scaling is None:
+                new_pt = int(pt[2])
             else:
-                new_pt = self._layer._elevation_scaling.encode_value(pt[2])
-                elevation_list.append(new_pt - self.cursor[2])
-                self.cursor[2] = new_pt
-
-
-    def _decode_point(self, integers):
-        self.cursor[0] = self.cursor[0] + zig_zag_decode(integers[0])
-        self.cursor[1] = self.cursor[1] + zig_zag_decode(integers[1])
-        out = [self.cursor[0], self.cursor[1]]
-        if len(integers) > 2:
-            self.cursor[2] = self.cursor[2] + integers[2]
-            if self._layer._elevation_scaling is None:
-                out.append(self.cursor[2])
+                new_pt = scaling.encode_value(pt[2])
+            delta = new_pt - self.cursor[2]
+            if delta < -2**31 or delta > 2**31 - 1:
+                raise Exception("Elevation scaling results in value outside of value range of sint32, reduce elevation scaling precision.")
+            elevation_list.append(delta)
+            self.cursor[2] = new_pt
+        return elevation_list
+
+    def _decode_elevation(self, cursor, no_elevation=False):
+        if not self._has_elevation:
+            return None
+        scaling = self._layer._elevation_scaling
+        if self._pending_elevation is not None and scaling is not None and scaling.pending:
+            if no_elevation:
+                return None
+            return iter(list(self._pending_elevation))
+        if no_elevation:
+            cursor[2] = sum(self._feature.elevation)
+            return None
+        if np is not None:
+            values = np.cumsum(np.asarray(self._feature.elevation, dtype=np.int64))
+            if len(values) != 0:
+                cursor[2] = int(values[-1])
+            if scaling is not None:
+                values = scaling.decode_values(values)
+            return iter(values.tolist())
+        out = []
+        for delta in self._feature.elevation:
+            cursor[2] = cursor[2] + delta
+            if scaling is None:
+                out.append(cursor[2])
             else:
-                out.append(self._layer._elevation_scaling.decode_value(self.cursor[2]))
+                out.append(scaling.decode_value(cursor[2]))
+        return iter(out)
+
+    def _finalize_elevation(self):
+        # The pending values hold all of the elevation of the feature
+        values = self._layer._elevation_scaling.encode_values(self._pending_elevation)
+        elevation_list = np.diff(values, prepend=0)
+        if len(elevation_list) != 0 and (elevation_list.min() < -2**31 or elevation_list.max() > 2**31 - 1):
+            raise Exception("Elevation scaling results in value outside of value range of sint32, reduce elevation scaling precision.")
+        self._feature.elevation[:] = elevation_list.tolist()
+        self._pending_elevation = None
+        self._cursor_at_end = False
+        return elevation_list
+
+    def _decode_point(self, cursor, integers, elevation=None):
+        cursor[0] = cursor[0] + zig_zag_decode(integers[0])
+        cursor[1] = cursor[1] + zig_zag_decode(integers[1])
+        out = [cursor[0], cursor[1]]
+        if elevation is not None:
+            out.append(next(elevation))
         return out
 
     def _points_equal(self, pt1, pt2):
@@ -320,21 +711,28 @@ class Feature(object):
 
     @property
     def attributes(self):
+        if self._attributes is None:
+            self._attributes = FeatureAttributes(self._feature, self._layer, is_geometric=False)
         return self._attributes
 
     @attributes.setter
     def attributes(self, attrs):
-        self._attributes.set(attrs)
+        self.attributes.set(attrs)
 
     @property
     def geometric_attributes(self):
+        if self._geometric_attributes is None:
+            if self._layer._inline_attributes:
+                self._geometric_attributes = FeatureAttributes(self._feature, self._layer, is_geometric=True)
+            else:
+                return {}
         return self._geometric_attributes
 
     @geometric_attributes.setter
     def geometric_attributes(self, attrs):
         if not self._layer._inline_attributes:
             raise Exception("Can not set geometric attributes for none inline attributes configured layer.")
-        self._geometric_attributes.set(attrs)
+        self.geometric_attributes.set(attrs)
 
     @property
     def id(self):
@@ -357,27 +755,40 @@ class Feature(object):
         else:
             raise Exception("Can not set string id for features using version 2 or below of the VT specification")
 
+    def _geometry_arrays(self, no_elevation=False, min_vertices=1, closed=False):
+        _require_numpy()
+        elevation = None
+        if self._has_elevation and not no_elevation:
+            elevation = list(self._decode_elevation(self._new_cursor()))
+        return _decode_geometry_array(self._feature.geometry, elevation, min_vertices, closed)
+
     def clear_geometry(self):
+        self._layer._hit_index = None
         self.has_geometry = False
         self._reset_cursor()
         self._feature.ClearField('geometry')
         self._feature.ClearField('elevation')
+        if self._pending_elevation is not None:
+            self._pending_elevation = []
 
 class PointFeature(Feature):
 
+    __slots__ = ('_num_points',)
+    type = 'point'
+
     def __init__(self, feature, layer, has_elevation=None):
         super(PointFeature, self).__init__(feature, layer, has_elevation)
         if feature.type is not vector_tile_pb2.Tile.POINT:
             feature.type = vector_tile_pb2.Tile.POINT
-        self.type = 'point'
         self._num_points = 0
 
     def add_points(self, points):
+        self._layer._hit_index = None
         if not isinstance(points, list):
             raise Exception("Invalid point geometry")
         if not self._cursor_at_end:
             # Use geometry retrieval process to move cursor to proper position
-            pts = self.get_points()
+            pts = self._seek_end(self._read_points)
             self._num_points = len(pts)
         if len(points) < 1:
             return
@@ -388,18 +799,16 @@ class PointFeature(Feature):
             num_commands = 1
 
         cmd_list = []
-        if self._has_elevation:
-            elevation_list = []
-        else:
-            elevation_list = None
         if self._num_points == 0:
             cmd_list.append(command_move_to(num_commands))
         try:
             if multi_point:
                 for i in range(num_commands):
-                    self._encode_point(points[i], cmd_list, elevation_list)
+                    self._encode_point(points[i], cmd_list)
+                elevation_list = self._encode_elevation(points)
             else:
-                self._encode_point(points, cmd_list, elevation_list)
+                self._encode_point(points, cmd_list)
+                elevation_list = self._encode_elevation([points])
         except Exception as e:
             self._reset_cursor()
             raise e
@@ -408,29 +817,23 @@ class PointFeature(Feature):
             self._feature.geometry[0] = command_move_to(self._num_points)
         self._feature.geometry.extend(cmd_list)
         if elevation_list:
-            try:
-                self._feature.elevation.extend(elevation_list)
-            except ValueError:
-                raise Exception("Elevation scaling results in value outside of value range of sint32, reduce elevation scaling precision.")
+            self._feature.elevation.extend(elevation_list)
 
     def get_points(self, no_elevation=False):
+        return self._read_points(self._new_cursor(), no_elevation)
+
+    def _read_points(self, cursor, no_elevation=False):
         points = []
-        self._reset_cursor()
         geom = iter(self._feature.geometry)
-        if self.has_elevation and not no_elevation:
-            elevation = iter(self._feature.elevation)
+        elevation = self._decode_elevation(cursor, no_elevation)
         try:
             current_command = next(geom)
             while next_command_move_to(current_command):
                 for i in range(get_command_count(current_command)):
-                    if self.has_elevation and not no_elevation:
-                        points.append(self._decode_point([next(geom), next(geom), next(elevation)]))
-                    else:
-                        points.append(self._decode_point([next(geom), next(geom)]))
+                    points.append(self._decode_point(cursor, [next(geom), next(geom)], elevation))
                 current_command = next(geom)
         except StopIteration:
             pass
-        self._cursor_at_end = True
         return points
 
     def get_geometry(self, no_elevation = False):
@@ -438,66 +841,58 @@ class PointFeature(Feature):
 
 class LineStringFeature(Feature):
 
+    __slots__ = ()
+    type = 'line_string'
+
     def __init__(self, feature, layer, has_elevation=None):
         super(LineStringFeature, self).__init__(feature, layer, has_elevation)
         if feature.type is not vector_tile_pb2.Tile.LINESTRING:
             feature.type = vector_tile_pb2.Tile.LINESTRING
-        self.type = 'line_string'
 
     def add_line_string(self, linestring):
+        self._layer._hit_index = None
         num_commands = len(linestring)
         if num_commands < 2:
             raise Exception("Error adding linestring, less then 2 points provided")
         if not self._cursor_at_end:
             # Use geometry retrieval process to move cursor to proper position
-            self.get_line_strings()
-        if self._has_elevation:
-            elevation_list = []
-        else:
-            elevation_list = None
+            self._seek_end(self._read_line_strings)
         try:
             cmd_list = []
             cmd_list.append(command_move_to(1))
-            self._encode_point(linestring[0], cmd_list, elevation_list)
+            self._encode_point(linestring[0], cmd_list)
             cmd_list.append(command_line_to(num_commands - 1))
             for i in range(1, num_commands):
-                self._encode_point(linestring[i], cmd_list, elevation_list)
+                self._encode_point(linestring[i], cmd_list)
+            elevation_list = self._encode_elevation(linestring)
         except Exception as e:
             self._reset_cursor()
             raise e
         self._feature.geometry.extend(cmd_list)
         if elevation_list:
-            try:
-                self._feature.elevation.extend(elevation_list)
-            except ValueError:
-                raise Exception("Elevation scaling results in value outside of value range of sint32, reduce elevation scaling precision.")
+            self._feature.elevation.extend(elevation_list)
 
     def get_line_strings(self, no_elevation=False):
+        return self._read_line_strings(self._new_cursor(), no_elevation)
+
+    def _read_line_strings(self, cursor, no_elevation=False):
         line_strings = []
         line_string = []
-        self._reset_cursor()
         geom = iter(self._feature.geometry)
-        if self.has_elevation and not no_elevation:
-            elevation = iter(self._feature.elevation)
+        elevation = self._decode_elevation(cursor, no_elevation)
         try:
             current_command = next(geom)
             while next_command_move_to(current_command):
                 line_string = []
                 if get_command_count(current_command) != 1:
                     raise Exception("Command move_to has command count not equal to 1 in a line string")
-                if self.has_elevation and not no_elevation:
-                    line_string.append(self._decode_point([next(geom), next(geom), next(elevation)]))
-                else:
-                    line_string.append(self._decode_point([next(geom), next(geom)]))
+                line_string.append(self._decode_point(cursor, [next(geom), next(geom)], elevation))
                 current_command = next(geom)
                 if not next_command_line_to(current_command):
                     raise Exception("Command move_to not followed by a line_to command in a line string")
                 while next_command_line_to(current_command):
                     for i in range(get_command_count(current_command)):
-                        if self.has_elevation and not no_elevation:
-                            line_string.append(self._decode_point([next(geom), next(geom), next(elevation)]))
-                        else:
-                            line_string.append(self._decode_point([next(geom), next(geom)]))
+                        line_string.append(self._decode_point(cursor, [next(geom), next(geom)], elevation))
                     current_command = next(geom)
                 if len(line_string) > 1:
                     line_strings.append(line_string)
@@ -505,7 +900,6 @@ class LineStringFeature(Feature):
             if len(line_string) > 1:
                 line_strings.append(line_string)
             pass
-        self._cursor_at_end = True
         return line_strings
 
     def get_geometry(self, no_elevation=False):
@@ -513,16 +907,19 @@ class LineStringFeature(Feature):
 
 class PolygonFeature(Feature):
 
+    __slots__ = ()
+    type = 'polygon'
+
     def __init__(self, feature, layer, has_elevation=None):
         super(PolygonFeature, self).__init__(feature, layer, has_elevation)
         if feature.type is not vector_tile_pb2.Tile.POLYGON:
             feature.type = vector_tile_pb2.Tile.POLYGON
-        self.type = 'polygon'
 
     def add_ring(self, ring):
+        self._layer._hit_index = None
         if not self._cursor_at_end:
             # Use geometry retrieval process to move cursor to proper position
-            self.get_rings()
+            self._seek_end(self._read_rings)
         num_commands = len(ring)
         if num_commands < 3:
             raise Exception("Error adding ring to polygon, too few points")
@@ -531,95 +928,99 @@ class PolygonFeature(Feature):
         if num_commands < 3:
             raise Exception("Error adding ring to polygon, too few points with last point closing")
         cmd_list = []
-        if self._has_elevation:
-            elevation_list = []
-        else:
-            elevation_list = None
         try:
             cmd_list.append(command_move_to(1))
-            self._encode_point(ring[0], cmd_list, elevation_list)
+            self._encode_point(ring[0], cmd_list)
             cmd_list.append(command_line_to(num_commands - 1))
             for i in range(1, num_commands):
-                self._encode_point(ring[i], cmd_list, elevation_list)
+                self._encode_point(ring[i], cmd_list)
             cmd_list.append(command_close_path())
+            elevation_list = self._encode_elevation(ring[:num_commands])
         except Exception as e:
             self._reset_cursor()
             raise e
         self._feature.geometry.extend(cmd_list)
         if elevation_list:
-            try:
-                self._feature.elevation.extend(elevation_list)
-            except ValueError:
-                raise Exception("Elevation scaling results in value outside of value range of sint32, reduce elevation scaling precision.")
+            self._feature.elevation.extend(elevation_list)
+
+    def get_rings(self, no_elevation=False, with_areas=False):
+        return self._read_rings(self._new_cursor(), no_elevation, with_areas)
 
-    def get_rings(self, no_elevation=False):
+    def _read_rings(self, cursor, no_elevation=False, with_areas=False):
+        # The signed area of each ring is summed from the integer deltas while
+        # decoding, x * dy - y * dx for every edge. Areas are positive for
+        # exterior rings and negative for interior rings, which are clockwise
+        # when y points down as it does in tile coordinates.
         rings = []
+        areas = []
         ring = []
-        self._reset_cursor()
-        geom = iter(self._feature.geometry)
-        if self.has_elevation and not no_elevation:
-            elevation = iter(self._feature.elevation)
+        x = 0
+        y = 0
+        geom = iter(self._feature.geometry[:])
+        elevation = self._decode_elevation(cursor, no_elevation)
         try:
             current_command = next(geom)
             while next_command_move_to(current_command):
                 ring = []
                 if get_command_count(current_command) != 1:
                     raise Exception("Command move_to has command count not equal to 1 in a line string")
-                if self.has_elevation and not no_elevation:
-                    ring.append(self._decode_point([next(geom), next(geom), next(elevation)]))
-                else:
-                    ring.append(self._decode_point([next(geom), next(geom)]))
+                x = x + zig_zag_decode(next(geom))
+                y = y + zig_zag_decode(next(geom))
+                first_x = x
+                first_y = y
+                area = 0
+                ring.append([x, y] if elevation is None else [x, y, next(elevation)])
                 current_command = next(geom)
                 while next_command_line_to(current_command):
                     for i in range(get_command_count(current_command)):
-                        if self.has_elevation and not no_elevation:
-                            ring.append(self._decode_point([next(geom), next(geom), next(elevation)]))
-                        else:
-                            ring.append(self._decode_point([next(geom), next(geom)]))
+                        dx = next(geom)
+                        dy = next(geom)
+                        # Inlined zig_zag_decode, this is the hot loop
+                        dx = (dx >> 1) ^ (-(dx & 1))
+                        dy = (dy >> 1) ^ (-(dy & 1))
+                        area = area + x * dy - y * dx
+                        x = x + dx
+                        y = y + dy
+                        ring.append([x, y] if elevation is None else [x, y, next(elevation)])
                     current_command = next(geom)
                 if not next_command_close_path(current_command):
                     raise Exception("Polygon not closed with close_path command")
                 ring.append(ring[0])
                 if len(ring) > 3:
                     rings.append(ring)
+                    areas.append((area + x * first_y - y * first_x) / 2.0)
                 current_command = next(geom)
         except StopIteration:
             pass
-        self._cursor_at_end = True
+        finally:
+            cursor[0] = x
+            cursor[1] = y
+        if with_areas:
+            return rings, areas
         return rings
 
-    def _is_ring_clockwise(self, ring):
-        area = 0.0
-        for i in range(len(ring) - 1):
-            area += (float(ring[i][0]) * float(ring[i+1][1])) - (float(ring[i][1]) * float(ring[i+1][0]))
-        return area < 0.0
-
-    def get_polygons(self, no_elevation=False):
-        rings = self.get_rings(no_elevation)
-        polygons = []
-        polygon = []
-        for ring in rings:
-            if not self._is_ring_clockwise(ring):
-                if len(polygon) != 0:
-                    polygons.append(polygon)
-                polygon = []
-                polygon.append(ring)
-            elif len(polygon) != 0:
-                polygon.append(ring)
-        if len(polygon) != 0:
-            polygons.append(polygon)
-        return polygons
+    def get_polygons(self, no_elevation=False, with_areas=False):
+        # With areas, also returns the signed area of every ring of every
+        # polygon, the first ring of a polygon is its exterior ring with a
+        # positive or zero area and the rest are interior rings.
+        rings, ring_areas = self.get_rings(no_elevation, with_areas=True)
+        polygons = _assemble_polygons([area < 0.0 for area in ring_areas])
+        if with_areas:
+            return [[rings[i] for i in polygon] for polygon in polygons], [[ring_areas[i] for i in polygon] for polygon in polygons]
+        return [[rings[i] for i in polygon] for polygon in polygons]
 
     def get_geometry(self, no_elevation=False):
         return self.get_polygons(no_elevation)
 
 class SplineFeature(Feature):
 
+    __slots__ = ('_degree', '_pending_knots')
+    type = 'spline'
+
     def __init__(self, feature, layer, has_elevation=None, degree=None):
         super(SplineFeature, self).__init__(feature, layer, has_elevation)
         if feature.type is not vector_tile_pb2.Tile.SPLINE:
             feature.type = vector_tile_pb2.Tile.SPLINE
-        self.type = 'spline'
         if self._feature.HasField('spline_degree'):
             self._degree = self._feature.spline_degree
         elif degree is None or degree == DEFAULT_SPLINE_DEGREE:
@@ -627,8 +1028,10 @@ class SplineFeature(Feature):
         else:
             self._degree = degree
             self._feature.spline_degree = degree
+        self._pending_knots = None
 
     def add_spline(self, control_points, knots):
+        self._layer._hit_index = None
         num_commands = len(control_points)
         if num_commands < 2:
             raise Exception("Error adding control points, less then 2 points provided")
@@ -637,58 +1040,63 @@ class SplineFeature(Feature):
         num_knots = len(knots)
         if num_knots != (num_commands + self._degree + 1):
             raise Exception("The length of knots must be equal to the length of control points + degree + 1")
+        if not self._cursor_at_end:
+            # Use geometry retrieval process to move cursor to proper position
+            self._seek_end(self._read_splines)
         cmd_list = []
-        if self._has_elevation:
-            elevation_list = []
-        else:
-            elevation_list = None
         try:
             cmd_list.append(command_move_to(1))
-            self._encode_point(control_points[0], cmd_list, elevation_list)
+            self._encode_point(control_points[0], cmd_list)
             cmd_list.append(command_line_to(num_commands - 1))
             for i in range(1, num_commands):
-                self._encode_point(control_points[i], cmd_list, elevation_list)
+                self._encode_point(control_points[i], cmd_list)
+            elevation_list = self._encode_elevation(control_points)
         except Exception as e:
             self._reset_cursor()
             raise e
         self._feature.geometry.extend(cmd_list)
         if elevation_list:
-            try:
-                self._feature.elevation.extend(elevation_list)
-            except ValueError:
-                raise Exception("Elevation scaling results in value outside of value range of sint32, reduce elevation scaling precision.")
+            self._feature.elevation.extend(elevation_list)
+        if knots._scaling.pending:
+            if self._pending_knots is None:
+                self._pending_knots = []
+                self._layer._pending_splines.append(self)
+            self._pending_knots.append((len(self._feature.spline_knots), knots))
         values, length = self._layer._add_inline_float_list(knots)
         values.insert(0, complex_value_integer(CV_TYPE_LIST_DOUBLE, length))
         self._feature.spline_knots.extend(values)
 
+    def _finalize_knots(self):
+        for start, knots in self._pending_knots:
+            values, length = self._layer._add_inline_float_list(knots)
+            values.insert(0, complex_value_integer(CV_TYPE_LIST_DOUBLE, length))
+            self._feature.spline_knots[start:start + len(values)] = values
+        self._pending_knots = None
+
     @property
     def degree(self):
         return self._degree
 
     def get_splines(self, no_elevation=False):
+        return self._read_splines(self._new_cursor(), no_elevation)
+
+    def _read_splines(self, cursor, no_elevation=False):
         splines = []
-        self._reset_cursor()
+        control_points = []
         geom = iter(self._feature.geometry)
         knots_itr = iter(self._feature.spline_knots)
-        if self._has_elevation and not no_elevation:
-            elevation = iter(self._feature.elevation)
+        elevation = self._decode_elevation(cursor, no_elevation)
         try:
             current_command = next(geom)
             while next_command_move_to(current_command):
                 control_points = []
                 if get_command_count(current_command) != 1:
                     raise Exception("Command move_to has command count not equal to 1 in a line string")
-                if self._has_elevation and not no_elevation:
-                    control_points.append(self._decode_point([next(geom), next(geom), next(elevation)]))
-                else:
-                    control_points.append(self._decode_point([next(geom), next(geom)]))
+                control_points.append(self._decode_point(cursor, [next(geom), next(geom)], elevation))
                 current_command = next(geom)
                 while next_command_line_to(current_command):
                     for i in range(get_command_count(current_command)):
-                        if self._has_elevation and not no_elevation:
-                            control_points.append(self._decode_point([next(geom), next(geom), next(elevation)]))
-                        else:
-                            control_points.append(self._decode_point([next(geom), next(geom)]))
+                        control_points.append(self._decode_point(cursor, [next(geom), next(geom)], elevation))
                     current_command = next(geom)
                 if len(control_points) > 1:
                     splines.append([control_points])
@@ -697,30 +1105,54 @@ class SplineFeature(Feature):
                 splines.append([control_points])
             pass
 
+        # Knots of a scaling that is not inferred yet are only placeholders in
+        # the feature, the values as added are used instead
+        pending = dict(self._pending_knots) if self._pending_knots is not None else {}
+        position = 0
         try:
             for i in range(len(splines)):
                 complex_value = next(knots_itr)
                 val_id = get_inline_value_id(complex_value)
                 param = get_inline_value_parameter(complex_value)
-                if val_id == CV_TYPE_LIST_DOUBLE:
+                if position in pending:
+                    knots = list(pending[position])
+                    for value in itertools.islice(knots_itr, param + 1):
+                        pass
+                elif val_id == CV_TYPE_LIST_DOUBLE:
                     knots = self._layer._get_inline_float_list(knots_itr, param)
+                position = position + param + 2
                 num_cp = len(splines[i][0])
                 num_knots = len(knots)
                 if num_knots == (num_cp + self._degree + 1):
                     splines[i].append(knots)
         except StopIteration:
             pass
-        self._cursor_at_end = True
         return splines
 
     def get_geometry(self, no_elevation=False):
         return self.get_splines(no_elevation)
 
+    def _evaluable_splines(self, no_elevation=False):
+        return [(s[0], s[1]) for s in self.get_splines(no_elevation) if len(s) > 1]
+
+    def evaluate(self, samples_per_span=8, tolerance=None, no_elevation=False):
+        _require_numpy()
+        splines = self._evaluable_splines(no_elevation)
+        evaluated = _evaluate_splines_array(splines, self._degree, samples_per_span, tolerance)
+        return [pts.tolist() for pts in evaluated if len(pts) > 1]
+
 class Scaling(object):
 
-    def __init__(self, scaling_object, index = None, offset = None, multiplier = None, base = None):
+    __slots__ = ('_scaling_object', '_index', '_precision', '_min_value', '_max_value', '_count',
+                 '_offset', '_multiplier', '_base')
+
+    def __init__(self, scaling_object, index = None, offset = None, multiplier = None, base = None, precision = None):
         self._scaling_object = scaling_object
         self._index = index
+        self._precision = precision
+        self._min_value = None
+        self._max_value = None
+        self._count = 0
         if offset is not None or multiplier is not None or base is not None:
             self._init_from_values(offset, multiplier, base)
         else:
@@ -741,22 +1173,67 @@ class Scaling(object):
             self._base = 0.0
 
     def _init_from_values(self, offset, multiplier, base):
+        # Fields left from values set before are cleared, the scaling object
+        # can be shared with an earlier scaling of the layer
         if offset is not None and offset != 0:
             self._scaling_object.offset = int(offset)
             self._offset = int(offset)
         else:
+            self._scaling_object.ClearField('offset')
             self._offset = 0
         if multiplier is not None and multiplier != 1.0:
             self._scaling_object.multiplier = float(multiplier)
             self._multiplier = float(multiplier)
         else:
+            self._scaling_object.ClearField('multiplier')
             self._multiplier = 1.0
         if base is not None and base != 0.0:
             self._scaling_object.base = float(base)
             self._base = float(base)
         else:
+            self._scaling_object.ClearField('base')
             self._base = 0.0
 
+    def _collect(self, values):
+        values = [v for v in values if v is not None]
+        if not values:
+            return
+        self._count = self._count + len(values)
+        if self._min_value is None:
+            self._min_value = min(values)
+            self._max_value = max(values)
+        else:
+            self._min_value = min(self._min_value, min(values))
+            self._max_value = max(self._max_value, max(values))
+
+    def _infer(self):
+        min_value = self._min_value
+        max_value = self._max_value
+        if min_value is None:
+            min_value = 0.0
+            max_value = 0.0
+        if max_value - min_value < self._precision:
+            base = min_value
+            multiplier = self._precision
+        else:
+            out = scaling_calculation(self._precision, float(min_value), float(max_value))
+            base = out['base']
+            multiplier = out['sR']
+        self._init_from_values(0, multiplier, base)
+        self._precision = None
+        return {
+            'count': self._count,
+            'min_value': min_value,
+            'max_value': max_value,
+            'base': self._base,
+            'multiplier': self._multiplier,
+            'bits': int(math.ceil(math.log((max_value - min_value) / self._multiplier + 1.0, 2)))
+        }
+
+    @property
+    def pending(self):
+        return self._precision is not None
+
     @property
     def type(self):
         return self._type
@@ -783,11 +1260,52 @@ class Scaling(object):
     def decode_value(self, value):
         return self._multiplier * (value + self._offset) + self._base
 
+    def encode_values(self, values):
+        _require_numpy()
+        values = np.round((np.asarray(values, dtype=np.float64) - self._base) / self._multiplier) - self._offset
+        if len(values) != 0 and np.max(np.abs(values)) >= 2**63:
+            raise Exception("Scaling results in value outside of value range of int64")
+        return values.astype(np.int64)
+
+    def decode_values(self, values):
+        _require_numpy()
+        values = np.asarray(values, dtype=np.int64)
+        return self._multiplier * (values + self._offset) + self._base
+
+    @property
+    def max_quantization_error(self):
+        return abs(self._multiplier) / 2.0
+
+def _collect_float_lists(value):
+    # Adds the values of pending float lists, also nested in lists and maps,
+    # to the range of their scaling
+    if isinstance(value, FloatList):
+        if value._scaling.pending:
+            value._scaling._collect(value)
+    elif isinstance(value, dict):
+        for v in value.values():
+            _collect_float_lists(v)
+    elif isinstance(value, list):
+        for v in value:
+            _collect_float_lists(v)
+
 class Layer(object):
 
+    __slots__ = ('_layer', '_features', '_keys', '_values', '_inline_attributes', '_string_values', '_float_values',
+                 '_double_values', '_int_values', '_elevation_scaling', '_attribute_scalings', '_pending_attributes',
+                 '_pending_features', '_pending_splines', '_pending_scaling_used', '_pending_scaling_bytes',
+                 '_scaling_report', '_hit_index')
+
     def __init__(self, layer, name = None, version = None, x = None, y = None, zoom = None, legacy_attributes=False):
         self._layer = layer
         self._features = []
+        self._pending_attributes = []
+        self._pending_features = []
+        self._pending_splines = []
+        self._pending_scaling_used = False
+        self._pending_scaling_bytes = None
+        self._scaling_report = {}
+        self._hit_index = None
         if name:
             self._layer.name = name
         if version:
@@ -893,6 +1411,86 @@ class Layer(object):
         self._attribute_scalings.append(Scaling(self._layer.attribute_scalings.add(), index=index, offset=offset, multiplier=multiplier, base=base))
         return self._attribute_scalings[index]
 
+    def add_inferred_elevation_scaling(self, precision):
+        if self.version < 3:
+            raise Exception("Can not add elevation scaling to Version 2 or below Vector Tiles.")
+        _require_numpy()
+        if precision is None or precision <= 0:
+            raise Exception("Precision of an inferred scaling must be greater than 0")
+        # Elevation encoded before is decoded with the scaling it was encoded
+        # with, so it is encoded again once the new scaling is inferred
+        previous = self._elevation_scaling
+        for feature in self._features:
+            if feature._pending_elevation is None and len(feature._feature.elevation) != 0:
+                encoded = np.cumsum(np.asarray(feature._feature.elevation, dtype=np.int64))
+                if previous is None:
+                    feature._pending_elevation = encoded.tolist()
+                else:
+                    feature._pending_elevation = previous.decode_values(encoded).tolist()
+                self._pending_features.append(feature)
+        self._elevation_scaling = Scaling(self._layer.elevation_scaling, precision=precision)
+        return self._elevation_scaling
+
+    def add_inferred_attribute_scaling(self, precision):
+        if self.version < 3:
+            raise Exception("Can not add attribute scaling to Version 2 or below Vector Tiles.")
+        if not self._inline_attributes:
+            raise Exception("Can not add attribute scaling to Version 3 or greater layers that do not support inline attributes")
+        _require_numpy()
+        if precision is None or precision <= 0:
+            raise Exception("Precision of an inferred scaling must be greater than 0")
+        index = len(self._attribute_scalings)
+        self._attribute_scalings.append(Scaling(self._layer.attribute_scalings.add(), index=index, precision=precision))
+        return self._attribute_scalings[index]
+
+    def finalize_scalings(self):
+        pending = [s for s in self._attribute_scalings if s.pending]
+        elevation_pending = self._elevation_scaling is not None and self._elevation_scaling.pending
+        if not pending and not elevation_pending:
+            return self._scaling_report
+        report = {}
+        # Values are collected from what the features hold now, so values that
+        # were encoded and then replaced are not counted
+        for attrs in self._pending_attributes:
+            _collect_float_lists(attrs._attr)
+        for feature in self._pending_splines:
+            for start, knots in feature._pending_knots:
+                _collect_float_lists(knots)
+        for scaling in pending:
+            report[scaling.index] = scaling._infer()
+        self._pending_scaling_bytes = dict((scaling.index, 0) for scaling in pending)
+        try:
+            for attrs in self._pending_attributes:
+                attrs._encode_attr()
+                attrs._pending_scaling = False
+            for feature in self._pending_splines:
+                feature._finalize_knots()
+            for index in self._pending_scaling_bytes:
+                report[index]['bytes'] = self._pending_scaling_bytes[index]
+        finally:
+            self._pending_scaling_bytes = None
+        self._pending_attributes = []
+        self._pending_splines = []
+        if elevation_pending:
+            for feature in self._pending_features:
+                if feature._pending_elevation is not None:
+                    self._elevation_scaling._collect(feature._pending_elevation)
+            report['elevation'] = self._elevation_scaling._infer()
+            size = 0
+            for feature in self._pending_features:
+                if feature._pending_elevation is None:
+                    continue
+                elevation_list = feature._finalize_elevation()
+                size = size + int(_varint_sizes(_zig_zag_encode_array(elevation_list)).sum())
+            report['elevation']['bytes'] = size
+            self._pending_features = []
+        self._scaling_report.update(report)
+        return self._scaling_report
+
+    @property
+    def scaling_report(self):
+        return self._scaling_report
+
     def add_point_feature(self, has_elevation=False):
         self._features.append(PointFeature(self._layer.features.add(), self, has_elevation=has_elevation))
         return self._features[-1]
@@ -911,6 +1509,46 @@ class Layer(object):
         self._features.append(SplineFeature(self._layer.features.add(), self, has_elevation=has_elevation, degree=degree))
         return self._features[-1]
 
+    def evaluate_splines(self, samples_per_span=8, tolerance=None, no_elevation=False):
+        _require_numpy()
+        out = [None] * len(self._features)
+        groups = {}
+        for i in range(len(self._features)):
+            feature = self._features[i]
+            if not isinstance(feature, SplineFeature):
+                continue
+            out[i] = []
+            for control_points, knots in feature._evaluable_splines(no_elevation):
+                group = groups.setdefault((feature.degree, len(control_points[0])), ([], []))
+                group[0].append(i)
+                group[1].append((control_points, knots))
+        for (degree, dim), (indexes, splines) in groups.items():
+            evaluated = _evaluate_splines_array(splines, degree, samples_per_span, tolerance)
+            for i, pts in zip(indexes, evaluated):
+                if len(pts) > 1:
+                    out[i].append(pts.tolist())
+        return out
+
+    def to_geojson(self, stream, **kwargs):
+        from . import geojson
+        geojson.write_layer(self, stream, **kwargs)
+
+    def to_wkb(self, packed=False, **kwargs):
+        from . import wkb
+        return wkb.layer_wkb(self, packed=packed, **kwargs)
+
+    def to_wkt(self, **kwargs):
+        from . import wkb
+        return wkb.layer_wkt(self, **kwargs)
+
+    def to_columns(self, arrow=None, **kwargs):
+        from . import columns
+        return columns.layer_columns(self, arrow=arrow, **kwargs)
+
+    def hit_test(self, x, y, tolerance=0, spline_samples=8):
+        from . import hittest
+        return hittest.hit_test(self, x, y, tolerance, spline_samples)
+
     @property
     def features(self):
         return self._features
@@ -1063,6 +1701,14 @@ class Layer(object):
         attr_list = []
         if limit == 0:
             return attr_list
+        if np is not None:
+            encoded = np.asarray(list(itertools.islice(value_itr, limit)), dtype=np.uint64)
+            mask = encoded == 0
+            deltas = encoded[~mask] - np.uint64(1)
+            deltas = (deltas >> np.uint64(1)).astype(np.int64) ^ -(deltas & np.uint64(1)).astype(np.int64)
+            values = np.zeros(len(encoded), dtype=np.float64)
+            values[~mask] = scaling.decode_values(np.cumsum(deltas))
+            return _masked_list(values, mask)
         count = 0
         cursor = 0
         for val in value_itr:
@@ -1204,6 +1850,20 @@ class Layer(object):
     def _add_inline_float_list(self, attrs):
         delta_values = [attrs.index]
         length = len(attrs)
+        if attrs._scaling.pending:
+            # Placeholder values, replaced once the scaling is inferred
+            self._pending_scaling_used = True
+            delta_values.extend(0 if v is None else 1 for v in attrs)
+            return delta_values, length
+        if np is not None:
+            encoded, mask = attrs._encoded_array()
+            deltas = np.diff(encoded[~mask], prepend=0)
+            out = np.zeros(length, dtype=np.uint64)
+            out[~mask] = _zig_zag_encode_array(deltas) + np.uint64(1)
+            if self._pending_scaling_bytes is not None and attrs.index in self._pending_scaling_bytes:
+                self._pending_scaling_bytes[attrs.index] += int(_varint_sizes(out).sum())
+            delta_values.extend(out.tolist())
+            return delta_values, length
         cursor = 0
         for v in attrs:
             if v is None:
@@ -1273,12 +1933,16 @@ class Layer(object):
 
 class VectorTile(object):
 
-    def __init__(self, tile = None):
+    def __init__(self, tile = None, lazy = False):
         self._layers = []
+        self._data = None
         if tile:
-            if (isinstance(tile,str)) or (isinstance(tile,other_str)):
+            if isinstance(tile, (str, other_str, bytearray, memoryview)):
                 self._tile = vector_tile_pb2.Tile()
-                self._tile.ParseFromString(tile)
+                if lazy:
+                    self._split(tile)
+                    return
+                self._parse(tile)
             else:
                 self._tile = tile
             self._build_layers()
@@ -1288,17 +1952,244 @@ class VectorTile(object):
     def __str__(self):
         return self._tile.__str__()
 
+    def _parse(self, data):
+        self._tile.ParseFromString(data)
+
+    def _parse_layer(self, layer, data):
+        layer.ParseFromString(data)
+
+    def _split(self, data):
+        # Lazy tiles only find the layers in the serialized tile, each layer is
+        # parsed and built the first time it is used.
+        self._data = wire.as_buffer(data)
+        self._spans = []
+        self._names = []
+        self._lock = threading.Lock()
+        for field, wire_type, value, field_start, value_start, value_end in wire.iter_fields(self._data):
+            if field == wire.TILE_LAYERS and wire_type == wire.WIRE_LENGTH:
+                self._tile.layers.add()
+                self._layers.append(None)
+                self._spans.append((value_start, value_end))
+                self._names.append(wire.layer_name(self._data, value_start, value_end))
+            else:
+                self._tile.MergeFromString(bytes(self._data[field_start:value_end]))
+
+    def _load_layer(self, index):
+        with self._lock:
+            layer = self._layers[index]
+            if layer is None:
+                start, end = self._spans[index]
+                self._parse_layer(self._tile.layers[index], bytes(self._data[start:end]))
+                layer = self._layers[index] = Layer(self._tile.layers[index])
+            return layer
+
+    def _load_layers(self):
+        for i in range(len(self._spans)):
+            self._load_layer(i)
+        self._data = None
+
     def _build_layers(self):
         for layer in self._tile.layers:
             self._layers.append(Layer(layer))
 
     def serialize(self):
+        for layer in self.layers:
+            layer.finalize_scalings()
         return self._tile.SerializeToString()
 
+    def size_report(self, top=10):
+        return wire.size_report(self.serialize(), top=top)
+
     def add_layer(self, name, version = None, x = None, y = None, zoom = None, legacy_attributes=False):
         self._layers.append(Layer(self._tile.layers.add(), name, version=version, x=x, y=y, zoom=zoom, legacy_attributes=legacy_attributes))
         return self._layers[-1]
 
+    def to_geojson(self, stream, **kwargs):
+        from . import geojson
+        geojson.write_tile(self, stream, **kwargs)
+
+    def get_layer(self, name):
+        # Returns the first layer with the name or None, of a lazy tile only that layer is built
+        layers = self._layers
+        if self._data is not None:
+            for i in range(len(self._spans)):
+                if self._names[i] == name:
+                    return self._load_layer(i)
+            layers = self._layers[len(self._spans):]
+        for layer in layers:
+            if layer.name == name:
+                return layer
+        return None
+
     @property
     def layers(self):
+        if self._data is not None:
+            self._load_layers()
         return self._layers
+
+def _de_boor(control_points, knots, degree, span, t):
+    d = [list(control_points[j + span - degree]) for j in range(degree + 1)]
+    for r in range(1, degree + 1):
+        for j in range(degree, r - 1, -1):
+            denom = knots[j + 1 + span - r] - knots[j + span - degree]
+            if denom == 0:
+                alpha = 0.0
+            else:
+                alpha = (t - knots[j + span - degree]) / denom
+            d[j] = [(1.0 - alpha) * a + alpha * b for a, b in zip(d[j - 1], d[j])]
+    return d[degree]
+
+def _evaluate_spline(control_points, knots, degree, samples_per_span):
+    num_cp = len(control_points)
+    points = []
+    last_span = None
+    for span in range(degree, num_cp):
+        t0 = knots[span]
+        t1 = knots[span + 1]
+        if t1 <= t0:
+            continue
+        for s in range(samples_per_span):
+            t = t0 + (t1 - t0) * s / float(samples_per_span)
+            points.append(_de_boor(control_points, knots, degree, span, t))
+        last_span = span
+    if last_span is not None:
+        points.append(_de_boor(control_points, knots, degree, last_span, knots[num_cp]))
+    return points
+
+def _encode_v2_line_strings(feature, line_strings):
+    cursor_x = 0
+    cursor_y = 0
+    for line_string in line_strings:
+        feature.geometry.append(command_move_to(1))
+        for i in range(len(line_string)):
+            if i == 1:
+                feature.geometry.append(command_line_to(len(line_string) - 1))
+            x = int(line_string[i][0])
+            y = int(line_string[i][1])
+            feature.geometry.append(zig_zag_encode(x - cursor_x))
+            feature.geometry.append(zig_zag_encode(y - cursor_y))
+            cursor_x = x
+            cursor_y = y
+
+def _spline_to_line_strings(spline_feature, samples_per_span):
+    if np is not None:
+        evaluated = spline_feature.evaluate(samples_per_span, no_elevation=True)
+    else:
+        evaluated = []
+        for control_points, knots in spline_feature._evaluable_splines(no_elevation=True):
+            evaluated.append(_evaluate_spline(control_points, knots, spline_feature.degree, samples_per_span))
+    line_strings = []
+    for spline in evaluated:
+        line_string = []
+        for pt in spline:
+            pt = [int(round(pt[0])), int(round(pt[1]))]
+            if not line_string or line_string[-1] != pt:
+                line_string.append(pt)
+        if len(line_string) > 1:
+            line_strings.append(line_string)
+    return line_strings
+
+def _flatten_attributes(attrs, flatten_nested, prefix=''):
+    flat = []
+    for k, v in attrs.items():
+        if isinstance(v, dict) or isinstance(v, list):
+            if not flatten_nested:
+                continue
+            if isinstance(v, dict):
+                flat.extend(_flatten_attributes(v, flatten_nested, prefix + k + '.'))
+            else:
+                items = dict((str(i), v[i]) for i in range(len(v)))
+                flat.extend(_flatten_attributes(items, flatten_nested, prefix + k + '.'))
+        elif v is not None:
+            flat.append((prefix + k, v))
+    return flat
+
+class _V2Tables(object):
+
+    def __init__(self, layer):
+        self._layer = layer
+        self._keys = {}
+        self._values = {}
+
+    def key_index(self, k):
+        index = self._keys.get(k)
+        if index is None:
+            index = len(self._keys)
+            self._keys[k] = index
+            self._layer.keys.append(k)
+        return index
+
+    def value_index(self, v):
+        if isinstance(v, bool):
+            lookup = ('bool_value', v)
+        elif isinstance(v, str) or isinstance(v, other_str):
+            lookup = ('string_value', v)
+        elif isinstance(v, Float):
+            lookup = ('float_value', v)
+        elif isinstance(v, float):
+            lookup = ('double_value', v)
+        elif isinstance(v, int) or isinstance(v, long):
+            if v >= 2**63:
+                lookup = ('uint_value', v)
+            elif v >= 0:
+                lookup = ('int_value', v)
+            else:
+                lookup = ('sint_value', v)
+        else:
+            return None
+        index = self._values.get(lookup)
+        if index is None:
+            index = len(self._values)
+            self._values[lookup] = index
+            val = self._layer.values.add()
+            setattr(val, lookup[0], v)
+        return index
+
+def _downgrade_layer(layer, new_layer, flatten_nested, spline_samples):
+    new_layer.version = 2
+    new_layer.name = layer.name
+    if layer._layer.HasField('extent'):
+        new_layer.extent = layer._layer.extent
+    if layer._inline_attributes:
+        tables = _V2Tables(new_layer)
+    else:
+        new_layer.keys.extend(layer._layer.keys)
+        new_layer.values.extend(layer._layer.values)
+        tables = None
+    for feature in layer.features:
+        f = feature._feature
+        new_feature = new_layer.features.add()
+        if f.HasField('id'):
+            new_feature.id = f.id
+        if f.type == vector_tile_pb2.Tile.SPLINE:
+            line_strings = _spline_to_line_strings(feature, spline_samples)
+            if not line_strings:
+                del new_layer.features[-1]
+                continue
+            new_feature.type = vector_tile_pb2.Tile.LINESTRING
+            _encode_v2_line_strings(new_feature, line_strings)
+        else:
+            new_feature.type = f.type
+            new_feature.geometry.extend(f.geometry)
+        if tables is None:
+            new_feature.tags.extend(f.tags)
+        elif len(f.attributes) != 0:
+            tags = []
+            for k, v in _flatten_attributes(layer.get_attributes(f.attributes), flatten_nested):
+                value_index = tables.value_index(v)
+                if value_index is None:
+                    continue
+                tags.append(tables.key_index(k))
+                tags.append(value_index)
+            new_feature.tags.extend(tags)
+
+def downgrade_to_v2(tile, flatten_nested=False, spline_samples=8):
+    if not isinstance(tile, VectorTile):
+        tile = VectorTile(tile)
+    new_tile = vector_tile_pb2.Tile()
+    for layer in tile.layers:
+        if layer.version <= 2:
+            new_tile.layers.add().CopyFrom(layer._layer)
+        else:
+            _downgrade_layer(layer, new_tile.layers.add(), flatten_nested, spline_samples)
+    return VectorTile(new_tile)
@@ -0,0 +1,83 @@
+import json
+from . import engine
+from . import wire
+from .engine import np
+
+# Streaming GeoJSON export. Features are written to the stream one at a time
+# so memory use does not grow with the size of the tile. Vertices are decoded
+# from the geometry command stream and transformed to longitude and latitude
+# with NumPy, one feature at a time.
+
+class _Transform(object):
+
+    def __init__(self, layer, lonlat, tile, precision):
+        self.lonlat = lonlat
+        self.precision = precision
+        self.extent = layer.extent
+        if lonlat:
+            self.tile = engine._tile_location(layer, tile)
+
+    def __call__(self, coords):
+        if not self.lonlat:
+            return coords.tolist()
+        out = engine._tile_to_lonlat_array(coords, self.tile[0], self.tile[1], self.tile[2], self.extent)
+        if self.precision is not None:
+            out = np.round(out, self.precision)
+        return out.tolist()
+
+def _geometry(feature, transform, no_elevation, spline_samples):
+    geom_type, parts = engine._simple_geometry(feature, no_elevation, spline_samples)
+    if geom_type is None:
+        return None
+    coordinates = engine._map_geometry(geom_type, parts, transform)
+    if geom_type == 'Point':
+        coordinates = coordinates[0]
+    return {'type': geom_type, 'coordinates': coordinates}
+
+def _properties(feature, geometric_attributes):
+    attributes = feature.attributes
+    properties = dict((key, attributes[key]) for key in attributes)
+    if geometric_attributes and feature._layer.version > 2:
+        geometric = feature.geometric_attributes
+        for key in geometric:
+            properties[key] = geometric[key]
+    return properties
+
+def iter_features(layer, lonlat=True, tile=None, precision=7, no_elevation=False, spline_samples=8,
+                  geometric_attributes=False):
+    # Yields the features of the layer as GeoJSON feature dicts
+    engine._require_numpy()
+    transform = _Transform(layer, lonlat, tile, precision)
+    for feature in layer.features:
+        out = {'type': 'Feature'}
+        if feature.id is not None:
+            out['id'] = feature.id
+        out['geometry'] = _geometry(feature, transform, no_elevation, spline_samples)
+        out['properties'] = _properties(feature, geometric_attributes)
+        yield out
+
+def _write_features(features, stream, first, extra=None):
+    for feature in features:
+        if extra is not None:
+            feature.update(extra)
+        if not first:
+            stream.write(',')
+        first = False
+        stream.write('\n')
+        stream.write(json.dumps(feature, default=wire._json_default))
+    return first
+
+def write_layer(layer, stream, **kwargs):
+    # Writes the layer as a FeatureCollection, see iter_features for the options
+    stream.write('{"type":"FeatureCollection","features":[')
+    _write_features(iter_features(layer, **kwargs), stream, True)
+    stream.write(']}\n')
+
+def write_tile(vt, stream, **kwargs):
+    # Writes the features of all layers as one FeatureCollection, the layer of
+    # each feature is stored in its "layer" member
+    stream.write('{"type":"FeatureCollection","features":[')
+    first = True
+    for layer in vt.layers:
+        first = _write_features(iter_features(layer, **kwargs), stream, first, {'layer': layer.name})
+    stream.write(']}\n')
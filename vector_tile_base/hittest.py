@@ -0,0 +1,149 @@
+import math
+from . import engine
+from .engine import np
+
+# Hit testing of the features of a layer, in tile coordinates. The geometry of
+# every feature is decoded once into a flat NumPy array of edges, the edges of
+# line strings, evaluated splines and polygon rings, with the vertices of point
+# features stored as edges of length zero. Edges are binned into horizontal
+# bands, so a query only looks at the edges in the bands within the tolerance
+# of the point, which are the only edges that can be close to it or cross the
+# ray used for the point in polygon test.
+
+class HitIndex(object):
+
+    def __init__(self, layer, spline_samples=8):
+        engine._require_numpy()
+        self.spline_samples = spline_samples
+        self._features = list(layer.features)
+        edges = []
+        owners = []
+        polygons = []
+        for i, feature in enumerate(self._features):
+            coords, parts = self._feature_parts(feature)
+            if len(coords) == 0:
+                continue
+            if feature.type == 'point':
+                feature_edges = np.hstack([coords, coords])
+            else:
+                # Edges between consecutive vertices of the same part
+                keep = np.ones(len(coords) - 1, dtype=bool)
+                keep[parts[1:-1] - 1] = False
+                feature_edges = np.hstack([coords[:-1], coords[1:]])[keep]
+            edges.append(feature_edges)
+            owners.append(np.full(len(feature_edges), i, dtype=np.int64))
+            polygons.append(np.full(len(feature_edges), feature.type == 'polygon', dtype=bool))
+        self._edges = np.concatenate(edges) if edges else np.zeros((0, 4))
+        self._owners = np.concatenate(owners) if owners else np.zeros(0, dtype=np.int64)
+        self._polygon = np.concatenate(polygons) if polygons else np.zeros(0, dtype=bool)
+        self._build_bands()
+
+    def _feature_parts(self, feature):
+        # Returns the (n, 2) float vertex array of the feature and the offsets
+        # of its parts
+        if feature.type == 'spline':
+            lines = [np.asarray(line, dtype=np.float64)[:, :2]
+                for line in feature.evaluate(samples_per_span=self.spline_samples, no_elevation=True)]
+            if not lines:
+                return np.zeros((0, 2)), np.zeros(1, dtype=np.int64)
+            offsets = np.concatenate([[0], np.cumsum([len(line) for line in lines])])
+            return np.concatenate(lines), offsets
+        if feature.type == 'polygon':
+            coords, offsets = feature._geometry_arrays(True, min_vertices=3, closed=True)
+        elif feature.type == 'line_string':
+            coords, offsets = feature._geometry_arrays(True, min_vertices=2)
+        else:
+            coords, offsets = feature._geometry_arrays(True)
+        return coords.astype(np.float64), offsets
+
+    def _build_bands(self):
+        edges = self._edges
+        self._min_x = np.minimum(edges[:, 0], edges[:, 2])
+        self._max_x = np.maximum(edges[:, 0], edges[:, 2])
+        self._min_y = np.minimum(edges[:, 1], edges[:, 3])
+        self._max_y = np.maximum(edges[:, 1], edges[:, 3])
+        self._num_bands = max(1, min(1024, int(math.sqrt(len(edges)))))
+        if len(edges) == 0:
+            self._origin = 0.0
+            self._band_height = 1.0
+        else:
+            self._origin = float(self._min_y.min())
+            self._band_height = max((float(self._max_y.max()) - self._origin) / self._num_bands, 1.0)
+        first = self._band(self._min_y)
+        counts = self._band(self._max_y) - first + 1
+        # An edge is listed in every band it overlaps
+        starts = np.cumsum(counts) - counts
+        bands = np.repeat(first - starts, counts) + np.arange(counts.sum())
+        order = np.argsort(bands, kind='stable')
+        self._first_band = first
+        self._bands = bands[order]
+        self._band_edges = np.repeat(np.arange(len(edges)), counts)[order]
+        self._band_offsets = np.searchsorted(self._bands, np.arange(self._num_bands + 1))
+
+    def _band(self, y):
+        return np.clip(np.floor((y - self._origin) / self._band_height), 0, self._num_bands - 1).astype(np.int64)
+
+    def _candidate_edges(self, y, tolerance):
+        if len(self._edges) == 0:
+            return self._band_edges
+        if y + tolerance < self._origin or y - tolerance > self._origin + self._band_height * self._num_bands:
+            return self._band_edges[:0]
+        first = int(self._band(y - tolerance))
+        last = int(self._band(y + tolerance))
+        start = self._band_offsets[first]
+        end = self._band_offsets[last + 1]
+        rows = self._band_edges[start:end]
+        if last > first:
+            # Edges in several of the bands are only kept in the first of them
+            rows = rows[self._bands[start:end] == np.maximum(self._first_band[rows], first)]
+        return rows
+
+    def query(self, x, y, tolerance=0):
+        # Returns (feature, distance) of the features within tolerance of x, y
+        # ordered by distance, the distance is 0 inside of polygons
+        rows = self._candidate_edges(y, tolerance)
+        min_y = self._min_y[rows]
+        max_y = self._max_y[rows]
+        near = ((self._min_x[rows] - tolerance <= x) & (self._max_x[rows] + tolerance >= x) &
+            (min_y - tolerance <= y) & (max_y + tolerance >= y))
+        # Even-odd rule with a ray to the right of the point, over all rings of
+        # a polygon so holes are outside of it
+        crossing = self._polygon[rows] & (min_y <= y) & (max_y > y) & (self._max_x[rows] > x)
+        crossing_rows = rows[crossing]
+        edges = self._edges[crossing_rows]
+        cross_x = edges[:, 0] + (y - edges[:, 1]) * (edges[:, 2] - edges[:, 0]) / (edges[:, 3] - edges[:, 1])
+        owners, counts = np.unique(self._owners[crossing_rows[x < cross_x]], return_counts=True)
+        inside = owners[counts % 2 == 1]
+
+        rows = rows[near]
+        edges = self._edges[rows]
+        ax = edges[:, 0]
+        ay = edges[:, 1]
+        dx = edges[:, 2] - ax
+        dy = edges[:, 3] - ay
+        length2 = dx * dx + dy * dy
+        u = np.clip(((x - ax) * dx + (y - ay) * dy) / np.where(length2 == 0, 1.0, length2), 0.0, 1.0)
+        distances = np.hypot(ax + u * dx - x, ay + u * dy - y)
+        owners = self._owners[rows]
+        hit = distances <= tolerance
+
+        owners = np.concatenate([inside, owners[hit]])
+        distances = np.concatenate([np.zeros(len(inside)), distances[hit]])
+        order = np.lexsort((distances, owners))
+        owners = owners[order]
+        distances = distances[order]
+        # The closest edge of each feature
+        first = np.ones(len(owners), dtype=bool)
+        first[1:] = owners[1:] != owners[:-1]
+        owners = owners[first]
+        distances = distances[first]
+        order = np.lexsort((owners, distances))
+        features = self._features
+        return [(features[i], d) for i, d in zip(owners[order].tolist(), distances[order].tolist())]
+
+def hit_test(layer, x, y, tolerance=0, spline_samples=8):
+    # The index is kept on the layer until the geometry of the layer changes
+    index = layer._hit_index
+    if index is None or index.spline_samples != spline_samples or len(index._features) != len(layer.features):
+        index = layer._hit_index = HitIndex(layer, spline_samples)
+    return index.query(x, y, tolerance)
@@ -0,0 +1,133 @@
+import threading
+import time
+from . import engine
+
+# Optional instrumentation of the encode and decode hot paths. Nothing in the
+# engine refers to this module, enable() wraps the instrumented methods and
+# disable() puts the original methods back, so there is no cost at all while
+# instrumentation is disabled.
+
+def _tile_layer(obj):
+    return None
+
+def _layer_name(obj):
+    return obj.name
+
+def _feature_layer(obj):
+    return obj._layer.name
+
+HOOKS = [
+    (engine.VectorTile, '_parse', 'parse', _tile_layer),
+    (engine.VectorTile, '_parse_layer', 'parse', _tile_layer),
+    (engine.VectorTile, 'serialize', 'serialize', _tile_layer),
+    (engine.Layer, '__init__', 'layer_build', _layer_name),
+    (engine.Layer, '_decode_values', 'decode_values', _layer_name),
+    (engine.Layer, '_decode_inline_values', 'decode_values', _layer_name),
+    (engine.Layer, 'get_attributes', 'attribute_decode', _layer_name),
+    (engine.Layer, 'add_attributes', 'attribute_encode', _layer_name),
+    (engine.PointFeature, 'get_points', 'geometry_decode', _feature_layer),
+    (engine.LineStringFeature, 'get_line_strings', 'geometry_decode', _feature_layer),
+    (engine.PolygonFeature, 'get_rings', 'geometry_decode', _feature_layer),
+    (engine.SplineFeature, 'get_splines', 'geometry_decode', _feature_layer),
+    (engine.PointFeature, 'add_points', 'geometry_encode', _feature_layer),
+    (engine.LineStringFeature, 'add_line_string', 'geometry_encode', _feature_layer),
+    (engine.PolygonFeature, 'add_ring', 'geometry_encode', _feature_layer),
+    (engine.SplineFeature, 'add_spline', 'geometry_encode', _feature_layer),
+]
+
+class Stats(object):
+
+    def __init__(self, callback=None):
+        self._callback = callback
+        self._lock = threading.Lock()
+        self._records = {}
+
+    def record(self, layer, event, elapsed):
+        with self._lock:
+            entry = self._records.get((layer, event))
+            if entry is None:
+                self._records[(layer, event)] = [1, elapsed]
+            else:
+                entry[0] = entry[0] + 1
+                entry[1] = entry[1] + elapsed
+        if self._callback is not None:
+            self._callback(layer, event, elapsed)
+
+    def count(self, event, layer=None):
+        with self._lock:
+            return sum(v[0] for k, v in self._records.items() if k[1] == event and (layer is None or k[0] == layer))
+
+    def total_time(self, event, layer=None):
+        with self._lock:
+            return sum(v[1] for k, v in self._records.items() if k[1] == event and (layer is None or k[0] == layer))
+
+    def as_dict(self):
+        out = {}
+        with self._lock:
+            for (layer, event), (count, elapsed) in self._records.items():
+                out.setdefault(layer, {})[event] = {'count': count, 'time': elapsed}
+        return out
+
+    def reset(self):
+        with self._lock:
+            self._records = {}
+
+_lock = threading.Lock()
+_originals = []
+_stats = None
+
+def _wrap(func, event, layer_of):
+    def wrapper(self, *args, **kwargs):
+        stats = _stats
+        if stats is None:
+            return func(self, *args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            try:
+                layer = layer_of(self)
+            except Exception:
+                layer = None
+            stats.record(layer, event, elapsed)
+    wrapper.__name__ = func.__name__
+    wrapper.__doc__ = func.__doc__
+    return wrapper
+
+def enable(stats=None, callback=None):
+    global _stats
+    if stats is None:
+        stats = Stats(callback)
+    with _lock:
+        if not _originals:
+            for cls, name, event, layer_of in HOOKS:
+                func = cls.__dict__[name]
+                _originals.append((cls, name, func))
+                setattr(cls, name, _wrap(func, event, layer_of))
+        _stats = stats
+    return stats
+
+def disable():
+    global _stats
+    with _lock:
+        while _originals:
+            cls, name, func = _originals.pop()
+            setattr(cls, name, func)
+        _stats = None
+
+def active_stats():
+    return _stats
+
+class instrumented(object):
+
+    def __init__(self, stats=None, callback=None):
+        self._stats = stats
+        self._callback = callback
+
+    def __enter__(self):
+        return enable(self._stats, self._callback)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        disable()
+        return False
@@ -0,0 +1,239 @@
+import concurrent.futures
+import gzip
+import hashlib
+import io
+import itertools
+import json
+import multiprocessing
+import sqlite3
+import threading
+from . import mercator
+
+# Reading and writing MBTiles archives, SQLite databases of tiles. Tiles are
+# addressed with the XYZ scheme here, rows are flipped to the TMS scheme used
+# by the database. Writers store tiles once per distinct blob using the map and
+# images tables, with a tiles view over them for other readers.
+
+DEDUPE_SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS metadata (name TEXT, value TEXT)',
+    'CREATE UNIQUE INDEX IF NOT EXISTS metadata_name ON metadata (name)',
+    'CREATE TABLE IF NOT EXISTS map (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_id TEXT)',
+    'CREATE UNIQUE INDEX IF NOT EXISTS map_index ON map (zoom_level, tile_column, tile_row)',
+    'CREATE TABLE IF NOT EXISTS images (tile_data BLOB, tile_id TEXT)',
+    'CREATE UNIQUE INDEX IF NOT EXISTS images_id ON images (tile_id)',
+    'CREATE VIEW IF NOT EXISTS tiles AS SELECT map.zoom_level AS zoom_level, map.tile_column AS tile_column, '
+    'map.tile_row AS tile_row, images.tile_data AS tile_data FROM map JOIN images ON images.tile_id = map.tile_id'
+]
+
+PLAIN_SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS metadata (name TEXT, value TEXT)',
+    'CREATE UNIQUE INDEX IF NOT EXISTS metadata_name ON metadata (name)',
+    'CREATE TABLE IF NOT EXISTS tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB)',
+    'CREATE UNIQUE INDEX IF NOT EXISTS tile_index ON tiles (zoom_level, tile_column, tile_row)'
+]
+
+def compress(data):
+    out = io.BytesIO()
+    # A fixed mtime keeps identical tiles byte for byte identical, so they are deduped
+    with gzip.GzipFile(fileobj=out, mode='wb', mtime=0) as f:
+        f.write(data)
+    return out.getvalue()
+
+def decompress(data):
+    if data[:2] == b'\x1f\x8b':
+        return gzip.GzipFile(fileobj=io.BytesIO(data)).read()
+    return data
+
+def _tile_id(data):
+    if hasattr(hashlib, 'blake2b'):
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+    return hashlib.sha1(data).hexdigest()
+
+def _table_names(db):
+    return set(row[0] for row in db.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view')"))
+
+class MBTilesWriter(object):
+
+    def __init__(self, path, metadata=None, dedupe=True, compress=True, batch_size=1000):
+        self._db = sqlite3.connect(path)
+        self._compress = compress
+        self._batch_size = batch_size
+        self._pending = []
+        tables = _table_names(self._db)
+        if 'tiles' in tables:
+            # Existing archives keep their layout
+            dedupe = 'map' in tables and 'images' in tables
+        self._dedupe = dedupe
+        for statement in (DEDUPE_SCHEMA if dedupe else PLAIN_SCHEMA):
+            self._db.execute(statement)
+        self._db.commit()
+        self.tiles_written = 0
+        if metadata:
+            self.update_metadata(metadata)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def update_metadata(self, metadata):
+        rows = []
+        for name, value in metadata.items():
+            if not isinstance(value, (str, type(u''))):
+                value = json.dumps(value)
+            rows.append((name, value))
+        self._db.executemany('INSERT OR REPLACE INTO metadata (name, value) VALUES (?, ?)', rows)
+        self._db.commit()
+
+    def write(self, z, x, y, tile):
+        # tile is a VectorTile or a serialized tile, compressed or not
+        if hasattr(tile, 'serialize'):
+            tile = tile.serialize()
+        tile = bytes(tile)
+        if self._compress and tile[:2] != b'\x1f\x8b':
+            tile = compress(tile)
+        self._pending.append((z, x, mercator.flip_y(y, z), tile))
+        if len(self._pending) >= self._batch_size:
+            self.flush()
+
+    def flush(self):
+        # Writes the pending tiles in one transaction
+        if not self._pending:
+            return
+        with self._db:
+            if self._dedupe:
+                images = {}
+                rows = []
+                for z, x, row, data in self._pending:
+                    tile_id = _tile_id(data)
+                    images[tile_id] = data
+                    rows.append((z, x, row, tile_id))
+                self._db.executemany('INSERT OR IGNORE INTO images (tile_id, tile_data) VALUES (?, ?)', images.items())
+                self._db.executemany('INSERT OR REPLACE INTO map (zoom_level, tile_column, tile_row, tile_id) VALUES (?, ?, ?, ?)', rows)
+            else:
+                self._db.executemany('INSERT OR REPLACE INTO tiles (zoom_level, tile_column, tile_row, tile_data) VALUES (?, ?, ?, ?)', self._pending)
+        self.tiles_written = self.tiles_written + len(self._pending)
+        self._pending = []
+
+    def close(self):
+        if self._db is not None:
+            self.flush()
+            self._db.close()
+            self._db = None
+
+def _map_task(args):
+    from . import engine
+    func, z, x, y, data = args
+    return z, x, y, func(z, x, y, engine.VectorTile(decompress(data)))
+
+class MBTilesReader(object):
+
+    def __init__(self, path):
+        self._path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        # SQLite connections can only be used by the thread that opened them
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = self._local.db = sqlite3.connect(self._path)
+        return db
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        db = getattr(self._local, 'db', None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+    def metadata(self):
+        return dict(self._connection().execute('SELECT name, value FROM metadata'))
+
+    def zoom_levels(self):
+        return [row[0] for row in self._connection().execute('SELECT DISTINCT zoom_level FROM tiles ORDER BY zoom_level')]
+
+    def read(self, z, x, y, decode=True):
+        # Returns the tile, decompressed bytes when decode is False, or None if it is missing
+        row = self._connection().execute('SELECT tile_data FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?',
+            (z, x, mercator.flip_y(y, z))).fetchone()
+        if row is None:
+            return None
+        data = decompress(row[0])
+        if decode:
+            from . import engine
+            return engine.VectorTile(data)
+        return data
+
+    def iter_addresses(self, zooms=None, bbox=None):
+        for z, x, y, data in self.iter_raw(zooms, bbox, data=False):
+            yield z, x, y
+
+    def iter_raw(self, zooms=None, bbox=None, data=True):
+        # Yields (z, x, y, stored blob) ordered by z, x and y
+        db = self._connection()
+        column = 'tile_data' if data else 'NULL'
+        if zooms is None:
+            zooms = self.zoom_levels()
+        for z in zooms:
+            query = 'SELECT tile_column, tile_row, %s FROM tiles WHERE zoom_level = ?' % column
+            params = [z]
+            if bbox is not None:
+                min_x, min_y, max_x, max_y = mercator.tile_range(bbox, z)
+                query = query + ' AND tile_column BETWEEN ? AND ? AND tile_row BETWEEN ? AND ?'
+                params.extend([min_x, max_x, mercator.flip_y(max_y, z), mercator.flip_y(min_y, z)])
+            for x, row, blob in db.execute(query + ' ORDER BY tile_column, tile_row DESC', params):
+                yield z, x, mercator.flip_y(row, z), blob
+
+    def iter_tiles(self, zooms=None, bbox=None, decode=True, prefetch=64):
+        # Yields (z, x, y, tile) for the tiles within the (west, south, east,
+        # north) bbox and zoom levels. Tiles are read and decompressed ahead on
+        # a background thread, up to prefetch tiles, while the caller works on
+        # the previous ones.
+        with concurrent.futures.ThreadPoolExecutor(1) as executor:
+            rows = self._prefetch(executor, zooms, bbox, prefetch)
+            for z, x, y, data in rows:
+                if decode:
+                    from . import engine
+                    yield z, x, y, engine.VectorTile(data)
+                else:
+                    yield z, x, y, data
+
+    def _prefetch(self, executor, zooms, bbox, prefetch):
+        rows = self.iter_raw(zooms, bbox)
+        def read_batch():
+            # Runs on the executor thread, so it uses its own connection
+            return [(z, x, y, decompress(data)) for z, x, y, data in itertools.islice(rows, prefetch)]
+        batch = executor.submit(read_batch)
+        while True:
+            tiles = batch.result()
+            if not tiles:
+                return
+            batch = executor.submit(read_batch)
+            for tile in tiles:
+                yield tile
+
+    def map_tiles(self, func, zooms=None, bbox=None, jobs=None, chunksize=8):
+        # Runs func(z, x, y, vt) on every tile in worker processes, so decoding
+        # uses all cores, and yields (z, x, y, result) in order. func must be
+        # picklable and so must its result. Decoded tiles can not be returned
+        # cheaply from other processes, use iter_tiles to get them.
+        if jobs is None:
+            jobs = multiprocessing.cpu_count()
+        tasks = ((func, z, x, y, data) for z, x, y, data in self.iter_raw(zooms, bbox))
+        if jobs <= 1:
+            for task in tasks:
+                yield _map_task(task)
+            return
+        pool = multiprocessing.Pool(jobs)
+        try:
+            for result in pool.imap(_map_task, tasks, chunksize=chunksize):
+                yield result
+        finally:
+            pool.close()
+            pool.join()
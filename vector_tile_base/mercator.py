@@ -0,0 +1,33 @@
+import math
+
+# Web mercator tile addressing, tiles are numbered from the top left corner
+# (XYZ scheme) unless noted otherwise.
+
+MAX_LATITUDE = 85.0511287798066
+
+def lonlat_to_tile(lon, lat, zoom):
+    # Returns the (x, y) of the tile containing the point, clamped to the world
+    n = 1 << zoom
+    lat = max(-MAX_LATITUDE, min(MAX_LATITUDE, lat))
+    x = (lon + 180.0) / 360.0 * n
+    y = (1.0 - math.log(math.tan(math.radians(lat)) + 1.0 / math.cos(math.radians(lat))) / math.pi) / 2.0 * n
+    return max(0, min(n - 1, int(math.floor(x)))), max(0, min(n - 1, int(math.floor(y))))
+
+def tile_range(bbox, zoom):
+    # Returns (min x, min y, max x, max y) of the tiles intersecting the
+    # (west, south, east, north) bbox in degrees, bounds are inclusive.
+    west, south, east, north = bbox
+    min_x, min_y = lonlat_to_tile(west, north, zoom)
+    max_x, max_y = lonlat_to_tile(east, south, zoom)
+    return min_x, min_y, max_x, max_y
+
+def flip_y(y, zoom):
+    # Converts between the XYZ and TMS row numbering
+    return (1 << zoom) - 1 - y
+
+def tile_to_lonlat(x, y, zoom):
+    # Returns the (lon, lat) of the top left corner of the tile, x and y may be fractional
+    n = float(1 << zoom)
+    lon = x / n * 360.0 - 180.0
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1.0 - 2.0 * y / n))))
+    return lon, lat
@@ -0,0 +1,416 @@
+import bisect
+import gzip
+import hashlib
+import io
+import json
+import mmap
+import shutil
+import struct
+import tempfile
+from . import mercator
+from . import wire
+
+# Reading and writing PMTiles version 3 archives, single files with a header,
+# a directory of tile IDs and the concatenated tile data. Tile IDs number the
+# tiles of each zoom level along a Hilbert curve, so nearby tiles are close
+# together in the directory and in the data. Runs of consecutive tile IDs with
+# the same content are stored as one directory entry.
+#
+# Archives are read through mmap and tiles that are not compressed are returned
+# as memoryviews into the file, which VectorTile accepts without copying.
+
+HEADER_SIZE = 127
+MAGIC = b'PMTiles'
+VERSION = 3
+# Header and root directory have to fit in the first 16KB of the archive
+ROOT_DIRECTORY_LIMIT = 16384 - HEADER_SIZE
+
+COMPRESSION_UNKNOWN = 0
+COMPRESSION_NONE = 1
+COMPRESSION_GZIP = 2
+COMPRESSION_BROTLI = 3
+COMPRESSION_ZSTD = 4
+
+COMPRESSIONS = {
+    'none': COMPRESSION_NONE,
+    'gzip': COMPRESSION_GZIP
+}
+
+TILE_TYPE_MVT = 1
+
+# Header layout, see https://github.com/protomaps/PMTiles/blob/main/spec/v3/spec.md
+_HEADER = struct.Struct('<7sBQQQQQQQQQQQBBBBBBiiiiBii')
+_HEADER_FIELDS = ['magic', 'version', 'root_offset', 'root_length', 'metadata_offset', 'metadata_length',
+    'leaf_directory_offset', 'leaf_directory_length', 'tile_data_offset', 'tile_data_length',
+    'addressed_tiles_count', 'tile_entries_count', 'tile_contents_count', 'clustered', 'internal_compression',
+    'tile_compression', 'tile_type', 'min_zoom', 'max_zoom', 'min_lon_e7', 'min_lat_e7', 'max_lon_e7',
+    'max_lat_e7', 'center_zoom', 'center_lon_e7', 'center_lat_e7']
+
+def _rotate(n, x, y, rx, ry):
+    if ry == 0:
+        if rx == 1:
+            x = n - 1 - x
+            y = n - 1 - y
+        return y, x
+    return x, y
+
+def zxy_to_tile_id(z, x, y):
+    if z > 31:
+        raise Exception("Zoom level %d is too large" % z)
+    n = 1 << z
+    if x < 0 or y < 0 or x >= n or y >= n:
+        raise Exception("Tile %d/%d/%d is outside of the zoom level" % (z, x, y))
+    # Tiles of all lower zoom levels come first
+    tile_id = ((1 << (2 * z)) - 1) // 3
+    s = n >> 1
+    while s > 0:
+        rx = 1 if x & s else 0
+        ry = 1 if y & s else 0
+        tile_id = tile_id + s * s * ((3 * rx) ^ ry)
+        x, y = _rotate(s, x, y, rx, ry)
+        s = s >> 1
+    return tile_id
+
+def tile_id_to_zxy(tile_id):
+    z = 0
+    acc = 0
+    while True:
+        count = 1 << (2 * z)
+        if tile_id < acc + count:
+            break
+        acc = acc + count
+        z = z + 1
+    t = tile_id - acc
+    x = 0
+    y = 0
+    s = 1
+    while s < (1 << z):
+        rx = 1 & (t >> 1)
+        ry = 1 & (t ^ rx)
+        x, y = _rotate(s, x, y, rx, ry)
+        x = x + s * rx
+        y = y + s * ry
+        t = t >> 2
+        s = s << 1
+    return z, x, y
+
+def _compress(data, compression):
+    if compression == COMPRESSION_NONE:
+        return data
+    elif compression == COMPRESSION_GZIP:
+        out = io.BytesIO()
+        with gzip.GzipFile(fileobj=out, mode='wb', mtime=0) as f:
+            f.write(data)
+        return out.getvalue()
+    raise Exception("Unsupported compression %d" % compression)
+
+def _decompress(data, compression):
+    if compression == COMPRESSION_NONE or compression == COMPRESSION_UNKNOWN:
+        return data
+    elif compression == COMPRESSION_GZIP:
+        return gzip.GzipFile(fileobj=io.BytesIO(data)).read()
+    raise Exception("Unsupported compression %d" % compression)
+
+# Directories are stored column wise, tile IDs as deltas and offsets as 0 when
+# the entry directly follows the previous one.
+
+def serialize_directory(entries):
+    # entries is a list of (tile id, offset, length, run length), run length 0 points to a leaf directory
+    out = bytearray()
+    wire.write_varint(out, len(entries))
+    last_id = 0
+    for entry in entries:
+        wire.write_varint(out, entry[0] - last_id)
+        last_id = entry[0]
+    for entry in entries:
+        wire.write_varint(out, entry[3])
+    for entry in entries:
+        wire.write_varint(out, entry[2])
+    for i, entry in enumerate(entries):
+        if i > 0 and entry[1] == entries[i - 1][1] + entries[i - 1][2]:
+            wire.write_varint(out, 0)
+        else:
+            wire.write_varint(out, entry[1] + 1)
+    return bytes(out)
+
+def deserialize_directory(data):
+    # Returns the directory as lists of tile ids, offsets, lengths and run lengths
+    data = wire.as_buffer(data)
+    count, pos = wire.read_varint(data, 0)
+    tile_ids = []
+    run_lengths = []
+    lengths = []
+    offsets = []
+    last_id = 0
+    for i in range(count):
+        delta, pos = wire.read_varint(data, pos)
+        last_id = last_id + delta
+        tile_ids.append(last_id)
+    for i in range(count):
+        value, pos = wire.read_varint(data, pos)
+        run_lengths.append(value)
+    for i in range(count):
+        value, pos = wire.read_varint(data, pos)
+        lengths.append(value)
+    for i in range(count):
+        value, pos = wire.read_varint(data, pos)
+        if value == 0 and i > 0:
+            offsets.append(offsets[i - 1] + lengths[i - 1])
+        else:
+            offsets.append(value - 1)
+    return tile_ids, offsets, lengths, run_lengths
+
+def _build_directories(entries, compression):
+    # Returns the compressed root directory and leaf directories, leaves are
+    # only used when the root directory does not fit in the first 16KB.
+    root = _compress(serialize_directory(entries), compression)
+    if len(root) <= ROOT_DIRECTORY_LIMIT:
+        return root, b''
+    leaf_size = 4096
+    while True:
+        leaves = bytearray()
+        root_entries = []
+        for i in range(0, len(entries), leaf_size):
+            leaf = _compress(serialize_directory(entries[i:i + leaf_size]), compression)
+            root_entries.append((entries[i][0], len(leaves), len(leaf), 0))
+            leaves.extend(leaf)
+        root = _compress(serialize_directory(root_entries), compression)
+        if len(root) <= ROOT_DIRECTORY_LIMIT:
+            return root, bytes(leaves)
+        leaf_size = leaf_size * 2
+
+def _e7(value):
+    return int(round(value * 10000000))
+
+class PMTilesWriter(object):
+
+    def __init__(self, path, metadata=None, tile_compression='none', internal_compression='gzip', bounds=None, center=None):
+        self._path = path
+        self._metadata = dict(metadata or {})
+        self._tile_compression = COMPRESSIONS[tile_compression]
+        self._internal_compression = COMPRESSIONS[internal_compression]
+        self._bounds = bounds
+        self._center = center
+        # Tile data is spooled to a temporary file in the order it is written
+        self._data = tempfile.TemporaryFile()
+        self._data_length = 0
+        self._contents = {}
+        self._tiles = []
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self._data.close()
+
+    def write(self, z, x, y, tile):
+        # tile is a VectorTile or a serialized tile, tiles with the same bytes are stored once
+        if hasattr(tile, 'serialize'):
+            tile = tile.serialize()
+        tile = _compress(bytes(tile), self._tile_compression)
+        key = hashlib.sha1(tile).digest()
+        content = self._contents.get(key)
+        if content is None:
+            content = self._contents[key] = (self._data_length, len(tile))
+            self._data.write(tile)
+            self._data_length = self._data_length + len(tile)
+        self._tiles.append((zxy_to_tile_id(z, x, y), content[0], content[1]))
+
+    def _entries(self):
+        # The last write of a tile wins, then the tiles are sorted by tile ID
+        # and runs of the same content are merged
+        tiles = {}
+        for tile_id, offset, length in self._tiles:
+            tiles[tile_id] = (offset, length)
+        entries = []
+        for tile_id in sorted(tiles):
+            offset, length = tiles[tile_id]
+            if entries:
+                last = entries[-1]
+                if last[0] + last[3] == tile_id and last[1] == offset and last[2] == length:
+                    entries[-1] = (last[0], last[1], last[2], last[3] + 1)
+                    continue
+            entries.append((tile_id, offset, length, 1))
+        return entries
+
+    def _header(self, entries):
+        zooms = [tile_id_to_zxy(entry[0])[0] for entry in entries] or [0]
+        min_zoom = min(zooms)
+        max_zoom = max(tile_id_to_zxy(entry[0] + entry[3] - 1)[0] for entry in entries) if entries else 0
+        bounds = self._bounds
+        if bounds is None:
+            bounds = (-180.0, -mercator.MAX_LATITUDE, 180.0, mercator.MAX_LATITUDE)
+            if entries:
+                # Bounds of the tiles at the highest zoom level
+                tiles = [tile_id_to_zxy(t) for entry in entries for t in range(entry[0], entry[0] + entry[3])]
+                tiles = [t for t in tiles if t[0] == max_zoom]
+                west, north = mercator.tile_to_lonlat(min(t[1] for t in tiles), min(t[2] for t in tiles), max_zoom)
+                east, south = mercator.tile_to_lonlat(max(t[1] for t in tiles) + 1, max(t[2] for t in tiles) + 1, max_zoom)
+                bounds = (west, south, east, north)
+        center = self._center
+        if center is None:
+            center = ((bounds[0] + bounds[2]) / 2.0, (bounds[1] + bounds[3]) / 2.0, min_zoom)
+        # Clustered when the tile contents are stored in tile ID order
+        clustered = 1
+        seen = set()
+        end = 0
+        for entry in entries:
+            if entry[1] not in seen:
+                if entry[1] != end:
+                    clustered = 0
+                    break
+                seen.add(entry[1])
+                end = end + entry[2]
+        return {
+            'addressed_tiles_count': sum(entry[3] for entry in entries),
+            'tile_entries_count': len(entries),
+            'tile_contents_count': len(set(entry[1] for entry in entries)),
+            'clustered': clustered,
+            'internal_compression': self._internal_compression,
+            'tile_compression': self._tile_compression,
+            'tile_type': TILE_TYPE_MVT,
+            'min_zoom': min_zoom,
+            'max_zoom': max_zoom,
+            'min_lon_e7': _e7(bounds[0]),
+            'min_lat_e7': _e7(bounds[1]),
+            'max_lon_e7': _e7(bounds[2]),
+            'max_lat_e7': _e7(bounds[3]),
+            'center_zoom': center[2],
+            'center_lon_e7': _e7(center[0]),
+            'center_lat_e7': _e7(center[1])
+        }
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        entries = self._entries()
+        root, leaves = _build_directories(entries, self._internal_compression)
+        metadata = _compress(json.dumps(self._metadata).encode('utf-8'), self._internal_compression)
+        header = self._header(entries)
+        header['magic'] = MAGIC
+        header['version'] = VERSION
+        header['root_offset'] = HEADER_SIZE
+        header['root_length'] = len(root)
+        header['metadata_offset'] = HEADER_SIZE + len(root)
+        header['metadata_length'] = len(metadata)
+        header['leaf_directory_offset'] = header['metadata_offset'] + len(metadata)
+        header['leaf_directory_length'] = len(leaves)
+        header['tile_data_offset'] = header['leaf_directory_offset'] + len(leaves)
+        header['tile_data_length'] = self._data_length
+        with open(self._path, 'wb') as f:
+            f.write(_HEADER.pack(*[header[name] for name in _HEADER_FIELDS]))
+            f.write(root)
+            f.write(metadata)
+            f.write(leaves)
+            self._data.seek(0)
+            shutil.copyfileobj(self._data, f)
+        self._data.close()
+
+class PMTilesReader(object):
+
+    def __init__(self, path, leaf_cache_size=64):
+        self._file = open(path, 'rb')
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        self._view = memoryview(self._mmap)
+        if len(self._mmap) < HEADER_SIZE:
+            self.close()
+            raise Exception("File is too short to be a PMTiles archive")
+        self.header = dict(zip(_HEADER_FIELDS, _HEADER.unpack_from(self._mmap, 0)))
+        if self.header['magic'] != MAGIC or self.header['version'] != VERSION:
+            self.close()
+            raise Exception("Not a PMTiles version 3 archive")
+        self._root = self._read_directory(self.header['root_offset'], self.header['root_length'])
+        self._leaf_cache_size = leaf_cache_size
+        self._leaves = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        # Tiles returned as memoryviews that are still alive keep the mapping
+        # open, it is then unmapped when the last of them is garbage collected
+        if self._mmap is not None:
+            self._view.release()
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass
+            self._mmap = None
+            self._view = None
+            self._file.close()
+
+    def _read_directory(self, offset, length):
+        data = self._mmap[offset:offset + length]
+        return deserialize_directory(_decompress(data, self.header['internal_compression']))
+
+    def _leaf(self, offset, length):
+        key = (offset, length)
+        directory = self._leaves.get(key)
+        if directory is None:
+            if len(self._leaves) >= self._leaf_cache_size:
+                self._leaves.clear()
+            directory = self._leaves[key] = self._read_directory(self.header['leaf_directory_offset'] + offset, length)
+        return directory
+
+    def metadata(self):
+        data = self._mmap[self.header['metadata_offset']:self.header['metadata_offset'] + self.header['metadata_length']]
+        return json.loads(_decompress(data, self.header['internal_compression']).decode('utf-8'))
+
+    def _find(self, tile_id):
+        # Returns (offset, length) in the tile data or None
+        directory = self._root
+        for depth in range(4):
+            tile_ids, offsets, lengths, run_lengths = directory
+            i = bisect.bisect_right(tile_ids, tile_id) - 1
+            if i < 0:
+                return None
+            if run_lengths[i] == 0:
+                directory = self._leaf(offsets[i], lengths[i])
+                continue
+            if tile_id - tile_ids[i] < run_lengths[i]:
+                return offsets[i], lengths[i]
+            return None
+        raise Exception("Directories are nested too deeply")
+
+    def get(self, z, x, y):
+        # Returns the tile or None, as a memoryview into the archive when tiles
+        # are not compressed
+        location = self._find(zxy_to_tile_id(z, x, y))
+        if location is None:
+            return None
+        start = self.header['tile_data_offset'] + location[0]
+        data = self._view[start:start + location[1]]
+        if self.header['tile_compression'] in (COMPRESSION_NONE, COMPRESSION_UNKNOWN):
+            return data
+        return _decompress(data, self.header['tile_compression'])
+
+    def _iter_entries(self, directory):
+        tile_ids, offsets, lengths, run_lengths = directory
+        for i in range(len(tile_ids)):
+            if run_lengths[i] == 0:
+                for entry in self._iter_entries(self._leaf(offsets[i], lengths[i])):
+                    yield entry
+            else:
+                yield tile_ids[i], offsets[i], lengths[i], run_lengths[i]
+
+    def iter_addresses(self):
+        # Yields (z, x, y) of every tile in tile ID order
+        for tile_id, offset, length, run_length in self._iter_entries(self._root):
+            for i in range(run_length):
+                yield tile_id_to_zxy(tile_id + i)
+
+    def iter_tiles(self):
+        for z, x, y in self.iter_addresses():
+            yield z, x, y, self.get(z, x, y)
@@ -0,0 +1,43 @@
+import os
+import warnings
+
+# Information about the protobuf runtime, kept separate from the engine so it
+# can be queried without importing the generated protobuf code.
+
+WARN_ENVIRONMENT_VARIABLE = 'VECTOR_TILE_BASE_WARN_SLOW_PROTOBUF'
+
+class SlowProtobufWarning(RuntimeWarning):
+    pass
+
+_warn_slow = os.environ.get(WARN_ENVIRONMENT_VARIABLE, '') not in ('', '0')
+_engine_loaded = False
+
+def protobuf_implementation():
+    # 'upb', 'cpp' or 'python', None when protobuf is not installed
+    try:
+        from google.protobuf.internal import api_implementation
+    except ImportError:
+        return None
+    return api_implementation.Type()
+
+def is_slow_protobuf():
+    return protobuf_implementation() == 'python'
+
+def _warn():
+    warnings.warn("The pure python protobuf runtime is in use, encoding and decoding tiles will be slow. "
+        "Install a protobuf release with the upb or cpp runtime, or unset PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION.",
+        SlowProtobufWarning, stacklevel=3)
+
+def warn_on_slow_protobuf(enabled=True):
+    # Opt in to a warning when the engine is used with the pure python runtime.
+    # Warns immediately if the engine has already been loaded.
+    global _warn_slow
+    _warn_slow = enabled
+    if enabled and _engine_loaded and is_slow_protobuf():
+        _warn()
+
+def _on_engine_import():
+    global _engine_loaded
+    _engine_loaded = True
+    if _warn_slow and is_slow_protobuf():
+        _warn()
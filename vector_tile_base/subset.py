@@ -0,0 +1,462 @@
+from . import engine
+from . import wire
+from .engine import np
+from .wire import GEOM_POINT, GEOM_POLYGON, GEOM_SPLINE
+
+# Subsetting of a serialized tile to a bounding box in tile coordinates,
+# without building the protobuf objects. The geometry streams of all features
+# of a layer are decoded at once with NumPy to find the bounding box of every
+# feature. Features inside the bounding box are copied byte for byte, features
+# outside of it are dropped and only the features crossing its edges are
+# clipped and have their geometry encoded again. Layer fields, including the
+# key and value tables, are copied as they are unless compact is set, which
+# drops the keys and values no longer used by the remaining features.
+
+class _Feature(object):
+
+    __slots__ = ('field_start', 'start', 'end', 'type', 'geometry', 'elevation', 'tags', 'attributes',
+                 'geometric_attributes', 'vertices', 'parts')
+
+    def __init__(self, field_start, start, end):
+        self.field_start = field_start
+        self.start = start
+        self.end = end
+        self.type = 0
+        self.geometry = None
+        self.elevation = None
+        self.tags = None
+        self.attributes = None
+        self.geometric_attributes = None
+
+def _read_feature(data, field_start, start, end):
+    feature = _Feature(field_start, start, end)
+    for field, wire_type, value, f_start, value_start, value_end in wire.iter_fields(data, start, end):
+        if field == wire.FEATURE_TYPE:
+            feature.type = value
+        elif field == wire.FEATURE_GEOMETRY:
+            if wire_type != wire.WIRE_LENGTH or feature.geometry is not None:
+                raise Exception("Feature geometry must be a single packed field")
+            feature.geometry = (value_start, value_end)
+        elif field == wire.FEATURE_ELEVATION and wire_type == wire.WIRE_LENGTH:
+            feature.elevation = (value_start, value_end)
+        elif field == wire.FEATURE_TAGS and wire_type == wire.WIRE_LENGTH:
+            feature.tags = (value_start, value_end)
+        elif field == wire.FEATURE_ATTRIBUTES and wire_type == wire.WIRE_LENGTH:
+            feature.attributes = (value_start, value_end)
+        elif field == wire.FEATURE_GEOMETRIC_ATTRIBUTES and wire_type == wire.WIRE_LENGTH:
+            feature.geometric_attributes = (value_start, value_end)
+    return feature
+
+def _varints_array(data):
+    # Decodes a buffer of varints at once
+    buf = np.frombuffer(bytes(data), dtype=np.uint8)
+    if len(buf) == 0:
+        return np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.int64)
+    if buf[-1] & 0x80:
+        raise Exception("Truncated varint")
+    ends = np.flatnonzero(buf < 0x80)
+    starts = np.concatenate([[0], ends[:-1] + 1])
+    shifts = (np.arange(len(buf)) - np.repeat(starts, ends - starts + 1)) * 7
+    if shifts.max() >= 64:
+        raise Exception("Varint is too long")
+    values = np.add.reduceat((buf & 0x7f).astype(np.uint64) << shifts.astype(np.uint64), starts)
+    return values, ends
+
+def _decode_geometry(data, features):
+    # Decodes the geometry of all features into one array of vertices. Sets
+    # the range of vertices of each feature and the parts, as (first vertex,
+    # number of vertices), and returns the vertices and the bounds of every
+    # feature.
+    ranges = [feature.geometry or (0, 0) for feature in features]
+    values, ends = _varints_array(b''.join(bytes(data[start:end]) for start, end in ranges))
+    byte_offsets = np.cumsum([0] + [end - start for start, end in ranges])
+    varint_offsets = np.searchsorted(ends, byte_offsets).tolist()
+    commands = values.tolist()
+    mask = np.zeros(len(values), dtype=bool)
+    vertices = 0
+    for index, feature in enumerate(features):
+        i = varint_offsets[index]
+        end = varint_offsets[index + 1]
+        first = vertices
+        parts = []
+        while i < end:
+            command = commands[i]
+            i = i + 1
+            if engine.next_command_close_path(command):
+                continue
+            count = min(engine.get_command_count(command), (end - i) // 2)
+            if engine.next_command_move_to(command) and feature.type == GEOM_POINT:
+                parts.extend((vertices + k, 1) for k in range(count))
+            elif engine.next_command_move_to(command) or not parts:
+                parts.append((vertices, count))
+            else:
+                parts[-1] = (parts[-1][0], parts[-1][1] + count)
+            mask[i:i + 2 * count] = True
+            vertices = vertices + count
+            i = i + 2 * count
+        feature.vertices = (first, vertices)
+        feature.parts = parts
+    params = values[mask].astype(np.int64)
+    deltas = ((params >> 1) ^ -(params & 1)).reshape(-1, 2)
+    coords = np.cumsum(deltas, axis=0)
+    # The cursor starts at 0 for every feature
+    firsts = np.asarray([feature.vertices[0] for feature in features], dtype=np.int64)
+    counts = np.asarray([feature.vertices[1] - feature.vertices[0] for feature in features], dtype=np.int64)
+    base = np.zeros((len(features), 2), dtype=np.int64)
+    base[firsts > 0] = coords[firsts[firsts > 0] - 1]
+    coords = coords - np.repeat(base, counts, axis=0)
+    bounds = np.zeros((len(features), 4), dtype=np.int64)
+    nonempty = np.flatnonzero(counts > 0)
+    if len(nonempty):
+        bounds[nonempty, :2] = np.minimum.reduceat(coords, firsts[nonempty], axis=0)
+        bounds[nonempty, 2:] = np.maximum.reduceat(coords, firsts[nonempty], axis=0)
+    return coords, bounds, counts
+
+def _interpolate(a, b, t):
+    return [a[k] + (b[k] - a[k]) * t for k in range(len(a))]
+
+def _clip_line(line, bbox):
+    # Liang-Barsky clipping of every segment, returns the pieces of the line
+    # inside the bounding box
+    min_x, min_y, max_x, max_y = bbox
+    out = []
+    current = None
+    for a, b in zip(line[:-1], line[1:]):
+        t0 = 0.0
+        t1 = 1.0
+        dx = b[0] - a[0]
+        dy = b[1] - a[1]
+        visible = True
+        for p, q in ((-dx, a[0] - min_x), (dx, max_x - a[0]), (-dy, a[1] - min_y), (dy, max_y - a[1])):
+            if p == 0:
+                if q < 0:
+                    visible = False
+                    break
+            else:
+                t = float(q) / p
+                if p < 0:
+                    t0 = max(t0, t)
+                else:
+                    t1 = min(t1, t)
+        if not visible or t0 > t1:
+            current = None
+            continue
+        start = a if t0 == 0.0 else _interpolate(a, b, t0)
+        end = b if t1 == 1.0 else _interpolate(a, b, t1)
+        if current is None or t0 != 0.0:
+            current = [start]
+            out.append(current)
+        current.append(end)
+        if t1 != 1.0:
+            current = None
+    return out
+
+def _clip_ring(ring, bbox):
+    # Sutherland-Hodgman clipping of an unclosed ring against each side of the
+    # bounding box, the winding order of the ring is kept
+    min_x, min_y, max_x, max_y = bbox
+    for axis, limit, keep_below in ((0, min_x, False), (0, max_x, True), (1, min_y, False), (1, max_y, True)):
+        if not ring:
+            break
+        inside = [(p[axis] <= limit) if keep_below else (p[axis] >= limit) for p in ring]
+        out = []
+        for i in range(len(ring)):
+            a = ring[i - 1]
+            b = ring[i]
+            if inside[i]:
+                if not inside[i - 1]:
+                    out.append(_interpolate(a, b, float(limit - a[axis]) / (b[axis] - a[axis])))
+                out.append(b)
+            elif inside[i - 1]:
+                out.append(_interpolate(a, b, float(limit - a[axis]) / (b[axis] - a[axis])))
+        ring = out
+    return ring
+
+def _round_part(part):
+    # Rounds clipped vertices to integers and drops repeated vertices
+    out = []
+    for p in part:
+        p = [int(round(v)) for v in p]
+        if not out or p[0] != out[-1][0] or p[1] != out[-1][1]:
+            out.append(p)
+    return out
+
+def _encode_geometry(geom_type, parts):
+    # Returns the geometry commands and elevation deltas of the parts
+    geometry = []
+    elevation = []
+    cursor = [0, 0, 0]
+
+    def add(points):
+        for p in points:
+            geometry.append(engine.zig_zag_encode(p[0] - cursor[0]))
+            geometry.append(engine.zig_zag_encode(p[1] - cursor[1]))
+            cursor[0] = p[0]
+            cursor[1] = p[1]
+            if len(p) > 2:
+                elevation.append(engine.zig_zag_encode(p[2] - cursor[2]))
+                cursor[2] = p[2]
+
+    if geom_type == GEOM_POINT:
+        geometry.append(engine.command_move_to(len(parts)))
+        add(parts)
+        return geometry, elevation
+    for part in parts:
+        geometry.append(engine.command_move_to(1))
+        add(part[:1])
+        geometry.append(engine.command_line_to(len(part) - 1))
+        add(part[1:])
+        if geom_type == GEOM_POLYGON:
+            geometry.append(engine.command_close_path())
+    return geometry, elevation
+
+def _part_position(coords, bbox):
+    # 1 when the vertices are inside of the bounding box, -1 when their own
+    # bounding box is outside of it and 0 when they have to be clipped
+    low = coords.min(axis=0)
+    high = coords.max(axis=0)
+    if low[0] >= bbox[0] and low[1] >= bbox[1] and high[0] <= bbox[2] and high[1] <= bbox[3]:
+        return 1
+    if high[0] < bbox[0] or low[0] > bbox[2] or high[1] < bbox[1] or low[1] > bbox[3]:
+        return -1
+    return 0
+
+def _clip_feature(data, feature, coords, bbox):
+    # Returns the clipped geometry commands and elevation of the feature, or
+    # None when nothing of it is left
+    first, last = feature.vertices
+    coords = coords[first:last]
+    if feature.elevation is not None:
+        deltas, ends = _varints_array(data[feature.elevation[0]:feature.elevation[1]])
+        deltas = deltas.astype(np.int64)
+        if len(deltas) == len(coords):
+            coords = np.column_stack([coords, np.cumsum((deltas >> 1) ^ -(deltas & 1))])
+    min_x, min_y, max_x, max_y = bbox
+    parts = []
+    if feature.type == GEOM_POINT:
+        keep = (coords[:, 0] >= min_x) & (coords[:, 0] <= max_x) & (coords[:, 1] >= min_y) & (coords[:, 1] <= max_y)
+        parts = coords[keep].tolist()
+    elif feature.type == GEOM_POLYGON:
+        for start, count in feature.parts:
+            ring = coords[start - first:start - first + count]
+            position = _part_position(ring, bbox)
+            if position == -1:
+                continue
+            ring = ring.tolist()
+            if position == 0:
+                ring = _round_part(_clip_ring(ring, bbox))
+                if len(ring) > 1 and ring[0][:2] == ring[-1][:2]:
+                    ring.pop()
+            if len(ring) >= 3:
+                parts.append(ring)
+    else:
+        for start, count in feature.parts:
+            line = coords[start - first:start - first + count]
+            position = _part_position(line, bbox)
+            if position == -1:
+                continue
+            lines = [line.tolist()] if position == 1 else [_round_part(piece) for piece in _clip_line(line.tolist(), bbox)]
+            parts.extend(line for line in lines if len(line) >= 2)
+    if not parts:
+        return None
+    return _encode_geometry(feature.type, parts)
+
+# Compaction of the key and value tables
+
+class _Used(object):
+    # Stands in for an index map while collecting the indices that are used
+
+    def __init__(self):
+        self.indices = set()
+
+    def __getitem__(self, index):
+        self.indices.add(index)
+        return index
+
+def _index_map(used):
+    return dict((index, i) for i, index in enumerate(sorted(used.indices)))
+
+def _remap_inline_value(itr, value, out, maps):
+    val_id = engine.get_inline_value_id(value)
+    param = engine.get_inline_value_parameter(value)
+    if val_id == engine.CV_TYPE_STRING:
+        out.append(engine.complex_value_integer(val_id, maps['string_values'][param]))
+    elif val_id == engine.CV_TYPE_FLOAT:
+        out.append(engine.complex_value_integer(val_id, maps['float_values'][param]))
+    elif val_id == engine.CV_TYPE_DOUBLE:
+        out.append(engine.complex_value_integer(val_id, maps['double_values'][param]))
+    elif val_id == engine.CV_TYPE_UINT or val_id == engine.CV_TYPE_SINT:
+        out.append(engine.complex_value_integer(val_id, maps['int_values'][param]))
+    elif val_id == engine.CV_TYPE_LIST:
+        out.append(value)
+        for i in range(param):
+            _remap_inline_value(itr, next(itr), out, maps)
+    elif val_id == engine.CV_TYPE_MAP:
+        out.append(value)
+        for i in range(param):
+            out.append(maps['keys'][next(itr)])
+            _remap_inline_value(itr, next(itr), out, maps)
+    elif val_id == engine.CV_TYPE_LIST_DOUBLE:
+        # Attribute scaling index and the values, nothing to remap
+        out.append(value)
+        for i in range(param + 1):
+            out.append(next(itr))
+    else:
+        out.append(value)
+
+def _remap_inline(data, start, end, maps):
+    out = []
+    itr = wire.iter_packed_varints(data, start, end)
+    try:
+        for key in itr:
+            out.append(maps['keys'][key])
+            _remap_inline_value(itr, next(itr), out, maps)
+    except StopIteration:
+        raise Exception("Truncated inline attributes")
+    return out
+
+def _remap_tags(data, start, end, maps):
+    out = []
+    itr = wire.iter_packed_varints(data, start, end)
+    for key in itr:
+        try:
+            value = next(itr)
+        except StopIteration:
+            raise Exception("Odd number of tags")
+        out.append(maps['keys'][key])
+        out.append(maps['values'][value])
+    return out
+
+def _remap_feature(data, feature, maps):
+    # Returns the remapped (field, values) of the attributes of the feature
+    out = []
+    if feature.tags is not None:
+        out.append((wire.FEATURE_TAGS, _remap_tags(data, feature.tags[0], feature.tags[1], maps)))
+    if feature.attributes is not None:
+        out.append((wire.FEATURE_ATTRIBUTES, _remap_inline(data, feature.attributes[0], feature.attributes[1], maps)))
+    if feature.geometric_attributes is not None:
+        out.append((wire.FEATURE_GEOMETRIC_ATTRIBUTES,
+            _remap_inline(data, feature.geometric_attributes[0], feature.geometric_attributes[1], maps)))
+    return out
+
+_PACKED_TABLES = {
+    wire.LAYER_FLOAT_VALUES: ('float_values', '<f4'),
+    wire.LAYER_DOUBLE_VALUES: ('double_values', '<f8'),
+    wire.LAYER_INT_VALUES: ('int_values', '<u8')
+}
+
+_ENTRY_TABLES = {
+    wire.LAYER_KEYS: 'keys',
+    wire.LAYER_VALUES: 'values',
+    wire.LAYER_STRING_VALUES: 'string_values'
+}
+
+def _compact_tables(data, table_fields, maps):
+    # Returns the fields of the compacted tables by table name
+    out = {}
+    for field, entries in table_fields.items():
+        if field in _ENTRY_TABLES:
+            name = _ENTRY_TABLES[field]
+            payload = bytearray()
+            for index in sorted(maps[name]):
+                wire.write_length_field(payload, field, data[entries[index][0]:entries[index][1]])
+        else:
+            name, dtype = _PACKED_TABLES[field]
+            values = np.frombuffer(b''.join(bytes(data[start:end]) for start, end in entries), dtype=dtype)
+            kept = values[sorted(maps[name])]
+            payload = bytearray()
+            if len(kept):
+                wire.write_length_field(payload, field, kept.astype(dtype).tobytes())
+        out[field] = payload
+    return out
+
+def _write_feature(out, data, feature, geometry, attributes):
+    # Writes the feature with its geometry and attributes replaced
+    replaced = set()
+    if geometry is not None:
+        replaced.update([wire.FEATURE_GEOMETRY, wire.FEATURE_ELEVATION])
+    replaced.update(field for field, values in attributes)
+    payload = bytearray()
+    for field, wire_type, value, f_start, value_start, value_end in wire.iter_fields(data, feature.start, feature.end):
+        if field not in replaced:
+            payload.extend(data[f_start:value_end])
+    for field, values in attributes:
+        wire.write_packed_varints(payload, field, values)
+    if geometry is not None:
+        wire.write_packed_varints(payload, wire.FEATURE_GEOMETRY, geometry[0])
+        if geometry[1]:
+            wire.write_packed_varints(payload, wire.FEATURE_ELEVATION, geometry[1])
+    wire.write_length_field(out, wire.LAYER_FEATURES, payload)
+
+def _subset_layer(data, start, end, bbox, compact):
+    features = []
+    table_fields = {}
+    for field, wire_type, value, field_start, value_start, value_end in wire.iter_fields(data, start, end):
+        if field == wire.LAYER_FEATURES:
+            features.append(_read_feature(data, field_start, value_start, value_end))
+        elif field in _ENTRY_TABLES or field in _PACKED_TABLES:
+            table_fields.setdefault(field, []).append((value_start, value_end))
+
+    min_x, min_y, max_x, max_y = bbox
+    coords, bounds, counts = _decode_geometry(data, features)
+    inside = ((bounds[:, 0] >= min_x) & (bounds[:, 1] >= min_y) & (bounds[:, 2] <= max_x) & (bounds[:, 3] <= max_y)).tolist()
+    outside = ((bounds[:, 2] < min_x) | (bounds[:, 0] > max_x) | (bounds[:, 3] < min_y) | (bounds[:, 1] > max_y) |
+        (counts == 0)).tolist()
+    kept = []
+    for i, feature in enumerate(features):
+        if outside[i]:
+            continue
+        geometry = None
+        if not inside[i] and feature.type != GEOM_SPLINE and feature.geometric_attributes is None:
+            # Splines stay whole, their control points are not on the curve,
+            # and so do features with values per vertex in their geometric
+            # attributes
+            geometry = _clip_feature(data, feature, coords, bbox)
+            if geometry is None:
+                continue
+        kept.append((feature, geometry))
+
+    maps = None
+    if compact:
+        used = dict((name, _Used()) for name in ['keys', 'values', 'string_values', 'float_values', 'double_values', 'int_values'])
+        for feature, geometry in kept:
+            _remap_feature(data, feature, used)
+        maps = dict((name, _index_map(indices)) for name, indices in used.items())
+        tables = _compact_tables(data, table_fields, maps)
+
+    out = bytearray()
+    features_written = False
+    for field, wire_type, value, field_start, value_start, value_end in wire.iter_fields(data, start, end):
+        if field == wire.LAYER_FEATURES:
+            if features_written:
+                continue
+            # Kept features are written where the first feature was
+            features_written = True
+            for feature, geometry in kept:
+                attributes = _remap_feature(data, feature, maps) if compact else []
+                if geometry is None and not attributes:
+                    out.extend(data[feature.field_start:feature.end])
+                else:
+                    _write_feature(out, data, feature, geometry, attributes)
+        elif compact and field in tables:
+            out.extend(tables.pop(field))
+        elif not compact or field not in table_fields:
+            out.extend(data[field_start:value_end])
+    return out
+
+def subset_tile(data, bbox, layers=None, compact=False):
+    # Returns a tile with the features of data within bbox, (min x, min y,
+    # max x, max y) in the tile coordinates of each layer. Only the named
+    # layers are kept when layers is given.
+    engine._require_numpy()
+    data = wire.as_buffer(data)
+    names = set(layers) if layers is not None else None
+    out = bytearray()
+    for field, wire_type, value, field_start, value_start, value_end in wire.iter_fields(data):
+        if field == wire.TILE_LAYERS and wire_type == wire.WIRE_LENGTH:
+            if names is not None and wire.layer_name(data, value_start, value_end) not in names:
+                continue
+            wire.write_length_field(out, wire.TILE_LAYERS, _subset_layer(data, value_start, value_end, bbox, compact))
+        else:
+            out.extend(data[field_start:value_end])
+    return bytes(out)
@@ -0,0 +1,210 @@
+import math
+import random
+from .engine import VectorTile, Float, FloatList, UInt
+
+# Deterministic generation of synthetic vector tiles for benchmarks and load
+# testing. All randomness comes from a random.Random seeded by the caller so
+# the same arguments always produce the same encoded tile.
+
+def _draw_count(rng, bounds, distribution):
+    low, high = bounds
+    if distribution == 'uniform':
+        return rng.randint(low, high)
+    elif distribution == 'lognormal':
+        # Most features are small with a long tail of large ones
+        value = int(round(low + rng.lognormvariate(0.0, 1.0) * (high - low) / math.exp(2.0)))
+        return max(low, min(high, value))
+    else:
+        raise Exception("Unknown vertex distribution, must be 'uniform' or 'lognormal'")
+
+def _random_walk(rng, count, extent, step):
+    x = rng.randint(0, extent - 1)
+    y = rng.randint(0, extent - 1)
+    points = [[x, y]]
+    while len(points) < count:
+        x = max(0, min(extent - 1, x + rng.randint(-step, step)))
+        y = max(0, min(extent - 1, y + rng.randint(-step, step)))
+        if [x, y] != points[-1]:
+            points.append([x, y])
+    return points
+
+def _ring(rng, count, cx, cy, radius, exterior):
+    ring = []
+    for i in range(count):
+        angle = 2.0 * math.pi * i / count
+        if not exterior:
+            angle = -angle
+        r = radius * (0.7 + 0.3 * rng.random())
+        ring.append([int(round(cx + r * math.cos(angle))), int(round(cy + r * math.sin(angle)))])
+    deduped = [ring[0]]
+    for pt in ring[1:]:
+        if pt != deduped[-1] and pt != deduped[0]:
+            deduped.append(pt)
+    if len(deduped) < 3:
+        deduped = [[int(cx), int(cy)], [int(cx) + 2, int(cy)], [int(cx) + 2, int(cy) + 2]]
+        if not exterior:
+            deduped.reverse()
+    deduped.append(deduped[0])
+    return deduped
+
+def _add_elevation(rng, points):
+    z = rng.uniform(0.0, 4000.0)
+    out = []
+    for pt in points:
+        z = z + rng.uniform(-5.0, 5.0)
+        out.append([pt[0], pt[1], z])
+    return out
+
+class _AttributeGenerator(object):
+
+    def __init__(self, rng, layer, attributes, cardinality, nesting, inline):
+        self._rng = rng
+        self._attributes = attributes
+        self._cardinality = max(1, cardinality)
+        self._nesting = nesting
+        self._inline = inline
+        self._scaling = None
+        if inline:
+            self._scaling = layer.add_attribute_scaling(precision=10.0**-6, min_value=0.0, max_value=1000.0)
+
+    def _pick(self):
+        return self._rng.randint(0, self._cardinality - 1)
+
+    def _scalar(self, kind):
+        index = self._pick()
+        if kind == 0:
+            return 'value_%d' % index
+        elif kind == 1:
+            return index
+        elif kind == 2:
+            return index + 0.5
+        elif kind == 3:
+            return index % 2 == 0
+        elif kind == 4:
+            return -index - 1
+        elif kind == 5:
+            return Float(index * 0.25)
+        else:
+            return UInt(index)
+
+    def _nested(self, depth):
+        if depth == 0:
+            return self._scalar(self._rng.randint(0, 6))
+        if self._rng.random() < 0.5:
+            return dict(('nested_%d' % i, self._nested(depth - 1)) for i in range(3))
+        return [self._nested(depth - 1) for i in range(3)]
+
+    def attributes(self):
+        attrs = {}
+        for i in range(self._attributes):
+            attrs['attr_%d' % i] = self._scalar(i % 7)
+        if self._inline:
+            if self._nesting > 0:
+                attrs['nested'] = self._nested(self._nesting)
+        return attrs
+
+    def geometric_attributes(self, count):
+        if not self._inline:
+            return None
+        values = [self._rng.uniform(0.0, 1000.0) for i in range(count)]
+        return {'measure': FloatList(self._scaling, values)}
+
+    def knots(self, num_control_points, degree):
+        num_spans = num_control_points - degree
+        values = [0.0] * degree + [float(i) for i in range(num_spans + 1)] + [float(num_spans)] * degree
+        return FloatList(self._scaling, values)
+
+def generate_tile(seed=0, layers=1, points=100, line_strings=100, polygons=100, splines=0,
+                  vertices=(2, 50), vertex_distribution='uniform', rings=(1, 3), parts=(1, 2),
+                  attributes=5, cardinality=100, nesting=0, geometric_attributes=False,
+                  version=2, legacy_attributes=False, elevation=False, spline_degree=3, extent=4096):
+    if version < 3 and (elevation or splines or geometric_attributes):
+        raise Exception("Elevation, splines and geometric attributes require version 3 layers")
+    rng = random.Random(seed)
+    inline = version >= 3 and not legacy_attributes
+    if geometric_attributes and not inline:
+        raise Exception("Geometric attributes require inline attributes")
+    if splines and not inline:
+        raise Exception("Splines require inline attributes for knot scaling")
+    vt = VectorTile()
+    feature_id = 0
+    for layer_index in range(layers):
+        layer = vt.add_layer('layer_%d' % layer_index, version=version, legacy_attributes=legacy_attributes)
+        if extent != 4096:
+            layer.extent = extent
+        if elevation:
+            layer.add_elevation_scaling(precision=10.0**-2, min_value=-1000.0, max_value=10000.0)
+        attr_gen = _AttributeGenerator(rng, layer, attributes, cardinality, nesting, inline)
+        step = max(1, extent // 64)
+
+        for i in range(points):
+            feature = layer.add_point_feature(has_elevation=elevation)
+            count = _draw_count(rng, parts, 'uniform')
+            pts = [[rng.randint(0, extent - 1), rng.randint(0, extent - 1)] for j in range(count)]
+            if elevation:
+                pts = _add_elevation(rng, pts)
+            feature.add_points(pts)
+            feature.id = feature_id
+            feature.attributes = attr_gen.attributes()
+            if geometric_attributes:
+                feature.geometric_attributes = attr_gen.geometric_attributes(len(pts))
+            feature_id = feature_id + 1
+
+        for i in range(line_strings):
+            feature = layer.add_line_string_feature(has_elevation=elevation)
+            total = 0
+            for j in range(_draw_count(rng, parts, 'uniform')):
+                line_string = _random_walk(rng, max(2, _draw_count(rng, vertices, vertex_distribution)), extent, step)
+                if elevation:
+                    line_string = _add_elevation(rng, line_string)
+                feature.add_line_string(line_string)
+                total = total + len(line_string)
+            feature.id = feature_id
+            feature.attributes = attr_gen.attributes()
+            if geometric_attributes:
+                feature.geometric_attributes = attr_gen.geometric_attributes(total)
+            feature_id = feature_id + 1
+
+        for i in range(polygons):
+            feature = layer.add_polygon_feature(has_elevation=elevation)
+            total = 0
+            for j in range(_draw_count(rng, parts, 'uniform')):
+                radius = rng.randint(extent // 64 + 8, extent // 8)
+                cx = rng.randint(radius, extent - radius)
+                cy = rng.randint(radius, extent - radius)
+                num_rings = _draw_count(rng, rings, 'uniform')
+                for k in range(num_rings):
+                    count = max(3, _draw_count(rng, vertices, vertex_distribution))
+                    if k == 0:
+                        ring = _ring(rng, count, cx, cy, radius, True)
+                    else:
+                        angle = 2.0 * math.pi * k / (num_rings - 1)
+                        hole_x = cx + 0.4 * radius * math.cos(angle)
+                        hole_y = cy + 0.4 * radius * math.sin(angle)
+                        ring = _ring(rng, count, hole_x, hole_y, radius * 0.5 / num_rings, False)
+                    if elevation:
+                        ring = _add_elevation(rng, ring)
+                        ring[-1] = ring[0]
+                    feature.add_ring(ring)
+                    total = total + len(ring) - 1
+            feature.id = feature_id
+            feature.attributes = attr_gen.attributes()
+            if geometric_attributes:
+                feature.geometric_attributes = attr_gen.geometric_attributes(total)
+            feature_id = feature_id + 1
+
+        for i in range(splines):
+            feature = layer.add_spline_feature(has_elevation=elevation, degree=spline_degree)
+            count = max(spline_degree + 1, _draw_count(rng, vertices, vertex_distribution))
+            control_points = _random_walk(rng, count, extent, step)
+            if elevation:
+                control_points = _add_elevation(rng, control_points)
+            feature.add_spline(control_points, attr_gen.knots(count, spline_degree))
+            feature.id = feature_id
+            feature.attributes = attr_gen.attributes()
+            feature_id = feature_id + 1
+    return vt
+
+def generate_tiles(count, seed=0, **kwargs):
+    for i in range(count):
+        yield generate_tile(seed=seed + i, **kwargs).serialize()
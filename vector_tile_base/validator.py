@@ -0,0 +1,361 @@
+import collections
+from . import wire
+from .wire import (CV_TYPE_STRING, CV_TYPE_FLOAT, CV_TYPE_DOUBLE, CV_TYPE_UINT, CV_TYPE_SINT, CV_TYPE_INLINE_UINT,
+    CV_TYPE_INLINE_SINT, CV_TYPE_BOOL_NULL, CV_TYPE_LIST, CV_TYPE_MAP, CV_TYPE_LIST_DOUBLE)
+from .wire import GEOM_UNKNOWN, GEOM_POINT, GEOM_LINESTRING, GEOM_POLYGON, GEOM_SPLINE, DEFAULT_SPLINE_DEGREE
+
+# Checks a serialized tile against the version 2 and 3 specification directly
+# on the bytes, without building protobuf or engine objects. The fields of each
+# layer are read once to find its version and table sizes, which can come after
+# the features, then the features are checked from the byte ranges found.
+
+class ValidationError(collections.namedtuple('ValidationError', ['code', 'message', 'layer', 'feature'])):
+    __slots__ = ()
+
+    def __str__(self):
+        location = []
+        if self.layer is not None:
+            location.append('layer %d' % self.layer)
+        if self.feature is not None:
+            location.append('feature %d' % self.feature)
+        if location:
+            return '%s: [%s] %s' % (' '.join(location), self.code, self.message)
+        return '[%s] %s' % (self.code, self.message)
+
+CMD_MOVE_TO = 1
+CMD_LINE_TO = 2
+CMD_CLOSE_PATH = 7
+
+_TABLE_FIELDS = {
+    wire.LAYER_KEYS: 'keys',
+    wire.LAYER_VALUES: 'values',
+    wire.LAYER_STRING_VALUES: 'string_values',
+    wire.LAYER_ATTRIBUTE_SCALINGS: 'attribute_scalings'
+}
+
+_PACKED_TABLE_FIELDS = {
+    wire.LAYER_FLOAT_VALUES: ('float_values', 4),
+    wire.LAYER_DOUBLE_VALUES: ('double_values', 8),
+    wire.LAYER_INT_VALUES: ('int_values', 8)
+}
+
+_CV_TABLES = {
+    CV_TYPE_STRING: 'string_values',
+    CV_TYPE_FLOAT: 'float_values',
+    CV_TYPE_DOUBLE: 'double_values',
+    CV_TYPE_UINT: 'int_values',
+    CV_TYPE_SINT: 'int_values'
+}
+
+class _Invalid(Exception):
+
+    def __init__(self, code, message):
+        super(_Invalid, self).__init__(message)
+        self.code = code
+        self.message = message
+
+def _repeated_varints(data, fields, name):
+    # Repeated scalar fields are normally packed, but unpacked encoding is also valid
+    values = []
+    for wire_type, value, start, end in fields:
+        if wire_type == wire.WIRE_LENGTH:
+            values.extend(wire.iter_packed_varints(data, start, end))
+        elif wire_type == wire.WIRE_VARINT:
+            values.append(value)
+        else:
+            raise _Invalid('wire_type', "Invalid wire type for %s" % name)
+    return values
+
+def _single_varint(fields, name, default=None):
+    if not fields:
+        return default
+    wire_type, value, start, end = fields[-1]
+    if wire_type != wire.WIRE_VARINT:
+        raise _Invalid('wire_type', "Invalid wire type for %s" % name)
+    return value
+
+def _read_parameters(geometry, i, count):
+    end = i + 2 * count
+    if end > len(geometry):
+        raise _Invalid('missing_parameters', "Command requires %d parameters but only %d remain" % (2 * count, len(geometry) - i))
+    return end
+
+def _next_command(geometry, i):
+    command = geometry[i]
+    cmd_id = command & 0x7
+    count = command >> 3
+    if cmd_id != CMD_MOVE_TO and cmd_id != CMD_LINE_TO and cmd_id != CMD_CLOSE_PATH:
+        raise _Invalid('invalid_command', "Unknown command id %d" % cmd_id)
+    return cmd_id, count
+
+def check_geometry(geometry, geom_type):
+    # Returns the number of vertices and the number of vertices of each part
+    n = len(geometry)
+    if geom_type == GEOM_UNKNOWN:
+        return 0, []
+    if n == 0:
+        raise _Invalid('empty_geometry', "Feature has no geometry")
+    parts = []
+    i = 0
+    if geom_type == GEOM_POINT:
+        cmd_id, count = _next_command(geometry, i)
+        if cmd_id != CMD_MOVE_TO:
+            raise _Invalid('command_sequence', "Point geometry must start with a move_to command")
+        if count == 0:
+            raise _Invalid('command_count', "Command move_to has a command count of 0 in a point")
+        i = _read_parameters(geometry, i + 1, count)
+        if i != n:
+            raise _Invalid('command_sequence', "Point geometry must consist of a single move_to command")
+        return count, [count]
+    while i < n:
+        cmd_id, count = _next_command(geometry, i)
+        if cmd_id != CMD_MOVE_TO:
+            raise _Invalid('command_sequence', "Expected a move_to command at position %d" % i)
+        if count != 1:
+            raise _Invalid('command_count', "Command move_to has command count not equal to 1")
+        i = _read_parameters(geometry, i + 1, 1)
+        vertices = 1
+        while i < n:
+            cmd_id, count = _next_command(geometry, i)
+            if cmd_id != CMD_LINE_TO:
+                break
+            if count == 0:
+                raise _Invalid('command_count', "Command line_to has a command count of 0")
+            i = _read_parameters(geometry, i + 1, count)
+            vertices = vertices + count
+        if vertices < 2:
+            raise _Invalid('command_sequence', "Command move_to not followed by a line_to command")
+        if geom_type == GEOM_POLYGON:
+            if vertices < 3:
+                raise _Invalid('command_count', "Polygon ring has less than 3 vertices")
+            if i >= n or geometry[i] & 0x7 != CMD_CLOSE_PATH:
+                raise _Invalid('unclosed_ring', "Polygon not closed with close_path command")
+            if geometry[i] >> 3 != 1:
+                raise _Invalid('command_count', "Command close_path has command count not equal to 1")
+            i = i + 1
+        parts.append(vertices)
+    return sum(parts), parts
+
+class _LayerTables(object):
+
+    def __init__(self):
+        self.sizes = {}
+        for name in list(_TABLE_FIELDS.values()) + [v[0] for v in _PACKED_TABLE_FIELDS.values()]:
+            self.sizes[name] = 0
+
+    def check_index(self, table, index):
+        if index >= self.sizes[table]:
+            raise _Invalid('index', "Index %d out of range of %s (%d entries)" % (index, table, self.sizes[table]))
+
+def _check_inline_value(tables, itr, value):
+    val_id = value & 0x0f
+    param = value >> 4
+    if val_id in _CV_TABLES:
+        tables.check_index(_CV_TABLES[val_id], param)
+    elif val_id == CV_TYPE_INLINE_UINT or val_id == CV_TYPE_INLINE_SINT:
+        pass
+    elif val_id == CV_TYPE_BOOL_NULL:
+        if param > 2:
+            raise _Invalid('attribute_value', "Invalid bool or null value %d" % param)
+    elif val_id == CV_TYPE_LIST:
+        for i in range(param):
+            _check_inline_value(tables, itr, next(itr))
+    elif val_id == CV_TYPE_MAP:
+        for i in range(param):
+            tables.check_index('keys', next(itr))
+            _check_inline_value(tables, itr, next(itr))
+    elif val_id == CV_TYPE_LIST_DOUBLE:
+        _check_float_list(tables, itr, param)
+    else:
+        raise _Invalid('attribute_value', "Unknown value type %d in inline value" % val_id)
+
+def _check_float_list(tables, itr, count):
+    tables.check_index('attribute_scalings', next(itr))
+    for i in range(count):
+        next(itr)
+
+def _check_inline_attributes(tables, values, geometric):
+    itr = iter(values)
+    try:
+        for key in itr:
+            tables.check_index('keys', key)
+            value = next(itr)
+            if geometric and value & 0x0f != CV_TYPE_LIST and value & 0x0f != CV_TYPE_LIST_DOUBLE:
+                raise _Invalid('attribute_value', "Invalid value type top level in geometric_attributes of feature, must be a list type")
+            _check_inline_value(tables, itr, value)
+    except StopIteration:
+        raise _Invalid('attribute_value', "Inline attributes end in the middle of a value")
+
+def _check_tags(tables, tags):
+    if len(tags) % 2 != 0:
+        raise _Invalid('tags', "Feature has an odd number of tags")
+    for i in range(0, len(tags), 2):
+        tables.check_index('keys', tags[i])
+        tables.check_index('values', tags[i + 1])
+
+def _check_spline_knots(tables, knots, parts, degree):
+    itr = iter(knots)
+    try:
+        for vertices in parts:
+            value = next(itr)
+            if value & 0x0f != CV_TYPE_LIST_DOUBLE:
+                raise _Invalid('spline_knots', "Spline knots must be a list of doubles")
+            count = value >> 4
+            if count != vertices + degree + 1:
+                raise _Invalid('spline_knots', "Spline with %d control points and degree %d has %d knots instead of %d" % (vertices, degree, count, vertices + degree + 1))
+            _check_float_list(tables, itr, count)
+    except StopIteration:
+        raise _Invalid('spline_knots', "Fewer spline knot lists than splines")
+    if next(itr, None) is not None:
+        raise _Invalid('spline_knots', "More spline knot values than splines")
+
+def _check_feature(data, start, end, version, inline, tables):
+    fields = collections.defaultdict(list)
+    for field, wire_type, value, field_start, value_start, value_end in wire.iter_fields(data, start, end):
+        fields[field].append((wire_type, value, value_start, value_end))
+    geom_type = _single_varint(fields.get(wire.FEATURE_TYPE), 'type', GEOM_UNKNOWN)
+    if geom_type > GEOM_SPLINE:
+        raise _Invalid('geometry_type', "Unknown geometry type %d" % geom_type)
+    if geom_type == GEOM_SPLINE and version < 3:
+        raise _Invalid('version', "Spline features require version 3")
+    _single_varint(fields.get(wire.FEATURE_ID), 'id')
+    for name, field in [('elevation', wire.FEATURE_ELEVATION), ('attributes', wire.FEATURE_ATTRIBUTES),
+                        ('geometric_attributes', wire.FEATURE_GEOMETRIC_ATTRIBUTES), ('spline_knots', wire.FEATURE_SPLINE_KNOTS),
+                        ('string_id', wire.FEATURE_STRING_ID)]:
+        if version < 3 and field in fields:
+            raise _Invalid('version', "Field %s of features requires version 3" % name)
+
+    geometry = _repeated_varints(data, fields.get(wire.FEATURE_GEOMETRY, []), 'geometry')
+    vertices, parts = check_geometry(geometry, geom_type)
+
+    elevation = _repeated_varints(data, fields.get(wire.FEATURE_ELEVATION, []), 'elevation')
+    if elevation and len(elevation) != vertices:
+        raise _Invalid('elevation', "Feature has %d elevation values for %d vertices" % (len(elevation), vertices))
+
+    if inline:
+        if wire.FEATURE_TAGS in fields:
+            raise _Invalid('tags', "Tags are not used by layers with inline attributes")
+        _check_inline_attributes(tables, _repeated_varints(data, fields.get(wire.FEATURE_ATTRIBUTES, []), 'attributes'), False)
+        _check_inline_attributes(tables, _repeated_varints(data, fields.get(wire.FEATURE_GEOMETRIC_ATTRIBUTES, []), 'geometric_attributes'), True)
+    else:
+        if wire.FEATURE_ATTRIBUTES in fields or wire.FEATURE_GEOMETRIC_ATTRIBUTES in fields:
+            raise _Invalid('attributes', "Inline attributes can not be used by layers with a values table")
+        _check_tags(tables, _repeated_varints(data, fields.get(wire.FEATURE_TAGS, []), 'tags'))
+
+    knots = _repeated_varints(data, fields.get(wire.FEATURE_SPLINE_KNOTS, []), 'spline_knots')
+    if geom_type == GEOM_SPLINE:
+        degree = _single_varint(fields.get(wire.FEATURE_SPLINE_DEGREE), 'spline_degree', DEFAULT_SPLINE_DEGREE)
+        if degree < 1:
+            raise _Invalid('spline_degree', "Spline degree must be at least 1")
+        _check_spline_knots(tables, knots, parts, degree)
+    elif knots:
+        raise _Invalid('spline_knots', "Spline knots on a feature that is not a spline")
+
+def _check_layer(data, start, end, layer_index, names):
+    # First pass: read the layer fields and count the entries of each table,
+    # tables can appear after the features that reference them.
+    tables = _LayerTables()
+    features = []
+    name = None
+    version = None
+    has_elevation_scaling = False
+    try:
+        for field, wire_type, value, field_start, value_start, value_end in wire.iter_fields(data, start, end):
+            if field == wire.LAYER_FEATURES:
+                if wire_type != wire.WIRE_LENGTH:
+                    raise _Invalid('wire_type', "Invalid wire type for features")
+                features.append((value_start, value_end))
+            elif field == wire.LAYER_NAME:
+                if wire_type != wire.WIRE_LENGTH:
+                    raise _Invalid('wire_type', "Invalid wire type for name")
+                name = bytes(data[value_start:value_end]).decode('utf-8', 'replace')
+            elif field == wire.LAYER_VERSION:
+                if wire_type != wire.WIRE_VARINT:
+                    raise _Invalid('wire_type', "Invalid wire type for version")
+                version = value
+            elif field == wire.LAYER_EXTENT:
+                if wire_type != wire.WIRE_VARINT:
+                    raise _Invalid('wire_type', "Invalid wire type for extent")
+                if value == 0:
+                    raise _Invalid('extent', "Layer extent must be greater than 0")
+            elif field in _TABLE_FIELDS:
+                if wire_type != wire.WIRE_LENGTH:
+                    raise _Invalid('wire_type', "Invalid wire type for %s" % _TABLE_FIELDS[field])
+                tables.sizes[_TABLE_FIELDS[field]] = tables.sizes[_TABLE_FIELDS[field]] + 1
+            elif field in _PACKED_TABLE_FIELDS:
+                table, size = _PACKED_TABLE_FIELDS[field]
+                if wire_type == wire.WIRE_LENGTH:
+                    if (value_end - value_start) % size != 0:
+                        raise _Invalid('wire_type', "Packed %s has a length that is not a multiple of %d" % (table, size))
+                    tables.sizes[table] = tables.sizes[table] + (value_end - value_start) // size
+                elif (size == 4 and wire_type == wire.WIRE_FIXED32) or (size == 8 and wire_type == wire.WIRE_FIXED64):
+                    tables.sizes[table] = tables.sizes[table] + 1
+                else:
+                    raise _Invalid('wire_type', "Invalid wire type for %s" % table)
+            elif field == wire.LAYER_ELEVATION_SCALING:
+                has_elevation_scaling = True
+    except _Invalid as e:
+        yield ValidationError(e.code, e.message, layer_index, None)
+        return
+    except Exception as e:
+        yield ValidationError('malformed', str(e), layer_index, None)
+        return
+
+    if version is None:
+        yield ValidationError('version', "Layer is missing the required version field", layer_index, None)
+        version = 1
+    elif version < 1 or version > 3:
+        yield ValidationError('version', "Unsupported layer version %d" % version, layer_index, None)
+        return
+    if name is None:
+        yield ValidationError('name', "Layer is missing the required name field", layer_index, None)
+    elif name in names:
+        yield ValidationError('name', "Duplicate layer name '%s'" % name, layer_index, None)
+    else:
+        names.add(name)
+    if version < 3:
+        for table in ['string_values', 'float_values', 'double_values', 'int_values', 'attribute_scalings']:
+            if tables.sizes[table]:
+                yield ValidationError('version', "Layer table %s requires version 3" % table, layer_index, None)
+        if has_elevation_scaling:
+            yield ValidationError('version', "Layer elevation_scaling requires version 3", layer_index, None)
+
+    # Same rule as the engine, version 3 layers without a values table use inline attributes
+    inline = version > 2 and tables.sizes['values'] == 0
+    for feature_index, (feature_start, feature_end) in enumerate(features):
+        try:
+            _check_feature(data, feature_start, feature_end, version, inline, tables)
+        except _Invalid as e:
+            yield ValidationError(e.code, e.message, layer_index, feature_index)
+        except Exception as e:
+            yield ValidationError('malformed', str(e), layer_index, feature_index)
+
+def iter_errors(data):
+    data = wire.as_buffer(data)
+    names = set()
+    layer_index = 0
+    try:
+        for field, wire_type, value, field_start, value_start, value_end in wire.iter_fields(data):
+            if field != wire.TILE_LAYERS:
+                continue
+            if wire_type != wire.WIRE_LENGTH:
+                yield ValidationError('wire_type', "Invalid wire type for layers", layer_index, None)
+                return
+            for error in _check_layer(data, value_start, value_end, layer_index, names):
+                yield error
+            layer_index = layer_index + 1
+    except Exception as e:
+        yield ValidationError('malformed', str(e), None, None)
+
+def validate(data, max_errors=None):
+    errors = []
+    for error in iter_errors(data):
+        errors.append(error)
+        if max_errors is not None and len(errors) >= max_errors:
+            break
+    return errors
+
+def is_valid(data):
+    for error in iter_errors(data):
+        return False
+    return True
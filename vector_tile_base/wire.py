@@ -0,0 +1,376 @@
+import sys
+
+# Minimal protobuf wire format reader, used to inspect serialized tiles
+# without building the protobuf objects.
+
+WIRE_VARINT = 0
+WIRE_FIXED64 = 1
+WIRE_LENGTH = 2
+WIRE_FIXED32 = 5
+
+# Tile
+TILE_LAYERS = 3
+
+# Tile.Layer
+LAYER_NAME = 1
+LAYER_FEATURES = 2
+LAYER_KEYS = 3
+LAYER_VALUES = 4
+LAYER_EXTENT = 5
+LAYER_STRING_VALUES = 6
+LAYER_FLOAT_VALUES = 7
+LAYER_DOUBLE_VALUES = 8
+LAYER_INT_VALUES = 9
+LAYER_ELEVATION_SCALING = 10
+LAYER_ATTRIBUTE_SCALINGS = 11
+LAYER_TILE_X = 12
+LAYER_TILE_Y = 13
+LAYER_TILE_ZOOM = 14
+LAYER_VERSION = 15
+
+# Tile.Feature
+FEATURE_ID = 1
+FEATURE_TAGS = 2
+FEATURE_TYPE = 3
+FEATURE_GEOMETRY = 4
+FEATURE_ATTRIBUTES = 5
+FEATURE_GEOMETRIC_ATTRIBUTES = 6
+FEATURE_ELEVATION = 7
+FEATURE_SPLINE_KNOTS = 8
+FEATURE_SPLINE_DEGREE = 9
+FEATURE_STRING_ID = 10
+
+# Tile.GeomType
+GEOM_UNKNOWN = 0
+GEOM_POINT = 1
+GEOM_LINESTRING = 2
+GEOM_POLYGON = 3
+GEOM_SPLINE = 4
+
+# Degree of splines without a spline_degree field
+DEFAULT_SPLINE_DEGREE = 2
+
+LAYER_SECTIONS = {
+    LAYER_NAME: 'name',
+    LAYER_KEYS: 'keys',
+    LAYER_VALUES: 'values',
+    LAYER_EXTENT: 'extent',
+    LAYER_STRING_VALUES: 'string_values',
+    LAYER_FLOAT_VALUES: 'float_values',
+    LAYER_DOUBLE_VALUES: 'double_values',
+    LAYER_INT_VALUES: 'int_values',
+    LAYER_ELEVATION_SCALING: 'elevation_scaling',
+    LAYER_ATTRIBUTE_SCALINGS: 'attribute_scalings',
+    LAYER_TILE_X: 'tile_location',
+    LAYER_TILE_Y: 'tile_location',
+    LAYER_TILE_ZOOM: 'tile_location',
+    LAYER_VERSION: 'version'
+}
+
+FEATURE_SECTIONS = {
+    FEATURE_ID: 'id',
+    FEATURE_TAGS: 'tags',
+    FEATURE_TYPE: 'type',
+    FEATURE_GEOMETRY: 'geometry',
+    FEATURE_ATTRIBUTES: 'attributes',
+    FEATURE_GEOMETRIC_ATTRIBUTES: 'geometric_attributes',
+    FEATURE_ELEVATION: 'elevation',
+    FEATURE_SPLINE_KNOTS: 'spline_knots',
+    FEATURE_SPLINE_DEGREE: 'spline_degree',
+    FEATURE_STRING_ID: 'string_id'
+}
+
+# Complex value types of inline attributes, the engine uses these too
+CV_TYPE_STRING = 0
+CV_TYPE_FLOAT = 1
+CV_TYPE_DOUBLE = 2
+CV_TYPE_UINT = 3
+CV_TYPE_SINT = 4
+CV_TYPE_INLINE_UINT = 5
+CV_TYPE_INLINE_SINT = 6
+CV_TYPE_BOOL_NULL = 7
+CV_TYPE_LIST = 8
+CV_TYPE_MAP = 9
+CV_TYPE_LIST_DOUBLE = 10
+
+def as_buffer(data):
+    if sys.version_info[0] < 3 and not isinstance(data, bytearray):
+        return bytearray(data)
+    return data
+
+def read_varint(data, pos, end=None):
+    if end is None:
+        end = len(data)
+    result = 0
+    shift = 0
+    while True:
+        if pos >= end:
+            raise Exception("Truncated varint")
+        b = data[pos]
+        pos = pos + 1
+        result |= (b & 0x7f) << shift
+        if not b & 0x80:
+            return result, pos
+        shift = shift + 7
+        if shift >= 70:
+            raise Exception("Varint is too long")
+
+def iter_fields(data, start=0, end=None):
+    # Yields (field number, wire type, value, field start, value start, value end).
+    # The value is only decoded for varints, for other wire types it is None and
+    # the payload is data[value start:value end].
+    if end is None:
+        end = len(data)
+    pos = start
+    while pos < end:
+        field_start = pos
+        key, pos = read_varint(data, pos, end)
+        field = key >> 3
+        wire_type = key & 0x7
+        if field == 0:
+            raise Exception("Invalid field number 0")
+        if wire_type == WIRE_VARINT:
+            value, value_end = read_varint(data, pos, end)
+            yield field, wire_type, value, field_start, pos, value_end
+            pos = value_end
+            continue
+        elif wire_type == WIRE_FIXED64:
+            value_end = pos + 8
+        elif wire_type == WIRE_FIXED32:
+            value_end = pos + 4
+        elif wire_type == WIRE_LENGTH:
+            length, pos = read_varint(data, pos, end)
+            value_end = pos + length
+        else:
+            raise Exception("Unsupported wire type %d" % wire_type)
+        if value_end > end:
+            raise Exception("Field %d extends past the end of its message" % field)
+        yield field, wire_type, None, field_start, pos, value_end
+        pos = value_end
+
+def write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def write_length_field(out, field, payload):
+    write_varint(out, (field << 3) | WIRE_LENGTH)
+    write_varint(out, len(payload))
+    out.extend(payload)
+
+def write_packed_varints(out, field, values):
+    payload = bytearray()
+    for value in values:
+        write_varint(payload, value)
+    write_length_field(out, field, payload)
+
+def iter_packed_varints(data, start, end):
+    pos = start
+    while pos < end:
+        value, pos = read_varint(data, pos, end)
+        yield value
+
+def _packed_varints_with_sizes(data, start, end):
+    pos = start
+    while pos < end:
+        value, next_pos = read_varint(data, pos, end)
+        yield value, next_pos - pos
+        pos = next_pos
+
+def _decode_string(data, start, end):
+    return bytes(data[start:end]).decode('utf-8', 'replace')
+
+def _json_default(value):
+    # Used by the JSON writers for string values that are not valid UTF-8
+    if isinstance(value, bytes):
+        return value.decode('utf-8', 'replace')
+    raise TypeError("Object of type %s is not JSON serializable" % type(value).__name__)
+
+class _KeyUsage(object):
+
+    def __init__(self):
+        self.bytes = 0
+        self.features = 0
+        self.values = set()
+
+def _skip_inline_value(itr, value):
+    # Consumes the rest of a complex value, returns (bytes, identity of value)
+    val_id = value & 0x0f
+    param = value >> 4
+    size = 0
+    parts = [value]
+    if val_id == CV_TYPE_LIST:
+        for i in range(param):
+            item, item_size = next(itr)
+            item_bytes, item_parts = _skip_inline_value(itr, item)
+            size = size + item_size + item_bytes
+            parts.append(item_parts)
+    elif val_id == CV_TYPE_MAP:
+        for i in range(param):
+            key, key_size = next(itr)
+            item, item_size = next(itr)
+            item_bytes, item_parts = _skip_inline_value(itr, item)
+            size = size + key_size + item_size + item_bytes
+            parts.append((key, item_parts))
+    elif val_id == CV_TYPE_LIST_DOUBLE:
+        for i in range(param + 1):
+            item, item_size = next(itr)
+            size = size + item_size
+            parts.append(item)
+    if len(parts) == 1:
+        return size, value
+    return size, tuple(parts)
+
+def _add_inline_usage(data, start, end, usage, seen):
+    itr = _packed_varints_with_sizes(data, start, end)
+    try:
+        for key, key_size in itr:
+            value, value_size = next(itr)
+            value_bytes, identity = _skip_inline_value(itr, value)
+            key_usage = usage.get(key)
+            if key_usage is None:
+                key_usage = usage[key] = _KeyUsage()
+            key_usage.bytes = key_usage.bytes + key_size + value_size + value_bytes
+            key_usage.values.add(identity)
+            if key not in seen:
+                key_usage.features = key_usage.features + 1
+                seen.add(key)
+    except StopIteration:
+        raise Exception("Truncated inline attributes")
+
+def _add_tag_usage(data, start, end, usage, seen):
+    itr = _packed_varints_with_sizes(data, start, end)
+    for key, key_size in itr:
+        try:
+            value, value_size = next(itr)
+        except StopIteration:
+            raise Exception("Odd number of tags")
+        key_usage = usage.get(key)
+        if key_usage is None:
+            key_usage = usage[key] = _KeyUsage()
+        key_usage.bytes = key_usage.bytes + key_size + value_size
+        key_usage.values.add(value)
+        if key not in seen:
+            key_usage.features = key_usage.features + 1
+            seen.add(key)
+
+def _table(count=0, distinct=None, size=0):
+    return {'count': count, 'distinct': count if distinct is None else distinct, 'bytes': size}
+
+def _layer_report(data, start, end, top):
+    sections = {}
+    for name in set(LAYER_SECTIONS.values()) | set(FEATURE_SECTIONS.values()):
+        sections[name] = 0
+    sections['feature_overhead'] = 0
+    sections['unknown'] = 0
+    entries = {'keys': [], 'values': [], 'string_values': [], 'attribute_scalings': []}
+    packed_counts = {'float_values': 0, 'double_values': 0, 'int_values': 0}
+    int_values = set()
+    usage = {}
+    num_features = 0
+    name = None
+    version = 1
+    for field, wire_type, value, field_start, value_start, value_end in iter_fields(data, start, end):
+        size = value_end - field_start
+        if field == LAYER_FEATURES:
+            num_features = num_features + 1
+            overhead = value_start - field_start
+            seen = set()
+            for f_field, f_wire_type, f_value, f_start, f_value_start, f_value_end in iter_fields(data, value_start, value_end):
+                section = FEATURE_SECTIONS.get(f_field, 'unknown')
+                sections[section] = sections[section] + f_value_end - f_start
+                if f_field == FEATURE_TAGS:
+                    _add_tag_usage(data, f_value_start, f_value_end, usage, seen)
+                elif f_field == FEATURE_ATTRIBUTES or f_field == FEATURE_GEOMETRIC_ATTRIBUTES:
+                    _add_inline_usage(data, f_value_start, f_value_end, usage, seen)
+            sections['feature_overhead'] = sections['feature_overhead'] + overhead
+            continue
+        section = LAYER_SECTIONS.get(field, 'unknown')
+        sections[section] = sections[section] + size
+        if field == LAYER_NAME:
+            name = _decode_string(data, value_start, value_end)
+        elif field == LAYER_VERSION:
+            version = value
+        elif section in entries:
+            entries[section].append((bytes(data[value_start:value_end]), size))
+        elif field == LAYER_FLOAT_VALUES:
+            packed_counts['float_values'] = packed_counts['float_values'] + (value_end - value_start) // 4
+        elif field == LAYER_DOUBLE_VALUES:
+            packed_counts['double_values'] = packed_counts['double_values'] + (value_end - value_start) // 8
+        elif field == LAYER_INT_VALUES:
+            for i in range(value_start, value_end, 8):
+                int_values.add(bytes(data[i:i + 8]))
+            packed_counts['int_values'] = packed_counts['int_values'] + (value_end - value_start) // 8
+
+    tables = {}
+    for table, items in entries.items():
+        tables[table] = _table(len(items), len(set(item[0] for item in items)), sum(item[1] for item in items))
+    for table in ['float_values', 'double_values']:
+        tables[table] = _table(packed_counts[table], size=sections[table])
+    tables['int_values'] = _table(packed_counts['int_values'], len(int_values), sections['int_values'])
+
+    keys = [item[0] for item in entries['keys']]
+    heavy = []
+    for key, key_usage in usage.items():
+        if key < len(keys):
+            key_name = keys[key].decode('utf-8', 'replace')
+        else:
+            key_name = None
+        heavy.append({
+            'key': key_name,
+            'index': key,
+            'bytes': key_usage.bytes,
+            'features': key_usage.features,
+            'distinct_values': len(key_usage.values)
+        })
+    heavy.sort(key=lambda x: (-x['bytes'], x['index']))
+    if top is not None:
+        heavy = heavy[:top]
+
+    return {
+        'name': name,
+        'version': version,
+        'bytes': end - start,
+        'features': num_features,
+        'sections': sections,
+        'tables': tables,
+        'keys': heavy
+    }
+
+def size_report(data, top=10):
+    data = as_buffer(data)
+    layers = []
+    unknown = 0
+    for field, wire_type, value, field_start, value_start, value_end in iter_fields(data):
+        if field == TILE_LAYERS and wire_type == WIRE_LENGTH:
+            report = _layer_report(data, value_start, value_end, top)
+            report['overhead'] = value_start - field_start
+            layers.append(report)
+        else:
+            unknown = unknown + value_end - field_start
+    return {
+        'bytes': len(data),
+        'unknown': unknown,
+        'layers': layers
+    }
+
+def layer_name(data, start, end):
+    # Name of the layer stored in data[start:end], or None when it has none
+    for field, wire_type, value, field_start, value_start, value_end in iter_fields(data, start, end):
+        if field == LAYER_NAME:
+            return _decode_string(data, value_start, value_end)
+    return None
+
+def select_layers(data, names):
+    # Returns a tile with only the named layers, copied from the serialized
+    # tile without decoding the layers that are kept or dropped.
+    data = as_buffer(data)
+    names = set(names)
+    out = bytearray()
+    for field, wire_type, value, field_start, value_start, value_end in iter_fields(data):
+        if field == TILE_LAYERS and wire_type == WIRE_LENGTH:
+            if layer_name(data, value_start, value_end) not in names:
+                continue
+        out.extend(data[field_start:value_end])
+    return bytes(out)
@@ -0,0 +1,116 @@
+import struct
+from . import engine
+from .engine import np
+
+# Well known binary and text export of feature geometry. Vertex arrays come
+# straight from the geometry command stream and are written with NumPy, with
+# no python list per vertex. Geometry with elevation is written with Z using
+# the ISO type codes (1001 for a Point Z and so on), which PostGIS, GEOS and
+# shapely all read. Coordinates are tile coordinates unless lonlat is set.
+
+WKB_TYPES = {
+    'Point': 1,
+    'LineString': 2,
+    'Polygon': 3,
+    'MultiPoint': 4,
+    'MultiLineString': 5,
+    'MultiPolygon': 6
+}
+
+_HEADER = struct.Struct('<BI')
+_COUNT = struct.Struct('<I')
+
+def _coords(coords):
+    return np.ascontiguousarray(coords, dtype='<f8').tobytes()
+
+def _points(coords, type_code):
+    # Multi points are a list of points, each with its own header
+    dim = coords.shape[1]
+    points = np.zeros(len(coords), dtype=np.dtype([('order', 'u1'), ('type', '<u4'), ('coords', '<f8', (dim,))]))
+    points['order'] = 1
+    points['type'] = type_code
+    points['coords'] = coords
+    return points.tobytes()
+
+def _rings(rings):
+    out = [_COUNT.pack(len(rings))]
+    for ring in rings:
+        out.append(_COUNT.pack(len(ring)))
+        out.append(_coords(ring))
+    return b''.join(out)
+
+def _write_wkb(geom_type, parts, z):
+    type_code = WKB_TYPES[geom_type] + z
+    header = _HEADER.pack(1, type_code)
+    if geom_type == 'Point':
+        return header + _coords(parts[0])
+    elif geom_type == 'MultiPoint':
+        return header + _COUNT.pack(len(parts)) + _points(parts, WKB_TYPES['Point'] + z)
+    elif geom_type == 'LineString':
+        return header + _COUNT.pack(len(parts)) + _coords(parts)
+    elif geom_type == 'Polygon':
+        return header + _rings(parts)
+    elif geom_type == 'MultiLineString':
+        line_header = _HEADER.pack(1, WKB_TYPES['LineString'] + z)
+        return header + _COUNT.pack(len(parts)) + b''.join(line_header + _COUNT.pack(len(line)) + _coords(line) for line in parts)
+    polygon_header = _HEADER.pack(1, WKB_TYPES['Polygon'] + z)
+    return header + _COUNT.pack(len(parts)) + b''.join(polygon_header + _rings(polygon) for polygon in parts)
+
+def _format_coords(coords, precision):
+    if precision is None:
+        values = coords.tolist()
+    else:
+        values = np.round(coords, precision).tolist()
+    return ', '.join(' '.join(repr(v) for v in vertex) for vertex in values)
+
+def _write_wkt(geom_type, parts, z, precision):
+    name = geom_type.upper() + (' Z' if z else '')
+    if geom_type == 'Point':
+        return '%s (%s)' % (name, _format_coords(parts, precision))
+    elif geom_type == 'MultiPoint':
+        return '%s (%s)' % (name, ', '.join('(%s)' % _format_coords(parts[i:i + 1], precision) for i in range(len(parts))))
+    elif geom_type == 'LineString':
+        return '%s (%s)' % (name, _format_coords(parts, precision))
+    elif geom_type in ('MultiLineString', 'Polygon'):
+        return '%s (%s)' % (name, ', '.join('(%s)' % _format_coords(part, precision) for part in parts))
+    return '%s (%s)' % (name, ', '.join('(%s)' % ', '.join('(%s)' % _format_coords(ring, precision) for ring in polygon)
+        for polygon in parts))
+
+def _iter_geometry(layer, lonlat, tile, no_elevation, spline_samples):
+    # Yields (geometry type, vertex arrays, Z offset) per feature
+    engine._require_numpy()
+    if lonlat:
+        zoom, x, y = engine._tile_location(layer, tile)
+        extent = layer.extent
+        transform = lambda coords: engine._tile_to_lonlat_array(coords, zoom, x, y, extent)
+    for feature in layer.features:
+        geom_type, parts = engine._simple_geometry(feature, no_elevation, spline_samples)
+        if geom_type is None:
+            yield None, None, 0
+            continue
+        if lonlat:
+            parts = engine._map_geometry(geom_type, parts, transform)
+        z = 1000 if feature.has_elevation and not no_elevation else 0
+        yield geom_type, parts, z
+
+def layer_wkb(layer, packed=False, lonlat=False, tile=None, no_elevation=False, spline_samples=8):
+    # Returns one WKB bytes object per feature, None for features without
+    # geometry. When packed, returns a single bytes buffer and an array of
+    # len(features) + 1 offsets into it instead, features without geometry
+    # have no bytes.
+    out = []
+    for geom_type, parts, z in _iter_geometry(layer, lonlat, tile, no_elevation, spline_samples):
+        out.append(None if geom_type is None else _write_wkb(geom_type, parts, z))
+    if not packed:
+        return out
+    sizes = [0 if item is None else len(item) for item in out]
+    offsets = np.zeros(len(out) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(sizes)
+    return b''.join(item for item in out if item is not None), offsets
+
+def layer_wkt(layer, lonlat=False, tile=None, precision=None, no_elevation=False, spline_samples=8):
+    # Returns one WKT string per feature, None for features without geometry
+    out = []
+    for geom_type, parts, z in _iter_geometry(layer, lonlat, tile, no_elevation, spline_samples):
+        out.append(None if geom_type is None else _write_wkt(geom_type, parts, z, precision))
+    return out